@@ -6,14 +6,21 @@ Master-Orchestrator für die autonome AI-Agentur
 import os
 import sys
 import json
-import sqlite3
+import time
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List
 
 # Füge utils zum Python Path hinzu
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.base_agent import BaseAgent
 from utils.ai_client import DatabaseManager
+from utils.kpi_rollups import dashboard_metrics
+from utils.agent_health import AGENT_HEARTBEAT_TIMEOUT, AlertTransition, evaluate_agent_health
+
+# Die 24h-Aggregation über das Usage-Ledger skaliert mit der Zahl der Aufrufe -
+# das Dashboard (alle 30 s) rechnet sie daher nur so oft neu
+CEO_LLM_USAGE_REFRESH = float(os.getenv("CEO_LLM_USAGE_REFRESH", "300"))
 
 class CEOAgent(BaseAgent):
     """CEO-Agent: Zentrale Steuerung und strategische Entscheidungen mit Tree-of-Thoughts"""
@@ -106,6 +113,9 @@ Denken Sie wie ein erfahrener CEO eines deutschen SaaS-Unternehmens: datengetrie
             instructions=instructions
         )
         
+        # Ohne Heartbeat seit so vielen Sekunden gilt ein Agent als ausgefallen
+        self.heartbeat_timeout = AGENT_HEARTBEAT_TIMEOUT
+        
         # KPI-Ziele mit deutschen Business-Standards
         self.kpi_targets = {
             'monthly_revenue': 83333,  # 1M€/12 Monate
@@ -118,6 +128,8 @@ Denken Sie wie ein erfahrener CEO eines deutschen SaaS-Unternehmens: datengetrie
         }
         
         self.db_manager = DatabaseManager()
+        self._llm_usage: Dict = None
+        self._llm_usage_at = 0.0
     
     async def process_message(self, message: Dict):
         """Verarbeitet eingehende Nachrichten mit strukturierter Entscheidungsfindung"""
@@ -488,32 +500,11 @@ Denken Sie wie ein erfahrener Strategieberater für deutsche SaaS-Unternehmen.
     
     async def _generate_daily_report(self):
         """Erstellt täglichen Geschäftsbericht"""
-        # Hole KPI-Daten aus der Datenbank
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Aktueller Umsatz
-        cursor.execute('''
-            SELECT SUM(budget) FROM projects 
-            WHERE created_at >= date('now', '-30 days')
-        ''')
-        monthly_revenue = cursor.fetchone()[0] or 0
-        
-        # Lead-Anzahl
-        cursor.execute('''
-            SELECT COUNT(*) FROM leads 
-            WHERE created_at >= date('now', '-7 days')
-        ''')
-        weekly_leads = cursor.fetchone()[0] or 0
-        
-        # Aktive Projekte
-        cursor.execute('''
-            SELECT COUNT(*) FROM projects 
-            WHERE status IN ('planned', 'in_progress')
-        ''')
-        active_projects = cursor.fetchone()[0] or 0
-        
-        conn.close()
+        # Hole KPI-Daten aus den Rollup-Tabellen
+        metrics = await self.db.read(dashboard_metrics)
+        monthly_revenue = metrics["monthly_revenue"]
+        weekly_leads = metrics["weekly_leads"]
+        active_projects = metrics["active_projects"]
         
         report_prompt = f"""
 TÄGLICHER GESCHÄFTSBERICHT - {datetime.now().strftime('%d.%m.%Y')}
@@ -535,40 +526,52 @@ Welche konkreten Aktionen soll ich heute anweisen?
 Erstelle einen präzisen, handlungsorientierten Tagesbericht.
 """
         
-        report = await self.process_with_llm(report_prompt, temperature=0.3)
+        # Report wird direkt in die Datei gestreamt
+        report = await self.stream_llm_to_file(
+            report_prompt,
+            f"logs/ceo_report_{datetime.now().strftime('%Y%m%d')}.txt",
+            header=f"CEO Tagesbericht - {datetime.now().strftime('%d.%m.%Y')}\n" + "="*50 + "\n",
+            temperature=0.3
+        )
         
         print(f"📈 CEO TAGESBERICHT - {datetime.now().strftime('%d.%m.%Y')}")
         print(f"{'='*50}")
         print(report)
         print(f"{'='*50}")
         
-        # Speichere Report
-        with open(f"logs/ceo_report_{datetime.now().strftime('%Y%m%d')}.txt", 'w', encoding='utf-8') as f:
-            f.write(f"CEO Tagesbericht - {datetime.now().strftime('%d.%m.%Y')}\n")
-            f.write("="*50 + "\n")
-            f.write(report)
-        
         return report
     
-    async def monitor_system_health(self):
-        """Überwacht Systemgesundheit und Agent-Performance"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Überprüfe Agent-Status
-        cursor.execute('''
-            SELECT id, name, last_active FROM agents
-            WHERE last_active < datetime('now', '-1 hour')
-        ''')
-        
-        inactive_agents = cursor.fetchall()
-        
-        if inactive_agents:
+    async def monitor_system_health(self) -> List[AlertTransition]:
+        """
+        Überwacht die Heartbeats der Agenten. Eine LLM-Analyse gibt es nur für
+        neu ausgefallene Agenten - bereits gemeldete Ausfälle (ongoing) und
+        Erholungen (resolved) kosten keinen LLM-Aufruf.
+        """
+        transitions = await self.db.transaction(
+            partial(evaluate_agent_health, timeout=self.heartbeat_timeout)
+        )
+        new_alerts = [t for t in transitions if t.state == "new"]
+        ongoing = [t for t in transitions if t.state == "ongoing"]
+        
+        for alert in transitions:
+            if alert.state == "resolved":
+                print(f"✅ CEO: {alert.agent_name} ({alert.agent_id}) wieder aktiv")
+                self.log_activity(f"Health-Alert behoben: {alert.alert_key}")
+        
+        if new_alerts:
+            timeout_minutes = self.heartbeat_timeout / 60
+            agent_lines = [
+                f"- {alert.agent_name} ({alert.agent_id}): Letzter Heartbeat "
+                f"{datetime.fromtimestamp(alert.last_heartbeat).isoformat(timespec='seconds')}"
+                for alert in new_alerts
+            ]
+            if ongoing:
+                agent_lines.append(f"Bereits gemeldet und weiterhin inaktiv: {', '.join(alert.agent_id for alert in ongoing)}")
             alert_prompt = f"""
 SYSTEM-ALERT: INAKTIVE AGENTEN ERKANNT
 
-Folgende Agenten waren über 1 Stunde inaktiv:
-{chr(10).join([f"- {agent[1]} ({agent[0]}): Letzte Aktivität {agent[2]}" for agent in inactive_agents])}
+Folgende Agenten senden seit über {timeout_minutes:.0f} Minuten keinen Heartbeat mehr:
+{chr(10).join(agent_lines)}
 
 HANDLUNGSEMPFEHLUNG:
 1. Soll ich die Agenten neu starten?
@@ -581,40 +584,22 @@ Berücksichtige: Kritikalität der Agenten, mögliche Auswirkungen auf Geschäft
             alert_response = await self.process_with_llm(alert_prompt, temperature=0.2)
             
             print(f"⚠️ CEO SYSTEM-ALERT")
-            print(f"🤖 Inaktive Agenten: {len(inactive_agents)}")
+            print(f"🤖 Inaktive Agenten: {len(new_alerts) + len(ongoing)} ({len(new_alerts)} neu)")
             print(f"📋 {alert_response}")
         
-        conn.close()
+        return transitions
     
-    def get_kpi_dashboard(self) -> Dict:
+    async def get_kpi_dashboard(self) -> Dict:
         """Erstellt KPI-Dashboard"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Sammle aktuelle Metriken
-        metrics = {}
-        
-        # Umsatzdaten
-        cursor.execute('''
-            SELECT SUM(budget) FROM projects 
-            WHERE created_at >= date('now', '-30 days')
-        ''')
-        metrics['monthly_revenue'] = cursor.fetchone()[0] or 0
-        
-        # Leads
-        cursor.execute('SELECT COUNT(*) FROM leads WHERE created_at >= date("now", "-7 days")')
-        metrics['weekly_leads'] = cursor.fetchone()[0] or 0
-        
-        # Projekte
-        cursor.execute('SELECT COUNT(*) FROM projects WHERE status = "completed"')
-        metrics['completed_projects'] = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT COUNT(*) FROM projects')
-        total_projects = cursor.fetchone()[0] or 1
-        
-        metrics['completion_rate'] = metrics['completed_projects'] / total_projects
-        
-        conn.close()
+        # Aktuelle Metriken aus den Rollup-Tabellen (keine Scans über leads/projects)
+        rollups = await self.db.read(dashboard_metrics)
+        
+        metrics = {
+            'monthly_revenue': rollups['monthly_revenue'],
+            'weekly_leads': rollups['weekly_leads'],
+            'completed_projects': rollups['completed_projects'],
+            'completion_rate': rollups['completed_projects'] / (rollups['total_projects'] or 1)
+        }
         
         # Berechne Zielerreichung
         dashboard = {
@@ -633,8 +618,23 @@ Berücksichtige: Kritikalität der Agenten, mögliche Auswirkungen auf Geschäft
                 'status': 'on_track' if (current / target) >= 0.8 else 'behind'
             }
         
+        # LLM-Kosten und Latenz je Agent/Pod aus dem Usage-Ledger
+        if hasattr(self, 'ai_client'):
+            dashboard['llm_usage'] = await self._get_llm_usage()
+        
         return dashboard
     
+    async def _get_llm_usage(self) -> Dict:
+        """Ledger-Aggregation der letzten 24h, höchstens alle CEO_LLM_USAGE_REFRESH Sekunden neu berechnet"""
+        now = time.monotonic()
+        if self._llm_usage is None or now - self._llm_usage_at >= CEO_LLM_USAGE_REFRESH:
+            self._llm_usage = {
+                **await self.ai_client.get_cost_analysis_async(since_hours=24),
+                'hourly': await self.ai_client.get_usage_breakdown_async('hour', since_hours=24)
+            }
+            self._llm_usage_at = now
+        return self._llm_usage
+    
     async def run_loop(self):
         """Hauptschleife des CEO Agents"""
         import asyncio
@@ -644,9 +644,10 @@ Berücksichtige: Kritikalität der Agenten, mögliche Auswirkungen auf Geschäft
         while True:
             try:
                 # KPI-Dashboard erstellen
-                dashboard = self.get_kpi_dashboard()
+                dashboard = await self.get_kpi_dashboard()
                 
-                # System-Health überwachen
+                # System-Health überwachen (LLM nur bei neuen Ausfällen)
+                await self.heartbeat()
                 await self.monitor_system_health()
                 
                 # Täglichen Report generieren (einmal pro Tag um 9:00)
@@ -821,7 +822,7 @@ async def test_ceo_agent():
     await ceo._generate_daily_report()
     
     # Test 2: KPI-Dashboard
-    dashboard = ceo.get_kpi_dashboard() 
+    dashboard = await ceo.get_kpi_dashboard()
     print(f"\n📊 KPI-Dashboard: {dashboard}")
     
     # Test 3: Systemüberwachung
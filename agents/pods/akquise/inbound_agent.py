@@ -6,7 +6,6 @@ Automatische Erfassung und Standardisierung eingehender Leads
 import os
 import sys
 import json
-import sqlite3
 import uuid
 from datetime import datetime
 from typing import Dict, Any
@@ -341,7 +340,7 @@ Repariere es zu validem JSON. Antworte NUR mit dem JSON, ohne zusätzlichen Text
             lead_id = str(uuid.uuid4())
             
             # Speichere in Datenbank
-            self._save_lead_to_db(lead_id, lead_data, source, raw_data)
+            await self._save_lead_to_db(lead_id, lead_data, source, raw_data)
             
             # Bewerte ob Weiterleitung nötig
             completeness = lead_data.get('assessment', {}).get('completeness', 0)
@@ -432,12 +431,9 @@ Repariere es zu validem JSON. Antworte NUR mit dem JSON, ohne zusätzlichen Text
             }
         }
     
-    def _save_lead_to_db(self, lead_id: str, lead_data: Dict, source: str, raw_data: str):
+    async def _save_lead_to_db(self, lead_id: str, lead_data: Dict, source: str, raw_data: str):
         """Speichert Lead in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self.db.execute('''
             INSERT INTO leads (
                 id, source, contact_data, qualification_score, 
                 status, assigned_agent, created_at, updated_at
@@ -455,9 +451,6 @@ Repariere es zu validem JSON. Antworte NUR mit dem JSON, ohne zusätzlichen Text
             datetime.now().isoformat(),
             datetime.now().isoformat()
         ))
-        
-        conn.commit()
-        conn.close()
     
     async def _request_additional_info(self, lead_data: Dict, lead_id: str):
         """Sendet Nachfrage bei unvollständigen Leads"""
@@ -542,15 +535,24 @@ Nachricht: {email_data.get('body', 'keine Nachricht')}
             'source': 'email'
         })
     
-    def get_lead_statistics(self) -> Dict:
+    async def get_lead_statistics(self) -> Dict:
         """Gibt Lead-Statistiken zurück"""
-        conn = sqlite3.connect(self.db_path)
+        leads_today, leads_week, qualified_week = await self.db.read(self._query_lead_statistics)
+        
+        return {
+            'leads_today': leads_today,
+            'leads_week': leads_week,
+            'qualified_week': qualified_week,
+            'qualification_rate': (qualified_week / leads_week) if leads_week > 0 else 0
+        }
+    
+    def _query_lead_statistics(self, conn):
         cursor = conn.cursor()
         
         # Gesamt-Leads heute
         cursor.execute('''
             SELECT COUNT(*) FROM leads 
-            WHERE DATE(created_at) = DATE('now')
+            WHERE created_at >= DATE('now') AND created_at < DATE('now', '+1 day')
         ''')
         leads_today = cursor.fetchone()[0] or 0
         
@@ -569,25 +571,16 @@ Nachricht: {email_data.get('body', 'keine Nachricht')}
         ''')
         qualified_week = cursor.fetchone()[0] or 0
         
-        conn.close()
-        
-        return {
-            'leads_today': leads_today,
-            'leads_week': leads_week,
-            'qualified_week': qualified_week,
-            'qualification_rate': (qualified_week / leads_week) if leads_week > 0 else 0
-        }
+        return leads_today, leads_week, qualified_week
     
     async def run_loop(self):
         """Hauptschleife des Inbound Agents - überwacht eingehende Leads"""
-        import asyncio
-        
         print(f"📥 {self.name} gestartet - Überwache eingehende Leads")
         
         while True:
             try:
                 # Hole Lead-Statistiken
-                stats = self.get_lead_statistics()
+                stats = await self.get_lead_statistics()
                 
                 # Zeige Status alle 5 Minuten
                 if datetime.now().minute % 5 == 0:
@@ -876,9 +869,6 @@ Analysieren Sie gründlich und strukturiert für optimale Weiterverarbeitung.
     async def _save_lead_to_database(self, lead_info: Dict):
         """Speichert Lead-Informationen in der Datenbank"""
         try:
-            conn = sqlite3.connect('database/agent_system.db')
-            cursor = conn.cursor()
-            
             # Erstelle contact_data JSON für bestehende Struktur
             contact_data = {
                 "name": lead_info['contact_info']['name'],
@@ -900,11 +890,19 @@ Analysieren Sie gründlich und strukturiert für optimale Weiterverarbeitung.
             }
             
             # Lead-Grunddaten in bestehende Struktur
-            cursor.execute("""
-                INSERT OR REPLACE INTO leads (
+            # Upsert statt INSERT OR REPLACE: REPLACE löscht ohne DELETE-Trigger (KPI-Rollups)
+            await self.db.execute("""
+                INSERT INTO leads (
                     id, source, contact_data, qualification_score,
                     status, created_at, updated_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    source = excluded.source,
+                    contact_data = excluded.contact_data,
+                    qualification_score = excluded.qualification_score,
+                    status = excluded.status,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at
             """, (
                 lead_info['lead_id'],
                 lead_info['lead_source'],
@@ -915,9 +913,6 @@ Analysieren Sie gründlich und strukturiert für optimale Weiterverarbeitung.
                 datetime.now().isoformat()
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             self.logger.error(f"Fehler beim Speichern des Leads: {str(e)}")
     
@@ -1021,17 +1016,11 @@ Schreiben Sie im berneby development Stil: professionell, direkt, lösungsorient
     async def _archive_spam_lead(self, lead_info: Dict):
         """Archiviert Spam-Leads"""
         try:
-            conn = sqlite3.connect('database/agent_system.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await self.db.execute("""
                 UPDATE leads SET status = 'spam', updated_at = ? 
                 WHERE id = ?
             """, (datetime.now().isoformat(), lead_info['lead_id']))
             
-            conn.commit()
-            conn.close()
-            
             self.log_kpi('spam_leads_detected', 1)
             
         except Exception as e:
@@ -1069,11 +1058,10 @@ max@musterfirma.de
     await agent.process_message(test_message)
     
     # Statistiken
-    stats = agent.get_lead_statistics()
+    stats = await agent.get_lead_statistics()
     print(f"📊 Lead-Statistiken: {stats}")
     
     print("✅ Inbound-Agent Tests abgeschlossen")
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_inbound_agent()) 
\ No newline at end of file
@@ -6,11 +6,11 @@ Part of berneby development autonomous AI agency system
 
 import asyncio
 import json
-import sqlite3
 import re
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class LeadQualificationAgent(BaseAgent):
     """Lead-Qualification-Agent - Bewertet und qualifiziert Leads mit Fit-Score"""
@@ -50,6 +50,8 @@ class LeadQualificationAgent(BaseAgent):
             
             if message_type == 'qualify_lead':
                 return await self.qualify_lead(content)
+            elif message_type == 'qualify_leads_batch':
+                return await self.qualify_leads(content.get('leads', []))
             elif message_type == 'requalify_lead':
                 return await self._requalify_lead(content)
             else:
@@ -93,10 +95,25 @@ class LeadQualificationAgent(BaseAgent):
                 "error": str(e)
             }
     
+    async def qualify_leads(self, leads: List[Dict]) -> Dict:
+        """
+        Qualifiziert viele Leads parallel (z.B. Backfill nach einem Import).
+        Die LLM-Bewertungen werden über den Micro-Batcher gebündelt.
+        """
+        results = await asyncio.gather(*(self.qualify_lead(lead) for lead in leads))
+        qualified = sum(1 for r in results if r.get("status") == "success")
+        self.log_activity(f"Batch-Qualifizierung: {qualified}/{len(leads)} Leads verarbeitet")
+        return {
+            "status": "success",
+            "processed": qualified,
+            "failed": len(leads) - qualified,
+            "results": results
+        }
+    
     def _get_lead_from_db(self, lead_id: str) -> Optional[Dict]:
         """Lädt Lead-Daten aus der Datenbank"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -221,7 +238,7 @@ Antworte im folgenden JSON-Format:
         
         try:
             # LLM-basierte Bewertung durchführen
-            response = await self.process_with_llm(prompt, temperature=0.3)
+            response = await self.process_with_llm(prompt, temperature=0.3, batch=True)
             
             # Extrahiere JSON aus Antwort
             result = self._extract_json_from_response(response)
@@ -375,7 +392,7 @@ Antworte im folgenden JSON-Format:
     def _save_qualification_result(self, lead_id: str, score_result: Dict, qualification: Dict):
         """Speichert Qualifizierungsergebnis in Datenbank"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Speichere Haupt-Qualifizierung
@@ -493,7 +510,7 @@ Antworte im folgenden JSON-Format:
     def get_qualification_statistics(self) -> Dict:
         """Gibt Statistiken über Qualifizierungen zurück"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Gesamtanzahl pro Status
@@ -6,10 +6,10 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class DeliveryManagerAgent(BaseAgent):
     """Delivery-Manager-Agent - Projektleiter-Bot für die Delivery-Phase"""
@@ -463,7 +463,7 @@ Länge: 250-300 Wörter
     
     def _update_project_status(self, project_id: str, status: str):
         """Aktualisiert Projekt-Status in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -477,7 +477,7 @@ Länge: 250-300 Wörter
     
     def _get_active_projects(self) -> List[Dict]:
         """Lädt alle aktiven Projekte"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -6,12 +6,12 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 import os
 import subprocess
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class OnboardingAgent(BaseAgent):
     """Onboarding-Agent - Richtet neue Projekte automatisch ein"""
@@ -149,7 +149,7 @@ Du sorgst für einen reibungslosen Projektstart und optimale Arbeitsbedingungen.
         """Sammelt alle relevanten Projektinformationen"""
         
         # Lade Lead- und Projektdaten aus Datenbank
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # Lead-Informationen
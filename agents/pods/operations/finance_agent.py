@@ -6,9 +6,9 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 import os
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List, Optional
 from utils.base_agent import BaseAgent
 
@@ -163,7 +163,7 @@ Du arbeitest präzise, compliant und automatisiert.
         template = self.invoice_templates[project_type]
         
         # Generiere Rechnungsnummer
-        invoice_number = self._generate_invoice_number()
+        invoice_number = await self._generate_invoice_number()
         
         # Berechne Steuern
         net_amount = final_amount / (1 + self.company_info["vat_rate"])
@@ -208,7 +208,7 @@ Du arbeitest präzise, compliant und automatisiert.
                 f.write(invoice_html)
             
             # Speichere in Datenbank
-            invoice_id = self._save_invoice_to_database(invoice_data)
+            invoice_id = await self._save_invoice_to_database(invoice_data)
             
             return {
                 "success": True,
@@ -326,50 +326,22 @@ Du arbeitest präzise, compliant und automatisiert.
         
         return invoice_html
     
-    def _generate_invoice_number(self) -> str:
+    async def _generate_invoice_number(self) -> str:
         """Generiert eindeutige Rechnungsnummer"""
         year = datetime.now().year
         month = datetime.now().month
         
         # Hole letzte Rechnungsnummer für diesen Monat
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        count = await self.db.fetchval('''
             SELECT COUNT(*) FROM invoices 
             WHERE invoice_number LIKE ? 
-        ''', (f"{year}{month:02d}%",))
-        
-        count = cursor.fetchone()[0] + 1
-        conn.close()
+        ''', (f"{year}{month:02d}%",)) + 1
         
         return f"{year}{month:02d}{count:04d}"
     
-    def _save_invoice_to_database(self, invoice_data: Dict) -> int:
-        """Speichert Rechnung in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Erstelle Rechnungs-Tabelle falls nicht vorhanden
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_number TEXT UNIQUE,
-                project_id TEXT,
-                customer_name TEXT,
-                customer_email TEXT,
-                invoice_date DATE,
-                due_date DATE,
-                subtotal REAL,
-                vat_amount REAL,
-                total_amount REAL,
-                status TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Speichere Rechnung
-        cursor.execute('''
+    async def _save_invoice_to_database(self, invoice_data: Dict) -> int:
+        """Speichert Rechnung in Datenbank (Tabelle aus utils/migrations.py)"""
+        result = await self.db.execute('''
             INSERT INTO invoices 
             (invoice_number, project_id, customer_name, customer_email, 
              invoice_date, due_date, subtotal, vat_amount, total_amount, status)
@@ -387,11 +359,7 @@ Du arbeitest präzise, compliant und automatisiert.
             invoice_data["status"]
         ))
         
-        invoice_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return invoice_id
+        return result.lastrowid
     
     async def _send_invoice_to_customer(self, invoice_id: int, project_details: Dict):
         """Sendet Rechnung automatisch an Kunden"""
@@ -426,13 +394,13 @@ Ihr {self.company_info['name']} Team
         self.log_activity(f"Rechnung {invoice_id} an {customer_email} versendet")
         
         # Aktualisiere Status
-        self._update_invoice_status(invoice_id, "sent")
+        await self._update_invoice_status(invoice_id, "sent")
     
     async def _schedule_payment_monitoring(self, invoice_id: int):
         """Plant Zahlungsüberwachung und Mahnwesen"""
         
         # Hole Rechnungsdetails
-        invoice_details = self._get_invoice_details(invoice_id)
+        invoice_details = await self._get_invoice_details(invoice_id)
         due_date = datetime.fromisoformat(invoice_details["due_date"])
         
         # Plane erste Mahnung
@@ -453,7 +421,7 @@ Ihr {self.company_info['name']} Team
         invoice_id = content.get('invoice_id')
         reminder_type = content.get('reminder_type', 'first')
         
-        invoice_details = self._get_invoice_details(invoice_id)
+        invoice_details = await self._get_invoice_details(invoice_id)
         
         if invoice_details["status"] == "paid":
             self.log_activity(f"Rechnung {invoice_id} bereits bezahlt - Mahnung übersprungen")
@@ -477,7 +445,7 @@ Ihr {self.company_info['name']} Team
         self.log_activity(f"{reminder_type} Mahnung für Rechnung {invoice_id} versendet")
         
         # Aktualisiere Status und plane nächste Mahnung
-        self._update_invoice_status(invoice_id, f"reminder_{reminder_type}_sent")
+        await self._update_invoice_status(invoice_id, f"reminder_{reminder_type}_sent")
         
         if reminder_type == "first":
             # Plane zweite Mahnung
@@ -556,7 +524,7 @@ Ihr {self.company_info['name']} Team
         year = content.get('year', datetime.now().year)
         
         # Sammle Finanzdaten
-        financial_data = self._collect_monthly_financial_data(year, month)
+        financial_data = await self._collect_monthly_financial_data(year, month)
         
         # Erstelle Bericht
         report = await self._create_financial_report(financial_data, year, month)
@@ -570,37 +538,18 @@ Ihr {self.company_info['name']} Team
         
         self.log_activity(f"Monatlicher Finanzbericht für {year}-{month:02d} erstellt")
     
-    def _collect_monthly_financial_data(self, year: int, month: int) -> Dict:
+    async def _collect_monthly_financial_data(self, year: int, month: int) -> Dict:
         """Sammelt monatliche Finanzdaten"""
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Rechnungen des Monats
-        cursor.execute('''
-            SELECT COUNT(*), SUM(total_amount), SUM(CASE WHEN status = 'paid' THEN total_amount ELSE 0 END)
-            FROM invoices 
-            WHERE strftime('%Y-%m', invoice_date) = ?
-        ''', (f"{year}-{month:02d}",))
-        
-        invoice_stats = cursor.fetchone()
+        invoice_stats, overdue_stats = await self.db.read(
+            partial(self._query_monthly_financial_data, year, month)
+        )
         total_invoices = invoice_stats[0] or 0
         total_invoiced = invoice_stats[1] or 0
         total_paid = invoice_stats[2] or 0
-        
-        # Offene Forderungen
-        cursor.execute('''
-            SELECT COUNT(*), SUM(total_amount)
-            FROM invoices 
-            WHERE status != 'paid' AND due_date < date('now')
-        ''', ())
-        
-        overdue_stats = cursor.fetchone()
         overdue_count = overdue_stats[0] or 0
         overdue_amount = overdue_stats[1] or 0
         
-        conn.close()
-        
         # Berechne KPIs
         collection_rate = (total_paid / total_invoiced * 100) if total_invoiced > 0 else 0
         
@@ -623,6 +572,27 @@ Ihr {self.company_info['name']} Team
             }
         }
     
+    def _query_monthly_financial_data(self, year: int, month: int, conn):
+        cursor = conn.cursor()
+        
+        # Rechnungen des Monats
+        cursor.execute('''
+            SELECT COUNT(*), SUM(total_amount), SUM(CASE WHEN status = 'paid' THEN total_amount ELSE 0 END)
+            FROM invoices 
+            WHERE invoice_date >= ? AND invoice_date < date(?, '+1 month')
+        ''', (f"{year}-{month:02d}-01", f"{year}-{month:02d}-01"))
+        
+        invoice_stats = cursor.fetchone()
+        
+        # Offene Forderungen
+        cursor.execute('''
+            SELECT COUNT(*), SUM(total_amount)
+            FROM invoices 
+            WHERE status != 'paid' AND due_date < date('now')
+        ''', ())
+        
+        return invoice_stats, cursor.fetchone()
+    
     async def _create_financial_report(self, data: Dict, year: int, month: int) -> str:
         """Erstellt detaillierten Finanzbericht"""
         
@@ -658,7 +628,12 @@ BERICHT-STRUKTUR:
 Erstelle einen strukturierten, aussagekräftigen Bericht für die Geschäftsführung.
 """
         
-        report = await self.process_with_llm(report_prompt, temperature=0.3)
+        report = await self.stream_llm_to_file(
+            report_prompt,
+            f"logs/finance_report_{year}{month:02d}.txt",
+            header=f"Finanzbericht {year}-{month:02d}\n" + "="*50 + "\n",
+            temperature=0.3
+        )
         return report
     
     def _determine_project_type(self, project_details: Dict) -> str:
@@ -672,20 +647,14 @@ Erstelle einen strukturierten, aussagekräftigen Bericht für die Geschäftsfüh
         else:
             return 'software_development'
     
-    def _get_invoice_details(self, invoice_id: int) -> Dict:
+    async def _get_invoice_details(self, invoice_id: int) -> Dict:
         """Holt Rechnungsdetails aus Datenbank"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        result = await self.db.fetchone('''
             SELECT invoice_number, customer_name, customer_email, 
                    due_date, total_amount, status
             FROM invoices WHERE id = ?
         ''', (invoice_id,))
         
-        result = cursor.fetchone()
-        conn.close()
-        
         if result:
             return {
                 "invoice_number": result[0],
@@ -697,17 +666,11 @@ Erstelle einen strukturierten, aussagekräftigen Bericht für die Geschäftsfüh
             }
         return {}
     
-    def _update_invoice_status(self, invoice_id: int, status: str):
+    async def _update_invoice_status(self, invoice_id: int, status: str):
         """Aktualisiert Rechnungsstatus"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self.db.execute('''
             UPDATE invoices SET status = ? WHERE id = ?
         ''', (status, invoice_id))
-        
-        conn.commit()
-        conn.close()
     
     async def _schedule_next_reminder(self, invoice_id: int, reminder_type: str):
         """Plant nächste Zahlungserinnerung"""
@@ -6,11 +6,11 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class NeedsAnalysisAgent(BaseAgent):
     """Needs-Analysis-Agent - Führt Bedarfsanalysen mit qualifizierten Leads durch"""
@@ -552,7 +552,7 @@ Antworte strukturiert und präzise. Dies wird die Basis für unser Angebot.
     
     def _get_lead_details(self, lead_id: str) -> Optional[Dict]:
         """Lädt Lead-Details aus Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -571,7 +571,7 @@ Antworte strukturiert und präzise. Dies wird die Basis für unser Angebot.
         """Erstellt neue Bedarfsanalyse-Session"""
         session_id = f"NA-{lead_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
         
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -601,7 +601,7 @@ Antworte strukturiert und präzise. Dies wird die Basis für unser Angebot.
     
     def get_analysis_statistics(self) -> Dict:
         """Erstellt Statistik über Bedarfsanalysen"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         stats = {}
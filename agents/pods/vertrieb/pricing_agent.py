@@ -6,7 +6,6 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 import math
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
@@ -168,7 +167,7 @@ Du kalkulierst datengetrieben und transparent.
         }
         
         # 7. Speichere Pricing-Ergebnis
-        self._save_pricing_result(lead_id, pricing_result)
+        await self._save_pricing_result(lead_id, pricing_result)
         
         # 8. Sende an Proposal-Writer
         self.send_message("SALES-003", "pricing_calculated", {
@@ -593,27 +592,9 @@ Gib eine strukturierte Analyse mit konkreten Zahlen und Begründungen.
         
         return min(1.0, confidence)
     
-    def _save_pricing_result(self, lead_id: str, pricing_result: Dict):
-        """Speichert Pricing-Ergebnis in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Erstelle Pricing-Tabelle falls nicht vorhanden
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pricing_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                lead_id TEXT,
-                recommended_price REAL,
-                margin_percentage REAL,
-                confidence_score REAL,
-                pricing_strategy TEXT,
-                full_result TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Speichere Ergebnis
-        cursor.execute('''
+    async def _save_pricing_result(self, lead_id: str, pricing_result: Dict):
+        """Speichert Pricing-Ergebnis in Datenbank (Tabelle aus utils/migrations.py)"""
+        await self.db.execute('''
             INSERT INTO pricing_results 
             (lead_id, recommended_price, margin_percentage, confidence_score, pricing_strategy, full_result)
             VALUES (?, ?, ?, ?, ?, ?)
@@ -625,9 +606,6 @@ Gib eine strukturierte Analyse mit konkreten Zahlen und Begründungen.
             pricing_result["final_pricing"]["pricing_strategy"],
             json.dumps(pricing_result, ensure_ascii=False)
         ))
-        
-        conn.commit()
-        conn.close()
 
 # Test-Funktionen
 async def test_pricing_agent():
@@ -6,10 +6,11 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
+import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class ProposalWriterAgent(BaseAgent):
     """Proposal-Writer-Agent - Erstellt professionelle Kundenangebote mit AI-Reasoning"""
@@ -624,9 +625,12 @@ Ihr Partner für digitale Innovation
 Erstellen Sie ein Angebot, das überzeugt, vertraut und zum Abschluss führt.
 """
             
-            # Generiere Angebot mit LLM
-            proposal_text = await self.process_with_llm(
+            # Generiere Angebot mit LLM (gestreamt, Entwurf liegt sofort als Datei vor)
+            company_slug = re.sub(r'[^a-z0-9]+', '_', customer_info.get('company', 'kunde').lower()).strip('_') or 'kunde'
+            draft_path = f"proposals/drafts/{company_slug}_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt"
+            proposal_text = await self.stream_llm_to_file(
                 proposal_prompt,
+                draft_path,
                 temperature=0.2,  # Niedrige Temperature für konsistente Qualität
                 agent_type="content_creation"
             )
@@ -823,7 +827,7 @@ Ihr Partner für digitale Innovation
     
     def _get_lead_details(self, lead_id: str) -> Optional[Dict]:
         """Lädt Lead-Details aus Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM leads WHERE id = ?', (lead_id,))
@@ -838,7 +842,7 @@ Ihr Partner für digitale Innovation
     
     def _save_proposal(self, proposal: Dict):
         """Speichert Angebot in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -906,7 +910,7 @@ Gib das überarbeitete Angebot zurück.
     
     def _get_proposal(self, proposal_id: str) -> Optional[Dict]:
         """Lädt Angebot aus Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('SELECT proposal_data FROM proposals WHERE id = ?', (proposal_id,))
@@ -919,7 +923,7 @@ Gib das überarbeitete Angebot zurück.
     
     def _update_proposal(self, proposal: Dict):
         """Aktualisiert Angebot in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -938,7 +942,7 @@ Gib das überarbeitete Angebot zurück.
     
     def get_proposal_statistics(self) -> Dict:
         """Erstellt Statistiken über Angebote"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         stats = {}
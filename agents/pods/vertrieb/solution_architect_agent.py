@@ -6,10 +6,10 @@ Teil des berneby development autonomen AI-Agentensystems
 
 import asyncio
 import json
-import sqlite3
 from datetime import datetime
 from typing import Dict, List, Optional
 from utils.base_agent import BaseAgent
+from utils.connection_manager import get_connection
 
 class SolutionArchitectAgent(BaseAgent):
     """Solution-Architect-Agent - Entwirft Lösungskonzepte für Kundenanforderungen"""
@@ -442,7 +442,7 @@ Sei realistisch aber wettbewerbsfähig in der Preisgestaltung.
     
     def _save_solution_design(self, solution: Dict):
         """Speichert Lösungsdesign in Datenbank"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -462,7 +462,7 @@ Sei realistisch aber wettbewerbsfähig in der Preisgestaltung.
     
     def get_solution_statistics(self) -> Dict:
         """Erstellt Statistiken über Lösungsdesigns"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         stats = {}
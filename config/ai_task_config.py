@@ -68,6 +68,91 @@ MODEL_SELECTION = {
     }
 }
 
+# Response-Cache TTL (Sekunden) je Task
+CACHE_TTL_MAP = {
+    # Deterministische Prüf- und Extraktionsaufgaben ändern sich kaum
+    "validate_input": 24 * 3600,
+    "simple_validation": 24 * 3600,
+    "basic_classification": 24 * 3600,
+    "extract_keywords": 24 * 3600,
+    "format_response": 6 * 3600,
+    "self_evaluation": 6 * 3600,
+
+    # Lead- und Angebotsdaten können sich innerhalb eines Tages ändern
+    "lead_qualification": 3600,
+    "needs_analysis": 3600,
+    "quality": 3600,
+
+    # Finanz- und Strategieanalysen hängen von aktuellen Zahlen ab
+    "financial_analysis": 900,
+    "strategic_planning": 900
+}
+
+DEFAULT_CACHE_TTL = 3600
+
+# Bis zu dieser Temperature gelten Antworten als deterministisch und werden standardmäßig gecacht
+CACHEABLE_TEMPERATURE_THRESHOLD = 0.2
+
+# Circuit Breaker je Provider/Modell
+CIRCUIT_BREAKER_CONFIG = {
+    "window_size": 20,               # Rollierendes Fenster der letzten Aufrufe
+    "min_calls": 5,                  # Mindestanzahl Aufrufe vor einer Bewertung
+    "failure_rate_threshold": 0.5,   # Ab dieser Fehlerrate wird der Circuit geöffnet
+    "open_seconds": 30,              # Wartezeit bis zur Half-Open-Probe
+    "latency_window": 50             # Anzahl gemessener Latenzen für Routing und Perzentile
+}
+
+# Hedged Requests für latenzkritische Tasks (z.B. erste Antwort an Leads)
+HEDGING_CONFIG = {
+    "tasks": {
+        "validate_input",
+        "basic_classification",
+        "inbound"            # Agent-Typ des Inbound Agents (erste Antwort an Leads)
+    },
+    "percentile": 95,        # Hedge-Deadline = p95-Latenz des ersten Providers
+    "default_delay": 2.0,    # Sekunden, solange noch keine Latenzdaten vorliegen
+    "min_delay": 0.25        # Untergrenze, um unnötige Doppelanfragen zu vermeiden
+}
+
+# Rate Limits je Provider (geteilt von allen Agenten eines Prozesses)
+PROVIDER_RATE_LIMITS = {
+    "gemini": {"requests_per_minute": 300, "tokens_per_minute": 1000000, "max_in_flight": 16},
+    "anthropic": {"requests_per_minute": 50, "tokens_per_minute": 40000, "max_in_flight": 5},
+    "deepseek": {"requests_per_minute": 60, "tokens_per_minute": 100000, "max_in_flight": 8},
+    "openai": {"requests_per_minute": 500, "tokens_per_minute": 200000, "max_in_flight": 16}
+}
+
+DEFAULT_PROVIDER_RATE_LIMIT = {"requests_per_minute": 60, "tokens_per_minute": 100000, "max_in_flight": 4}
+
+# Batch-Verarbeitung und Micro-Batching (z.B. Lead-Backfills)
+BATCH_CONFIG = {
+    "max_batch_size": 32,    # Anfragen, ab denen sofort geflusht wird
+    "max_wait_ms": 20,       # Maximale Sammelzeit für gleichzeitige Einzelanfragen
+    "max_concurrency": 8     # Parallele Provider-Aufrufe je Batch
+}
+
+# Token-Budget für Knowledge-Base-Kontext im System-Prompt je Komplexität
+KB_TOKEN_BUDGETS = {
+    TaskComplexity.BASIC: 400,
+    TaskComplexity.MEDIUM: 1200,
+    TaskComplexity.COMPLEX: 2500
+}
+
+# Preise je Modell in USD pro 1 Mio. Tokens (Input, Output) für das Usage-Ledger
+MODEL_PRICING = {
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.0-base": (0.50, 1.50),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "deepseek-coder-6.7b-base": (0.14, 0.28),
+    "deepseek-coder-33b": (0.14, 0.28),
+    "deepseek-chat-67b": (0.14, 0.28)
+}
+
+DEFAULT_MODEL_PRICING = (1.00, 3.00)
+
 def get_task_complexity(task_name: str) -> TaskComplexity:
     """Get the complexity level for a given task."""
     return TASK_COMPLEXITY_MAP.get(task_name, TaskComplexity.MEDIUM)
@@ -84,6 +169,27 @@ def get_model_for_provider(provider: str, complexity: TaskComplexity) -> str:
     """Get the appropriate model for a provider and complexity level."""
     return MODEL_SELECTION[provider][complexity]
 
+def get_cache_ttl(task_name: str) -> int:
+    """Get the response cache TTL in seconds for a task."""
+    return CACHE_TTL_MAP.get(task_name, DEFAULT_CACHE_TTL)
+
+def is_cacheable_by_default(temperature: float) -> bool:
+    """Check whether a completion with this temperature is cached without explicit opt-in."""
+    return temperature <= CACHEABLE_TEMPERATURE_THRESHOLD
+
+def is_hedged_task(task_name: str) -> bool:
+    """Check whether a task should use hedged requests by default."""
+    return task_name in HEDGING_CONFIG["tasks"]
+
+def get_kb_token_budget(task_name: str) -> int:
+    """Get the knowledge base token budget for a task's complexity."""
+    return KB_TOKEN_BUDGETS[get_task_complexity(task_name)]
+
+def calculate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """Calculate the USD cost of a completion from the model's token prices."""
+    input_price, output_price = MODEL_PRICING.get(model, DEFAULT_MODEL_PRICING)
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
 AI_PROVIDER_CONFIG = {
     "basic_tasks": {
         "primary": {
@@ -25,14 +25,21 @@ from agents.pods.delivery.onboarding_agent import OnboardingAgent
 from agents.pods.delivery.developer_agent import DeveloperAgent
 from agents.pods.delivery.delivery_manager_agent import DeliveryManagerAgent
 from agents.pods.operations.finance_agent import FinanceAgent
+from utils.ai_client import close_ai_client
+from utils.migrations import migrate
+from utils.telemetry import get_telemetry_buffer
+from utils.worker_pool import WorkerSupervisor, agent_class_path, parse_worker_specs
 
 class AgentOrchestrator:
     """Zentrale Orchestrierung aller Agenten"""
     
-    def __init__(self):
+    def __init__(self, worker_counts: Dict[str, int] = None):
         self.agents = {}
         self.running = False
         self.tasks = []
+        # Agenten, die in N eigenen Prozessen statt im Haupt-Event-Loop laufen
+        self.worker_counts = worker_counts or {}
+        self.supervisor = WorkerSupervisor()
     
     async def initialize_system(self):
         """Initialisiert das gesamte Agentensystem"""
@@ -45,16 +52,28 @@ class AgentOrchestrator:
         if not self._check_environment():
             return False
         
+        # Ausstehende Schema-Migrationen anwenden
+        applied = migrate()
+        if applied:
+            print(f"🗄️ Datenbank-Schema migriert (Versionen: {', '.join(map(str, applied))})")
+        
         # Initialisiere Agenten
         await self._initialize_agents()
         
+        unknown = sorted(set(self.worker_counts) - set(self.agents))
+        if unknown:
+            print(f"❌ Unbekannte Agenten in --workers: {', '.join(unknown)}")
+            return False
+        
         # Starte Monitoring
         self._setup_signal_handlers()
         
         print("✅ System erfolgreich initialisiert!")
         print("📊 Verfügbare Agenten:")
         for agent_id, agent in self.agents.items():
-            print(f"   - {agent_id}: {agent.name}")
+            workers = self.worker_counts.get(agent_id)
+            suffix = f" ({workers} Worker-Prozesse)" if workers else ""
+            print(f"   - {agent_id}: {agent.name}{suffix}")
         print()
         
         return True
@@ -164,10 +183,19 @@ class AgentOrchestrator:
         try:
             # Starte alle Agenten parallel
             for agent_id, agent in self.agents.items():
+                if agent_id in self.worker_counts:
+                    # Skalierte Agenten konsumieren in eigenen Prozessen aus der Lease-Queue
+                    self.supervisor.add(agent_id, agent_class_path(agent), self.worker_counts[agent_id])
+                    print(f"   ▶️ {agent.name} gestartet ({self.worker_counts[agent_id]} Worker)")
+                    continue
                 task = asyncio.create_task(agent.run_loop())
                 self.tasks.append(task)
                 print(f"   ▶️ {agent.name} gestartet")
             
+            if self.supervisor.slots:
+                self.supervisor.start()
+                self.tasks.append(asyncio.create_task(self.supervisor.supervise()))
+            
             # Starte Dashboard-Task
             dashboard_task = asyncio.create_task(self._dashboard_loop())
             self.tasks.append(dashboard_task)
@@ -210,6 +238,13 @@ class AgentOrchestrator:
         for agent_id, agent in self.agents.items():
             print(f"   {agent_id}: ✅ Aktiv ({agent.name})")
         
+        # Worker-Prozesse skalierter Agenten
+        if self.supervisor.slots:
+            print("\n⚙️ WORKER-PROZESSE:")
+            for worker in self.supervisor.get_status():
+                status_icon = "✅" if worker["alive"] else "❌"
+                print(f"   {worker['worker']}: {status_icon} PID {worker['pid']} (Neustarts: {worker['restarts']})")
+        
         # AI-Provider Status
         try:
             from utils.ai_client import ai_client
@@ -226,7 +261,7 @@ class AgentOrchestrator:
         # CEO Dashboard
         if "CEO-001" in self.agents:
             ceo = self.agents["CEO-001"]
-            dashboard = ceo.get_kpi_dashboard()
+            dashboard = await ceo.get_kpi_dashboard()
             
             print("\n💼 KPI DASHBOARD:")
             for metric, data in dashboard['performance'].items():
@@ -237,7 +272,7 @@ class AgentOrchestrator:
         # Lead Statistics
         if "ACQ-001" in self.agents:
             inbound = self.agents["ACQ-001"]
-            lead_stats = inbound.get_lead_statistics()
+            lead_stats = await inbound.get_lead_statistics()
             
             print("\n📈 LEAD STATISTIKEN:")
             print(f"   Heute: {lead_stats['leads_today']} Leads")
@@ -285,6 +320,15 @@ class AgentOrchestrator:
                 except asyncio.CancelledError:
                     pass
         
+        # Beende Worker-Prozesse (laufende Leases laufen ab und werden neu vergeben)
+        self.supervisor.stop()
+        
+        # Gepufferte KPIs und Aktivitäten schreiben
+        get_telemetry_buffer().close()
+        
+        # Schließe gepoolte HTTP-Verbindungen zu den AI-Providern
+        await close_ai_client()
+        
         print("✅ System erfolgreich beendet")
     
     async def test_system(self):
@@ -520,15 +564,20 @@ def print_help():
 🚀 Berneby Development - Autonomes Agentensystem
 
 VERWENDUNG:
-    python main.py [OPTION]
+    python main.py [OPTION] [--workers AGENT_ID=N ...]
 
 OPTIONEN:
     start       Startet das vollständige Agentensystem
     test        Führt System-Tests durch
     help        Zeigt diese Hilfe an
 
+    --workers AGENT_ID=N
+                Startet den Agenten in N eigenen Prozessen, die sich die
+                Nachrichten teilen (mehrfach oder komma-getrennt angebbar)
+
 BEISPIELE:
     python main.py start     # Startet alle Agenten
+    python main.py start --workers ACQ-002=4 --workers ACQ-001=2
     python main.py test      # Führt Tests durch
 
 ERSTE SCHRITTE:
@@ -547,7 +596,21 @@ async def main():
         return
     
     command = sys.argv[1].lower()
-    orchestrator = AgentOrchestrator()
+    
+    worker_specs = []
+    args = sys.argv[2:]
+    for i, arg in enumerate(args):
+        if arg == "--workers" and i + 1 < len(args):
+            worker_specs.append(args[i + 1])
+        elif arg.startswith("--workers="):
+            worker_specs.append(arg.split("=", 1)[1])
+    try:
+        worker_counts = parse_worker_specs(worker_specs)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    
+    orchestrator = AgentOrchestrator(worker_counts)
     
     if command == "start":
         await orchestrator.run()
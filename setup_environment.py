@@ -6,11 +6,12 @@ Target: 1M€ revenue in 12 months through full automation
 """
 
 import os
-import sqlite3
 import subprocess
 import sys
 from pathlib import Path
 import json
+from utils.connection_manager import get_connection
+from utils.migrations import get_schema_version, migrate
 
 def install_requirements():
     """Install required Python packages"""
@@ -64,92 +65,11 @@ def create_directory_structure():
         print(f"📁 Created directory: {directory}")
 
 def create_database():
-    """Initialize SQLite database with all required tables"""
+    """Initialize SQLite database with all required tables (versioned migrations)"""
     db_path = "database/agent_system.db"
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Agents table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS agents (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        pod TEXT,
-        status TEXT DEFAULT 'active',
-        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # Messages table for agent communication
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sender_id TEXT,
-        receiver_id TEXT,
-        message_type TEXT,
-        content TEXT,
-        metadata TEXT,
-        status TEXT DEFAULT 'pending',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        processed_at TIMESTAMP
-    )
-    """)
-    
-    # Leads table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS leads (
-        id TEXT PRIMARY KEY,
-        source TEXT,
-        contact_data TEXT,
-        qualification_score INTEGER DEFAULT 0,
-        status TEXT DEFAULT 'new',
-        assigned_agent TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # Projects table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        lead_id INTEGER,
-        name TEXT,
-        description TEXT,
-        status TEXT DEFAULT 'setup',
-        budget REAL,
-        deadline DATE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (lead_id) REFERENCES leads(id)
-    )
-    """)
-    
-    # KPIs table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS kpis (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        metric_name TEXT,
-        value REAL,
-        target REAL,
-        period TEXT,
-        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # System state table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS system_state (
-        key TEXT PRIMARY KEY,
-        value TEXT,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized with all tables")
+    applied = migrate(db_path)
+    print(f"✅ Database initialized with all tables (schema version {get_schema_version(db_path)}, applied: {applied or 'none'})")
 
 def create_env_file():
     """Create .env configuration file while preserving existing values"""
@@ -258,7 +178,7 @@ DEBUG_MODE={DEBUG_MODE}               # Enable for detailed logging
 def create_initial_agents():
     """Insert initial agent records into database"""
     db_path = "database/agent_system.db"
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
     
     agents = [
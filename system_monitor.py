@@ -6,11 +6,11 @@ Zeigt Status, KPIs und Gesundheit des Systems
 
 import asyncio
 import json
-import sqlite3
 import sys
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from utils.connection_manager import get_connection
 
 # Add paths
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
@@ -118,7 +118,7 @@ class SystemMonitor:
             }
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Tabellen prüfen
@@ -227,7 +227,7 @@ class SystemMonitor:
         details = []
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Prüfe KPI-Tabelle
@@ -339,7 +339,7 @@ class SystemMonitor:
         print("=" * 30)
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Agenten-Statistiken
@@ -383,7 +383,7 @@ class SystemMonitor:
         print("=" * 35)
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Nachrichten der letzten X Stunden
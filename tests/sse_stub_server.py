@@ -0,0 +1,77 @@
+"""
+Lokaler SSE-Stub-Server für Streaming-Tests
+Simuliert die Streaming-Endpunkte von OpenAI, Anthropic, Gemini und DeepSeek
+"""
+
+import json
+from aiohttp import web
+
+STUB_CHUNKS = ["Sehr geehrte ", "Damen und Herren, ", "anbei unser Angebot."]
+
+def _sse(data, event: str = None) -> bytes:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data if isinstance(data, str) else json.dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+async def _start_stream(request: web.Request) -> web.StreamResponse:
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    # Kommentarzeilen müssen vom Parser ignoriert werden
+    await response.write(b": keep-alive\n\n")
+    return response
+
+async def _openai_compatible(request: web.Request) -> web.StreamResponse:
+    body = await request.json()
+    assert body.get("stream") is True
+    response = await _start_stream(request)
+    for chunk in STUB_CHUNKS:
+        await response.write(_sse({"choices": [{"delta": {"content": chunk}}]}))
+    await response.write(_sse("[DONE]"))
+    return response
+
+async def _anthropic(request: web.Request) -> web.StreamResponse:
+    response = await _start_stream(request)
+    await response.write(_sse({"type": "message_start"}, event="message_start"))
+    for chunk in STUB_CHUNKS:
+        await response.write(_sse(
+            {"type": "content_block_delta", "delta": {"type": "text_delta", "text": chunk}},
+            event="content_block_delta"
+        ))
+    await response.write(_sse({"type": "message_stop"}, event="message_stop"))
+    return response
+
+async def _gemini(request: web.Request) -> web.StreamResponse:
+    assert request.query.get("alt") == "sse"
+    response = await _start_stream(request)
+    for chunk in STUB_CHUNKS:
+        await response.write(_sse({"candidates": [{"content": {"parts": [{"text": chunk}]}}]}))
+    return response
+
+async def _rate_limited(request: web.Request) -> web.Response:
+    return web.Response(status=429, headers={"Retry-After": "0"}, text="slow down")
+
+async def start_stub_server(rate_limited: set = None):
+    """Startet den Stub-Server auf einem freien Port; gibt (runner, base_url) zurück"""
+    rate_limited = rate_limited or set()
+
+    def route(provider, handler):
+        return _rate_limited if provider in rate_limited else handler
+
+    app = web.Application()
+    app.router.add_post("/openai/v1/chat/completions", route("openai", _openai_compatible))
+    app.router.add_post("/deepseek/v1/chat/completions", route("deepseek", _openai_compatible))
+    app.router.add_post("/anthropic/v1/messages", route("anthropic", _anthropic))
+    app.router.add_post("/gemini/v1/models/{model}", route("gemini", _gemini))
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def stub_base_urls(base_url: str) -> dict:
+    """Provider-Basis-URLs, die alle auf den Stub-Server zeigen"""
+    return {provider: f"{base_url}/{provider}" for provider in ["openai", "anthropic", "gemini", "deepseek"]}
@@ -0,0 +1,665 @@
+"""
+Tests für die Nachrichtenzustellung zwischen Agenten
+Testet Push-Benachrichtigung, Lease-basierte Work-Queue, Prioritäts-Dispatch,
+Request/Response, Nachrichten-Codecs, die begrenzte MessageBus-Historie und
+Group Commit gegen eine temporäre SQLite-Datenbank
+"""
+
+import pytest
+import asyncio
+import sqlite3
+import sys
+import os
+import threading
+import time
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import utils.database
+from datetime import datetime, timedelta
+from utils.agent_messaging import (
+    AgentMessage, MessageBus, MessagePriority, create_status_update, create_task_request, create_task_response
+)
+from utils.base_agent import BaseAgent
+from utils.group_commit import GroupCommitWriter
+from utils.message_codec import benchmark, decode_content, get_message_codec
+from utils.message_history import MessageHistoryBuffer
+from utils.message_notifier import MessageNotifier, get_message_notifier
+from utils.work_queue import SQLiteWorkQueue
+
+def create_message_tables(db_path: str):
+    """Minimales Schema für BaseAgent-Nachrichten"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE agents (
+                id TEXT PRIMARY KEY, name TEXT, pod TEXT, status TEXT, last_action TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id TEXT,
+                receiver_id TEXT,
+                message_type TEXT,
+                content TEXT,
+                metadata TEXT,
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                processed_at TIMESTAMP
+            )
+        """)
+
+class RecordingAgent(BaseAgent):
+    """Agent, der empfangene Nachrichten mit Empfangszeit protokolliert"""
+
+    def __init__(self, agent_id: str, db_path: str):
+        super().__init__(agent_id, f"Test Agent {agent_id}", "akquise")
+        self.db_path = db_path
+        self.received = []
+        self.arrived = asyncio.Event()
+
+    async def process_message(self, message):
+        self.received.append((time.monotonic(), message))
+        self.arrived.set()
+        return True
+
+class TestPushDelivery:
+    """Tests für die sofortige Zustellung statt 5-Sekunden-Polling"""
+
+    @pytest.mark.asyncio
+    async def test_send_message_wakes_receiver_immediately(self, tmp_path):
+        """Der Empfänger verarbeitet die Nachricht ohne auf das Polling-Intervall zu warten"""
+        db_path = str(tmp_path / "agents.db")
+        create_message_tables(db_path)
+        sender = RecordingAgent("ACQ-001", db_path)
+        receiver = RecordingAgent("ACQ-002", db_path)
+
+        loop_task = asyncio.create_task(receiver.run_agent_loop())
+        await asyncio.sleep(0.05)  # Empfänger wartet nun im Fallback-Intervall
+
+        sent_at = time.monotonic()
+        await sender.send_message("ACQ-002", "qualify_lead", {"lead_id": 7})
+        await asyncio.wait_for(receiver.arrived.wait(), timeout=2)
+
+        received_at, message = receiver.received[0]
+        assert received_at - sent_at < 1.0
+        assert message["content"] == {"lead_id": 7}
+
+        receiver.stop()
+        await asyncio.wait_for(loop_task, timeout=2)
+
+        with sqlite3.connect(db_path) as conn:
+            status = conn.execute("SELECT status FROM messages").fetchone()[0]
+        assert status == "processed"
+
+    @pytest.mark.asyncio
+    async def test_pending_messages_are_recovered_on_start(self, tmp_path):
+        """Vor dem Start gespeicherte Nachrichten werden beim ersten Durchlauf verarbeitet"""
+        db_path = str(tmp_path / "agents.db")
+        create_message_tables(db_path)
+        sender = RecordingAgent("ACQ-001", db_path)
+        receiver = RecordingAgent("ACQ-002", db_path)
+
+        await sender.send_message("ACQ-002", "qualify_lead", {"lead_id": 1})
+        loop_task = asyncio.create_task(receiver.run_agent_loop())
+        await asyncio.wait_for(receiver.arrived.wait(), timeout=2)
+
+        receiver.stop()
+        await asyncio.wait_for(loop_task, timeout=2)
+        assert len(receiver.received) == 1
+        assert "ACQ-002" not in get_message_notifier()._subscribers
+
+def insert_messages(db_path: str, receiver_id: str, count: int):
+    with sqlite3.connect(db_path) as conn:
+        for i in range(count):
+            conn.execute(
+                "INSERT INTO messages (sender_id, receiver_id, message_type, content, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ("ACQ-001", receiver_id, "qualify_lead", f'{{"lead_id": {i}}}', "{}", f"2025-01-01 00:00:{i:02d}")
+            )
+
+class TestWorkQueue:
+    """Tests für atomaren Claim, Leases, Retries und Dead Letters"""
+
+    def make_queue(self, tmp_path, **kwargs):
+        db_path = str(tmp_path / "queue.db")
+        create_message_tables(db_path)
+        return db_path, SQLiteWorkQueue(db_path, **kwargs)
+
+    def test_batch_claim_in_order_and_exclusive(self, tmp_path):
+        """Ein Batch-Claim liefert die ältesten Nachrichten; ein zweiter Worker bekommt andere"""
+        db_path, queue = self.make_queue(tmp_path)
+        insert_messages(db_path, "ACQ-002", 5)
+
+        first = queue.claim("ACQ-002", "worker-a", limit=3)
+        second = queue.claim("ACQ-002", "worker-b", limit=3)
+
+        assert [m["content"] for m in first] == ['{"lead_id": 0}', '{"lead_id": 1}', '{"lead_id": 2}']
+        assert {m["id"] for m in first}.isdisjoint({m["id"] for m in second})
+        assert len(second) == 2
+        assert queue.claim("ACQ-002", "worker-c") == []
+
+    def test_concurrent_workers_never_double_claim(self, tmp_path):
+        """Parallele Worker-Threads verarbeiten jede Nachricht genau einmal"""
+        db_path, queue = self.make_queue(tmp_path)
+        insert_messages(db_path, "ACQ-002", 40)
+        claimed = []
+
+        def worker(name):
+            worker_queue = SQLiteWorkQueue(db_path)
+            while True:
+                batch = worker_queue.claim("ACQ-002", name, limit=2)
+                if not batch:
+                    return
+                for message in batch:
+                    claimed.append(message["id"])
+                    assert worker_queue.ack(message["id"], name)
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(claimed) == list(range(1, 41))
+        assert queue.get_stats("ACQ-002")["processed"] == 40
+
+    def test_expired_lease_is_reclaimed_and_stale_ack_rejected(self, tmp_path):
+        """Nach Ablauf der Lease (Worker-Absturz) übernimmt ein anderer Worker"""
+        db_path, queue = self.make_queue(tmp_path, visibility_timeout=0.05)
+        insert_messages(db_path, "ACQ-002", 1)
+
+        [message] = queue.claim("ACQ-002", "crashed-worker")
+        assert queue.claim("ACQ-002", "worker-b") == []
+
+        time.sleep(0.1)
+        [reclaimed] = queue.claim("ACQ-002", "worker-b")
+
+        assert reclaimed["id"] == message["id"]
+        assert reclaimed["attempts"] == 2
+        assert queue.ack(message["id"], "crashed-worker") is False
+        assert queue.ack(message["id"], "worker-b") is True
+
+    def test_nack_retries_then_dead_letters(self, tmp_path):
+        """Fehlgeschlagene Nachrichten werden wiederholt und nach max_attempts aussortiert"""
+        db_path, queue = self.make_queue(tmp_path, max_attempts=2, retry_delay=0)
+        insert_messages(db_path, "ACQ-002", 1)
+
+        [message] = queue.claim("ACQ-002", "worker-a")
+        assert queue.nack(message["id"], "worker-a", "LLM timeout") == "pending"
+        [message] = queue.claim("ACQ-002", "worker-a")
+        assert queue.nack(message["id"], "worker-a", "LLM timeout") == "dead"
+        assert queue.claim("ACQ-002", "worker-a") == []
+
+        [dead] = queue.list_dead_letters("ACQ-002")
+        assert dead["attempts"] == 2 and dead["last_error"] == "LLM timeout"
+
+        assert queue.requeue_dead_letter(dead["id"]) is True
+        [message] = queue.claim("ACQ-002", "worker-a")
+        assert message["attempts"] == 1
+        assert queue.get_stats()["dead_letters"] == 0
+
+    def test_exhausted_expired_lease_goes_to_dead_letters(self, tmp_path):
+        """Stürzt ein Worker beim letzten Versuch ab, landet die Nachricht im Dead Letter"""
+        db_path, queue = self.make_queue(tmp_path, max_attempts=1, visibility_timeout=0.01)
+        insert_messages(db_path, "ACQ-002", 1)
+
+        queue.claim("ACQ-002", "crashed-worker")
+        time.sleep(0.05)
+
+        assert queue.claim("ACQ-002", "worker-b") == []
+        assert queue.list_dead_letters()[0]["last_error"] == "lease expired"
+
+    @pytest.mark.asyncio
+    async def test_agent_releases_failed_messages_for_retry(self, tmp_path):
+        """Eine Exception in process_message gibt die Nachricht für einen neuen Versuch frei"""
+        db_path = str(tmp_path / "agents.db")
+        create_message_tables(db_path)
+        agent = RecordingAgent("ACQ-002", db_path)
+        agent.message_queue.retry_delay = 0
+        insert_messages(db_path, "ACQ-002", 1)
+        attempts = []
+
+        async def flaky(message):
+            attempts.append(message["attempts"])
+            if len(attempts) == 1:
+                raise RuntimeError("temporärer Fehler")
+            agent.stop()
+            return True
+
+        agent.process_message = flaky
+        await asyncio.wait_for(agent.run_agent_loop(), timeout=2)
+
+        assert attempts == [1, 2]
+        assert agent.message_queue.get_stats("ACQ-002")["processed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_leases_outlive_slow_processing(self, tmp_path):
+        """Dauert ein Batch länger als die Lease, übernimmt kein anderer Worker die wartenden Nachrichten"""
+        db_path = str(tmp_path / "agents.db")
+        create_message_tables(db_path)
+        agent = RecordingAgent("ACQ-002", db_path)
+        agent.message_queue.visibility_timeout = 0.3
+        insert_messages(db_path, "ACQ-002", 3)
+        other = SQLiteWorkQueue(db_path)
+        stolen = []
+
+        async def slow(message):
+            # Länger als die Lease; währenddessen versucht ein zweiter Worker zu claimen
+            for _ in range(4):
+                await asyncio.sleep(0.05)
+                stolen.extend(row["id"] for row in other.claim("ACQ-002", "other-worker", limit=3))
+            agent.received.append(message["id"])
+            if len(agent.received) == 3:
+                agent.stop()
+            return True
+
+        agent.process_message = slow
+        await asyncio.wait_for(agent.run_agent_loop(), timeout=5)
+
+        assert stolen == []
+        assert agent.received == [1, 2, 3]
+        assert agent.message_queue.get_stats("ACQ-002")["processed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_lost_lease_is_not_processed_twice(self, tmp_path):
+        """Wurde eine wartende Nachricht nach Ablauf übernommen, überspringt der Agent sie"""
+        db_path = str(tmp_path / "agents.db")
+        create_message_tables(db_path)
+        agent = RecordingAgent("ACQ-002", db_path)
+        agent.message_queue.visibility_timeout = 0.05
+        insert_messages(db_path, "ACQ-002", 2)
+        other = SQLiteWorkQueue(db_path)
+        taken_over = []
+
+        async def stalled(message):
+            if not taken_over:
+                # Erste Nachricht hängt, bis die Lease der zweiten abgelaufen ist
+                await asyncio.sleep(0.1)
+                taken_over.extend(row["id"] for row in other.claim("ACQ-002", "other-worker", limit=3))
+            agent.received.append(message["id"])
+            agent.stop()
+            return True
+
+        agent.process_message = stalled
+        await asyncio.wait_for(agent.run_agent_loop(), timeout=5)
+
+        assert 2 in taken_over
+        assert 2 not in agent.received
+        assert other.ack(2, "other-worker") is True
+
+class TestMessageNotifier:
+    """Tests für den In-Process-Notifier"""
+
+    @pytest.mark.asyncio
+    async def test_notify_without_subscribers_is_noop(self):
+        """Nachrichten an nicht laufende Agenten bleiben nur in SQLite"""
+        notifier = MessageNotifier()
+
+        assert notifier.notify("SALES-001") is False
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out_as_fallback(self):
+        """Ohne Benachrichtigung endet das Warten nach dem Fallback-Intervall"""
+        notifier = MessageNotifier()
+        inbox = notifier.subscribe("SALES-001")
+
+        assert await notifier.wait(inbox, timeout=0.01) is False
+        assert notifier.get_stats()["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_notify_from_other_thread(self):
+        """Benachrichtigungen aus anderen Threads werden threadsicher zugestellt"""
+        notifier = MessageNotifier()
+        inbox = notifier.subscribe("SALES-001")
+
+        threading.Thread(target=notifier.notify, args=("SALES-001",)).start()
+
+        assert await notifier.wait(inbox, timeout=2) is True
+
+class TestMessageHistory:
+    """Tests für den Ringpuffer der MessageBus-Historie"""
+
+    def make_message(self, sender: str, receiver: str, index: int):
+        message = create_status_update(sender, receiver, "update", {"index": index})
+        message.timestamp = f"2025-01-01T00:00:{index:02d}"
+        return message
+
+    def test_capacity_is_bounded_and_index_pruned(self):
+        """Älteste Einträge werden verdrängt, Agent-Indizes schrumpfen mit"""
+        history = MessageHistoryBuffer(capacity=3)
+        for i in range(5):
+            history.append(self.make_message("ACQ-001", f"SALES-00{i}", i))
+
+        assert len(history) == 3
+        assert [m.payload["data"]["index"] for m in history] == [2, 3, 4]
+        assert history.count("ACQ-001") == 3
+        assert history.count("SALES-000") == 0 and "SALES-000" not in history._by_agent
+        assert history.get_stats()["evicted"] == 2
+
+    def test_recent_per_agent_newest_first(self):
+        """Der Agent-Index liefert nur eigene Nachrichten, neueste zuerst"""
+        history = MessageHistoryBuffer(capacity=10)
+        for i in range(6):
+            history.append(self.make_message("ACQ-001" if i % 2 else "CEO-001", "OPS-001", i))
+
+        assert [m.payload["data"]["index"] for m in history.recent("ACQ-001", limit=2)] == [5, 3]
+        assert [m.payload["data"]["index"] for m in history.recent("OPS-001", limit=10)] == [5, 4, 3, 2, 1, 0]
+        assert history.recent("unbekannt") == []
+
+    def test_bus_falls_back_to_sqlite_for_older_entries(self, tmp_path, monkeypatch):
+        """Verdrängte Einträge werden aus SQLite nachgeladen"""
+        monkeypatch.setattr(utils.database, "DATABASE_PATH", str(tmp_path / "bus.db"))
+        utils.database.create_database_schema()
+        bus = MessageBus(history_size=3, db_path=str(tmp_path / "bus.db"))
+        for i in range(6):
+            bus.publish(self.make_message("ACQ-001", "ACQ-002", i))
+
+        with patch.object(bus, "_load_history", wraps=bus._load_history) as load:
+            recent = bus.get_message_history("ACQ-002", limit=3)
+            load.assert_not_called()
+            everything = bus.get_message_history("ACQ-002", limit=10)
+            load.assert_called_once()
+
+        assert [m.payload["data"]["index"] for m in recent] == [5, 4, 3]
+        assert [m.payload["data"]["index"] for m in everything] == [5, 4, 3, 2, 1, 0]
+        assert len(bus.message_history) == 3
+
+class TestGroupCommit:
+    """Tests für gebündelte Schreibzugriffe des MessageBus"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.writers = []
+
+    def teardown_method(self):
+        for writer in self.writers:
+            writer.close()
+
+    def make_writer(self, tmp_path, **kwargs):
+        db_path = str(tmp_path / "writes.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, value TEXT)")
+        writer = GroupCommitWriter(lambda: sqlite3.connect(db_path), **kwargs)
+        self.writers.append(writer)
+        return db_path, writer
+
+    def read_values(self, db_path):
+        with sqlite3.connect(db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT value FROM events ORDER BY id")]
+
+    def test_writes_are_coalesced_in_order(self, tmp_path):
+        """Viele Einzel-Inserts und Updates landen in wenigen Transaktionen, Reihenfolge bleibt"""
+        db_path, writer = self.make_writer(tmp_path, interval_ms=50, max_rows=1000)
+        for i in range(100):
+            writer.submit("INSERT INTO events (id, value) VALUES (?, ?)", (i, "pending"))
+            writer.submit("UPDATE events SET value = ? WHERE id = ?", (f"done-{i}", i))
+        writer.flush()
+
+        assert self.read_values(db_path) == [f"done-{i}" for i in range(100)]
+        stats = writer.get_stats()
+        assert stats["writes"] == 200
+        assert stats["commits"] < 10
+
+    def test_durable_write_is_committed_on_return(self, tmp_path):
+        """Durable Writes warten nicht auf das Intervall und sind sofort sichtbar"""
+        db_path, writer = self.make_writer(tmp_path, interval_ms=10_000)
+        writer.submit("INSERT INTO events (value) VALUES (?)", ("normal",))
+
+        started = time.monotonic()
+        writer.submit("INSERT INTO events (value) VALUES (?)", ("kritisch",), durable=True)
+
+        assert time.monotonic() - started < 1
+        assert self.read_values(db_path) == ["normal", "kritisch"]
+
+    def test_failing_write_does_not_drop_batch(self, tmp_path):
+        """Ein fehlerhafter Eintrag wird isoliert; durable Aufrufer erhalten den Fehler"""
+        db_path, writer = self.make_writer(tmp_path, interval_ms=10_000)
+        writer.submit("INSERT INTO events (id, value) VALUES (?, ?)", (1, "a"))
+
+        with pytest.raises(sqlite3.IntegrityError):
+            writer.submit("INSERT INTO events (id, value) VALUES (?, ?)", (1, "doppelt"), durable=True)
+
+        assert self.read_values(db_path) == ["a"]
+        assert writer.get_stats()["errors"] == 1
+
+    def test_close_flushes_pending_writes(self, tmp_path):
+        """Der Shutdown-Hook schreibt gepufferte Einträge"""
+        db_path, writer = self.make_writer(tmp_path, interval_ms=10_000)
+        writer.submit("INSERT INTO events (value) VALUES (?)", ("vor shutdown",))
+        writer.close()
+        writer.submit("INSERT INTO events (value) VALUES (?)", ("nach shutdown",))
+
+        assert self.read_values(db_path) == ["vor shutdown", "nach shutdown"]
+
+    def test_bus_publish_and_mark_processed(self, tmp_path, monkeypatch):
+        """Der MessageBus liest seine eigenen gebündelten Writes"""
+        monkeypatch.setattr(utils.database, "DATABASE_PATH", str(tmp_path / "bus.db"))
+        utils.database.create_database_schema()
+        bus = MessageBus(db_path=str(tmp_path / "bus.db"))
+        self.writers.append(bus.writer)
+
+        ids = [bus.publish(create_status_update("ACQ-001", "ACQ-002", "update", {"index": i})) for i in range(20)]
+        bus.mark_message_processed(ids[0])
+
+        assert len(bus.get_unprocessed_messages("ACQ-002")) == 19
+        assert bus.writer.get_stats()["commits"] < 20
+
+class TestPriorityDispatch:
+    """Tests für numerische Prioritäten und Aging im MessageBus"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.bus = None
+
+    def teardown_method(self):
+        if self.bus:
+            self.bus.close()
+
+    def make_bus(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(utils.database, "DATABASE_PATH", str(tmp_path / "bus.db"))
+        utils.database.create_database_schema()
+        self.bus = MessageBus(db_path=str(tmp_path / "bus.db"))
+        return self.bus
+
+    def publish(self, priority: MessagePriority, task: str, age_seconds: float = 0):
+        message = create_task_request("CEO-001", "ACQ-002", task, {}, priority=priority)
+        message.timestamp = (datetime.utcnow() - timedelta(seconds=age_seconds)).isoformat()
+        self.bus.publish(message)
+
+    def test_urgent_preempts_older_bulk_work(self, tmp_path, monkeypatch):
+        """Dringende Nachrichten werden vor älterer Bulk-Arbeit zugestellt (nicht alphabetisch)"""
+        self.make_bus(tmp_path, monkeypatch)
+        self.publish(MessagePriority.LOW, "bulk", age_seconds=30)
+        self.publish(MessagePriority.NORMAL, "routine", age_seconds=20)
+        self.publish(MessagePriority.HIGH, "wichtig", age_seconds=10)
+        self.publish(MessagePriority.URGENT, "compliance")
+
+        pending = [m.payload["task"] for m in self.bus.get_unprocessed_messages("ACQ-002")]
+        claimed = [m.payload["task"] for m in self.bus.claim_messages("ACQ-002", "worker-a", limit=4)]
+
+        assert pending == claimed == ["compliance", "wichtig", "routine", "bulk"]
+
+    def test_aged_low_priority_is_not_starved(self, tmp_path, monkeypatch):
+        """Lange wartende Low-Priority-Nachrichten steigen bis 'high' auf, nie über 'urgent'"""
+        bus = self.make_bus(tmp_path, monkeypatch)
+        bus.work_queue.priority_aging = 60
+        self.publish(MessagePriority.NORMAL, "neu")
+        self.publish(MessagePriority.LOW, "alt", age_seconds=600)
+        self.publish(MessagePriority.URGENT, "eskalation")
+
+        claimed = [m.payload["task"] for m in bus.claim_messages("ACQ-002", "worker-a", limit=3)]
+
+        assert claimed == ["eskalation", "alt", "neu"]
+
+    def test_existing_table_is_migrated(self, tmp_path):
+        """Bestehende agent_messages-Tabellen erhalten priority_num aus der Text-Spalte"""
+        db_path = str(tmp_path / "old.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE agent_messages (
+                    id TEXT PRIMARY KEY, sender_id TEXT, receiver_id TEXT, message_type TEXT,
+                    content TEXT, priority TEXT, status TEXT DEFAULT 'pending', created_at TEXT, processed_at TEXT
+                )
+            """)
+            for i, priority in enumerate(["high", "urgent", "low", "normal"]):
+                conn.execute(
+                    "INSERT INTO agent_messages (id, sender_id, receiver_id, message_type, content, priority, created_at) "
+                    "VALUES (?, 'CEO-001', 'ACQ-002', 'task_request', '{}', ?, ?)",
+                    (f"m{i}", priority, datetime.utcnow().isoformat())
+                )
+        queue = SQLiteWorkQueue(db_path, table="agent_messages", priority_column="priority_num")
+
+        claimed = [row["priority"] for row in queue.claim("ACQ-002", "worker-a", limit=4)]
+
+        assert claimed == ["urgent", "high", "normal", "low"]
+        with sqlite3.connect(db_path) as conn:
+            plan = " ".join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM agent_messages "
+                "WHERE receiver_id = 'ACQ-002' AND status = 'pending' ORDER BY priority_num DESC, created_at"
+            ))
+        assert "idx_agent_messages_dispatch" in plan
+
+class TestBusRequest:
+    """Tests für awaitbare Requests mit Korrelation über correlation_id"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.buses = []
+
+    def teardown_method(self):
+        for bus in self.buses:
+            bus.close()
+
+    def make_bus(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / "bus.db")
+        monkeypatch.setattr(utils.database, "DATABASE_PATH", db_path)
+        if not os.path.exists(db_path):
+            utils.database.create_database_schema()
+        bus = MessageBus(db_path=db_path)
+        self.buses.append(bus)
+        return bus
+
+    @pytest.mark.asyncio
+    async def test_request_resolves_from_subscriber_response(self, tmp_path, monkeypatch):
+        """Solution Architect wartet direkt auf die Antwort des Pricing Agents"""
+        bus = self.make_bus(tmp_path, monkeypatch)
+
+        async def pricing_agent(request):
+            bus.respond(request, "SALES-005", {"price": 25000})
+
+        bus.subscribe("SALES-005", pricing_agent)
+        request = create_task_request("SALES-002", "SALES-005", "calculate_pricing", {"components": 3})
+
+        started = time.monotonic()
+        response = await bus.request(request, timeout=2, poll_interval=10)
+
+        assert time.monotonic() - started < 1
+        assert response.correlation_id == request.message_id
+        assert response.payload == {"result": {"price": 25000}, "success": True}
+        assert bus.get_unprocessed_messages("SALES-002") == []
+        assert bus.get_request_stats()["resolved_in_memory"] == 1
+
+    @pytest.mark.asyncio
+    async def test_response_from_other_process_is_found_in_sqlite(self, tmp_path, monkeypatch):
+        """Antworten, die ein anderer Prozess schreibt, werden über SQLite gefunden"""
+        bus = self.make_bus(tmp_path, monkeypatch)
+        other_process = self.make_bus(tmp_path, monkeypatch)
+        request = create_task_request("SALES-002", "SALES-005", "calculate_pricing", {})
+
+        async def respond_later():
+            await asyncio.sleep(0.05)
+            other_process.publish(create_task_response(request, "SALES-005", {"price": 1}), durable=True)
+
+        responder = asyncio.create_task(respond_later())
+        response = await bus.request(request, timeout=2, poll_interval=0.02)
+        await responder
+
+        assert response.payload["result"] == {"price": 1}
+        assert bus.get_request_stats()["resolved_from_db"] == 1
+
+    @pytest.mark.asyncio
+    async def test_sqlite_fallback_decodes_only_the_matching_response(self, tmp_path, monkeypatch):
+        """Der Fallback filtert per correlation_id in SQL statt alle offenen Antworten zu dekodieren"""
+        bus = self.make_bus(tmp_path, monkeypatch)
+        other_process = self.make_bus(tmp_path, monkeypatch)
+        request = create_task_request("SALES-002", "SALES-005", "calculate_pricing", {})
+        for i in range(20):
+            unrelated = create_task_request("SALES-002", "SALES-005", "calculate_pricing", {"i": i})
+            other_process.publish(create_task_response(unrelated, "SALES-005", {"price": i}))
+        other_process.publish(create_task_response(request, "SALES-005", {"price": 99}), durable=True)
+
+        with patch("utils.agent_messaging.decode_content", wraps=decode_content) as decode:
+            response = await bus._find_response(request.message_id, "SALES-002")
+
+        assert response.payload["result"] == {"price": 99}
+        assert decode.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_request_times_out(self, tmp_path, monkeypatch):
+        """Ohne Antwort endet request() mit TimeoutError und räumt die Registry auf"""
+        bus = self.make_bus(tmp_path, monkeypatch)
+        request = create_task_request("SALES-002", "SALES-005", "calculate_pricing", {})
+
+        with pytest.raises(asyncio.TimeoutError):
+            await bus.request(request, timeout=0.05, poll_interval=0.02)
+
+        stats = bus.get_request_stats()
+        assert stats["timeouts"] == 1 and stats["pending"] == 0
+
+class TestMessageCodec:
+    """Tests für slotted AgentMessage und austauschbare content-Codecs"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.message = create_task_request(
+            "SALES-002", "SALES-005", "calculate_pricing", {"hours": [40, 80]}, lead_id="lead-1"
+        )
+
+    def test_message_is_slotted_and_round_trips(self):
+        """AgentMessage hat kein __dict__; to_dict/from_dict verändern die Eingabe nicht"""
+        data = self.message.to_dict()
+        copy = AgentMessage.from_dict(data)
+
+        assert not hasattr(self.message, "__dict__")
+        assert data["priority"] == "normal" and data["message_type"] == "task_request"
+        assert copy == self.message
+
+    @pytest.mark.parametrize("codec_name", ["json", "orjson"])
+    def test_text_codecs_store_plain_json(self, codec_name):
+        """orjson und json schreiben kompatiblen JSON-Text"""
+        pytest.importorskip(codec_name)
+        encoded = get_message_codec(codec_name).encode(self.message.content_dict())
+
+        assert isinstance(encoded, str)
+        assert decode_content(encoded) == self.message.content_dict()
+
+    def test_msgpack_blobs_are_detected_on_read(self, tmp_path, monkeypatch):
+        """msgpack-BLOBs und JSON-Text lassen sich in derselben Tabelle mischen"""
+        pytest.importorskip("msgpack")
+        monkeypatch.setattr(utils.database, "DATABASE_PATH", str(tmp_path / "bus.db"))
+        utils.database.create_database_schema()
+        json_bus = MessageBus(codec=get_message_codec("json"))
+        msgpack_bus = MessageBus(codec=get_message_codec("msgpack"))
+        json_bus.publish(create_status_update("ACQ-001", "ACQ-002", "json", {}), durable=True)
+        msgpack_bus.publish(create_status_update("ACQ-001", "ACQ-002", "msgpack", {}), durable=True)
+
+        statuses = sorted(m.payload["status"] for m in json_bus.get_unprocessed_messages("ACQ-002"))
+        json_bus.close()
+        msgpack_bus.close()
+
+        assert statuses == ["json", "msgpack"]
+
+    def test_unknown_codec_is_rejected(self):
+        with pytest.raises(ValueError):
+            get_message_codec("xml")
+
+    def test_benchmark_reports_every_available_codec(self):
+        """Der Microbenchmark liefert Zeiten je Codec inklusive altem asdict-Pfad"""
+        results = benchmark(iterations=10)
+
+        assert {"legacy", "json"} <= set(results)
+        assert all(timings["encode_us"] > 0 and timings["bytes"] > 0 for timings in results.values())
@@ -0,0 +1,643 @@
+"""
+Tests für den Multi-Provider AI Client
+Testet Connection-Pooling, Response-Cache, Circuit Breaker, Hedging,
+Rate Limiting, Streaming, Batching, Usage-Ledger und Provider-Routing ohne echte API-Aufrufe
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import tempfile
+import sqlite3
+import threading
+from contextlib import closing
+from unittest.mock import AsyncMock, patch
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+for key in ["OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GEMINI_API_KEY", "DEEPSEEK_API_KEY"]:
+    os.environ.setdefault(key, "test-key")
+os.environ.setdefault("LLM_USAGE_DB_PATH", os.path.join(tempfile.mkdtemp(), "usage.db"))
+
+from utils.ai_client import MultiProviderAIClient
+from utils.llm_cache import LLMResponseCache
+from utils.micro_batcher import MicroBatcher
+from utils.usage_ledger import UsageLedger
+from utils.provider_health import ProviderCircuitBreaker, ProviderHealthRegistry, CircuitState
+from sse_stub_server import start_stub_server, stub_base_urls, STUB_CHUNKS
+from utils.rate_limiter import (
+    AsyncTokenBucket, ProviderRateLimiter, RateLimiterRegistry, RateLimitError, parse_retry_after
+)
+
+class TestConnectionPool:
+    """Tests für die gepoolte HTTP-Session"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.client = MultiProviderAIClient(pool_limit_per_host=5, dns_cache_ttl=60)
+
+    @pytest.mark.asyncio
+    async def test_session_is_reused_across_calls(self):
+        """Die Session wird pro Event-Loop nur einmal angelegt"""
+        first = await self.client._get_session()
+        second = await self.client._get_session()
+
+        assert first is second
+        assert first.connector.limit_per_host == 5
+
+        await self.client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_chat_completion_keeps_session_open(self):
+        """chat_completion schließt den Pool nach dem Aufruf nicht mehr"""
+        session = await self.client._get_session()
+
+        with patch.object(self.client, '_call_provider', new_callable=AsyncMock) as mock_call:
+            mock_call.return_value = "ok"
+            result = await self.client.chat_completion(
+                [{"role": "user", "content": "Hallo"}],
+                task_name="validate_input"
+            )
+
+        assert result == "ok"
+        assert not session.closed
+        assert await self.client._get_session() is session
+
+        await self.client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_sessions(self):
+        """aclose schließt alle Sessions und ein neuer Aufruf erzeugt einen frischen Pool"""
+        session = await self.client._get_session()
+        await self.client.aclose()
+
+        assert session.closed
+
+        fresh = await self.client._get_session()
+        assert fresh is not session
+
+        await self.client.aclose()
+
+class TestResponseCache:
+    """Tests für den content-adressierten Response-Cache"""
+
+    MESSAGES = [{"role": "user", "content": "Prüfe diese Eingabe"}]
+
+    @pytest.mark.asyncio
+    async def test_deterministic_calls_are_cached(self, tmp_path):
+        """Identische Anfragen mit niedriger Temperature treffen den Cache"""
+        cache = LLMResponseCache(db_path=str(tmp_path / "cache.db"))
+        client = MultiProviderAIClient(response_cache=cache)
+
+        with patch.object(client, '_call_provider', new_callable=AsyncMock) as mock_call:
+            mock_call.return_value = "gültig"
+            first = await client.chat_completion(self.MESSAGES, task_name="validate_input", temperature=0.1)
+            second = await client.chat_completion(self.MESSAGES, task_name="validate_input", temperature=0.1)
+
+        assert first == second == "gültig"
+        mock_call.assert_called_once()
+        assert client.get_cache_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_creative_calls_bypass_cache_unless_opted_in(self, tmp_path):
+        """Höhere Temperature wird nur mit cache=True gecacht"""
+        cache = LLMResponseCache(db_path=str(tmp_path / "cache.db"))
+        client = MultiProviderAIClient(response_cache=cache)
+
+        with patch.object(client, '_call_provider', new_callable=AsyncMock) as mock_call:
+            mock_call.return_value = "Text"
+            await client.chat_completion(self.MESSAGES, task_name="proposal_drafting", temperature=0.7)
+            await client.chat_completion(self.MESSAGES, task_name="proposal_drafting", temperature=0.7)
+            assert mock_call.call_count == 2
+
+            await client.chat_completion(self.MESSAGES, task_name="proposal_drafting", temperature=0.7, cache=True)
+            await client.chat_completion(self.MESSAGES, task_name="proposal_drafting", temperature=0.7, cache=True)
+            assert mock_call.call_count == 3
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Einträge werden aus der SQLite-Stufe nachgeladen"""
+        db_path = str(tmp_path / "cache.db")
+        key = LLMResponseCache.make_key("gemini", "gemini-1.5-flash", self.MESSAGES, 0.1, 100)
+
+        LLMResponseCache(db_path=db_path).set(key, "persistiert", ttl=60)
+        fresh = LLMResponseCache(db_path=db_path)
+
+        assert fresh.get(key) == "persistiert"
+        assert fresh.get_stats()["disk_hits"] == 1
+
+    def test_lru_eviction_and_expiry(self):
+        """Der Speicher-Tier verdrängt alte und abgelaufene Einträge"""
+        cache = LLMResponseCache(max_entries=2, db_path=None)
+        cache.set("a", "1", ttl=60)
+        cache.set("b", "2", ttl=60)
+        cache.get("a")
+        cache.set("c", "3", ttl=60)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+
+        cache._memory["a"] = (0, "1")
+        assert cache.get("a") is None
+
+    def test_disk_tier_purges_expired_rows_and_caps_size(self, tmp_path):
+        """Abgelaufene Zeilen werden beim Schreiben gelöscht, die Tabelle bleibt unter dem Limit"""
+        db_path = str(tmp_path / "cache.db")
+        cache = LLMResponseCache(db_path=db_path, max_disk_entries=3, purge_interval=0)
+        cache.set("expired", "alt", ttl=60)
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("UPDATE llm_response_cache SET expires_at = 0 WHERE cache_key = 'expired'")
+            conn.commit()
+
+        for ttl, key in enumerate("abcde", start=10):
+            cache.set(key, key.upper(), ttl=ttl)
+
+        with closing(sqlite3.connect(db_path)) as conn:
+            keys = {row[0] for row in conn.execute("SELECT cache_key FROM llm_response_cache")}
+        # Die am frühesten ablaufenden Einträge fallen zuerst heraus
+        assert keys == {"c", "d", "e"}
+        assert cache.get_stats()["disk_purged"] == 3
+
+    def test_purge_respects_interval(self, tmp_path):
+        """Zwischen zwei Aufräumläufen wird nur geschrieben"""
+        db_path = str(tmp_path / "cache.db")
+        cache = LLMResponseCache(db_path=db_path, max_disk_entries=1, purge_interval=3600)
+        cache.set("a", "1", ttl=60)
+        cache.set("b", "2", ttl=60)
+        assert cache.get_stats()["disk_purged"] == 0
+
+        assert cache.purge() == 1
+        assert cache.get_stats()["disk_purged"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_disk_tier_runs_off_the_event_loop(self, tmp_path):
+        """get_async/set_async lesen und schreiben die Platte im Writer-Thread"""
+        db_path = str(tmp_path / "cache.db")
+        loop_thread = threading.get_ident()
+        disk_threads = []
+        cache = LLMResponseCache(db_path=db_path)
+        original_disk_set = cache._disk_set
+
+        def tracking_disk_set(*args):
+            disk_threads.append(threading.get_ident())
+            return original_disk_set(*args)
+
+        cache._disk_set = tracking_disk_set
+        await cache.set_async("k", "wert", ttl=60)
+        fresh = LLMResponseCache(db_path=db_path)
+
+        assert await fresh.get_async("k") == "wert"
+        assert await fresh.get_async("fehlt") is None
+        assert disk_threads and loop_thread not in disk_threads
+        assert fresh.get_stats()["disk_hits"] == 1
+        assert fresh.get_stats()["misses"] == 1
+
+class FakeClock:
+    """Steuerbare Uhr für Circuit-Breaker-Tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestCircuitBreaker:
+    """Tests für Circuit Breaker und Health-Routing"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.clock = FakeClock()
+        self.breaker = ProviderCircuitBreaker(
+            window_size=10, min_calls=3, failure_rate_threshold=0.5,
+            open_seconds=30, clock=self.clock
+        )
+
+    def test_opens_after_error_rate_and_probes_half_open(self):
+        """Nach zu vielen Fehlern öffnet der Circuit, nach der Wartezeit folgt genau eine Probe"""
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        assert self.breaker.state == CircuitState.OPEN
+        assert not self.breaker.allow_request()
+
+        self.clock.now = 31
+        assert self.breaker.allow_request()
+        assert self.breaker.state == CircuitState.HALF_OPEN
+        assert not self.breaker.allow_request()
+
+        self.breaker.record_success(0.2)
+        assert self.breaker.state == CircuitState.CLOSED
+
+    def test_failed_probe_reopens(self):
+        """Eine fehlgeschlagene Probe öffnet den Circuit erneut"""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 31
+        assert self.breaker.allow_request()
+
+        self.breaker.record_failure()
+        assert self.breaker.state == CircuitState.OPEN
+        assert not self.breaker.is_available()
+
+    def test_routing_dedupes_skips_open_and_prefers_fastest(self):
+        """Doppelte Provider entfallen, offene werden übersprungen, schnellere zuerst"""
+        registry = ProviderHealthRegistry(min_calls=2, clock=self.clock)
+        for _ in range(2):
+            registry.get("gemini", "g").record_success(3.0)
+            registry.get("anthropic", "a").record_success(0.5)
+            registry.get("deepseek", "d").record_failure()
+
+        ordered = registry.order_candidates([
+            ("gemini", "g"), ("gemini", "g"), ("deepseek", "d"), ("anthropic", "a")
+        ])
+
+        assert ordered == [("anthropic", "a"), ("gemini", "g")]
+
+    @pytest.mark.asyncio
+    async def test_chat_completion_skips_open_circuit(self):
+        """Ein ausgefallener Provider wird nach dem Öffnen nicht mehr angefragt"""
+        client = MultiProviderAIClient()
+        client.health = ProviderHealthRegistry(min_calls=2, clock=self.clock)
+        calls = []
+
+        async def fake_call(provider, **kwargs):
+            calls.append(provider)
+            if provider == "gemini":
+                raise Exception("timeout")
+            return f"ok from {provider}"
+
+        with patch.object(client, '_call_provider', side_effect=fake_call):
+            for _ in range(2):
+                await client.chat_completion([{"role": "user", "content": "x"}], task_name="validate_input")
+            calls.clear()
+            result = await client.chat_completion([{"role": "user", "content": "x"}], task_name="validate_input")
+
+        assert result == "ok from deepseek"
+        assert calls == ["deepseek"]
+
+class TestHedgedRequests:
+    """Tests für Hedged Requests bei latenzkritischen Tasks"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.client = MultiProviderAIClient()
+        self.cancelled = []
+
+    async def _fake_call(self, provider, **kwargs):
+        try:
+            await asyncio.sleep(1.0 if provider == "gemini" else 0.01)
+        except asyncio.CancelledError:
+            self.cancelled.append(provider)
+            raise
+        return f"ok from {provider}"
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        """Überschreitet der erste Provider die Deadline, gewinnt der zweite"""
+        with patch.object(self.client, '_call_provider', side_effect=self._fake_call), \
+             patch.object(self.client, '_hedge_delay', return_value=0.05):
+            result = await self.client.chat_completion(
+                [{"role": "user", "content": "Lead?"}], task_name="basic_classification"
+            )
+
+        assert result == "ok from deepseek"
+        assert self.cancelled == ["gemini"]
+        assert self.client.health.get("gemini", "gemini-1.0-base").error_rate == 0
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_for_regular_tasks(self):
+        """Nicht latenzkritische Tasks warten auf den ersten Provider"""
+        with patch.object(self.client, '_call_provider', side_effect=self._fake_call) as mock_call, \
+             patch.object(self.client, '_hedge_delay', return_value=0.05):
+            result = await self.client.chat_completion(
+                [{"role": "user", "content": "Analyse"}], task_name="needs_analysis"
+            )
+
+        assert result == "ok from gemini"
+        assert mock_call.call_count == 1
+
+class TestRateLimiting:
+    """Tests für Token-Buckets, Concurrency-Limit und 429-Backoff"""
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_waits_when_empty(self):
+        """Ist der Bucket leer, wird bis zur Nachfüllung gewartet"""
+        clock = FakeClock()
+        bucket = AsyncTokenBucket(rate_per_minute=60, capacity=1, clock=clock)
+
+        assert await bucket.acquire() == 0.0
+
+        async def advance_clock(delay):
+            clock.now += delay
+
+        with patch('utils.rate_limiter.asyncio.sleep', side_effect=advance_clock):
+            waited = await bucket.acquire()
+
+        assert waited == pytest.approx(1.0)
+
+    @pytest.mark.asyncio
+    async def test_max_in_flight_is_enforced(self):
+        """Es laufen nie mehr Anfragen parallel als max_in_flight"""
+        limiter = ProviderRateLimiter(requests_per_minute=1000, tokens_per_minute=100000, max_in_flight=2)
+        active = []
+        peak = []
+
+        async def request():
+            async with limiter.slot(10):
+                active.append(1)
+                peak.append(len(active))
+                await asyncio.sleep(0.01)
+                active.pop()
+
+        await asyncio.gather(*[request() for _ in range(6)])
+
+        assert max(peak) == 2
+        assert limiter.stats["requests"] == 6
+
+    @pytest.mark.asyncio
+    async def test_limiter_is_shared_across_event_loops(self):
+        """Ein Limiter funktioniert auch in weiteren Event-Loops (z.B. asyncio.run in einem Thread)"""
+        limiter = ProviderRateLimiter(requests_per_minute=600, tokens_per_minute=100000, max_in_flight=1)
+
+        async def requests():
+            async def request():
+                async with limiter.slot(10):
+                    await asyncio.sleep(0.01)
+            await asyncio.gather(*[request() for _ in range(3)])
+
+        await requests()
+        errors = []
+
+        def other_loop():
+            try:
+                asyncio.run(requests())
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=other_loop)
+        thread.start()
+        await requests()
+        thread.join()
+
+        assert errors == []
+        assert limiter.stats["requests"] == 9
+
+    @pytest.mark.asyncio
+    async def test_429_backs_off_with_retry_after(self):
+        """Ein 429 pausiert den Provider für Retry-After Sekunden und wiederholt die Anfrage"""
+        client = MultiProviderAIClient()
+        client.rate_limiters = RateLimiterRegistry()
+        responses = [RateLimitError("gemini", retry_after=0.02), "ok"]
+
+        async def fake_call(provider, **kwargs):
+            result = responses.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch.object(client, '_call_provider', side_effect=fake_call):
+            result = await client.chat_completion(
+                [{"role": "user", "content": "x"}], task_name="needs_analysis"
+            )
+
+        assert result == "ok"
+        stats = client.get_rate_limit_stats()["gemini"]
+        assert stats["throttled"] == 1
+        assert stats["waited_seconds"] > 0
+
+    def test_parse_retry_after(self):
+        """Retry-After in Sekunden und als HTTP-Datum"""
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+class TestStreaming:
+    """Tests für stream_completion gegen den lokalen SSE-Stub-Server"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("provider", ["openai", "anthropic", "gemini", "deepseek"])
+    async def test_streams_chunks_from_every_provider(self, provider):
+        """Jeder Provider liefert die Chunks in Reihenfolge"""
+        runner, base_url = await start_stub_server()
+        client = MultiProviderAIClient(base_urls=stub_base_urls(base_url))
+        client._route_candidates = lambda task_name, preferred=None: [(provider, "stub-model")]
+
+        try:
+            chunks = [chunk async for chunk in client.stream_completion(
+                [{"role": "user", "content": "Angebot"}], task_name="proposal_drafting"
+            )]
+        finally:
+            await client.aclose()
+            await runner.cleanup()
+
+        assert chunks == STUB_CHUNKS
+        assert client.get_streaming_stats()[provider]["streams"] == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_before_first_chunk(self):
+        """Ein 429 vor dem ersten Chunk führt zum nächsten Provider"""
+        runner, base_url = await start_stub_server(rate_limited={"gemini"})
+        client = MultiProviderAIClient(base_urls=stub_base_urls(base_url))
+
+        try:
+            text = "".join([chunk async for chunk in client.stream_completion(
+                [{"role": "user", "content": "Bericht"}], task_name="basic_classification"
+            )])
+        finally:
+            await client.aclose()
+            await runner.cleanup()
+
+        assert text == "".join(STUB_CHUNKS)
+        assert client.get_rate_limit_stats()["gemini"]["throttled"] == 1
+        assert "deepseek" in client.get_streaming_stats()
+
+class TestBatching:
+    """Tests für chat_completion_batch und den Micro-Batcher"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.client = MultiProviderAIClient()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _fake_call(self, provider, messages, temperature, max_tokens, model):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        content = messages[-1]["content"]
+        if content == "kaputt":
+            raise Exception("provider error")
+        return f"score:{content}"
+
+    @staticmethod
+    def _request(content):
+        return {"messages": [{"role": "user", "content": content}], "task_name": "lead_qualification",
+                "temperature": 0.5}
+
+    @pytest.mark.asyncio
+    async def test_batch_preserves_order_and_bounds_concurrency(self):
+        """Ergebnisse kommen in Eingabereihenfolge, höchstens max_concurrency parallel"""
+        requests = [self._request(f"lead-{i}") for i in range(10)]
+
+        with patch.object(self.client, '_call_provider', side_effect=self._fake_call):
+            results = await self.client.chat_completion_batch(requests, max_concurrency=3)
+
+        assert results == [f"score:lead-{i}" for i in range(10)]
+        assert self.max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_batch_returns_exceptions_per_request(self):
+        """Ein fehlgeschlagener Lead bricht den Batch nicht ab"""
+        requests = [self._request("lead-1"), self._request("kaputt"), self._request("lead-3")]
+
+        with patch.object(self.client, '_call_provider', side_effect=self._fake_call):
+            results = await self.client.chat_completion_batch(requests)
+
+        assert results[0] == "score:lead-1"
+        assert isinstance(results[1], Exception)
+        assert results[2] == "score:lead-3"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_batches_share_the_default_limit(self):
+        """Gleichzeitige Batches ohne max_concurrency teilen sich ein Limit je Event-Loop"""
+        batches = [[self._request(f"lead-{b}-{i}") for i in range(6)] for b in range(2)]
+
+        with patch.dict('utils.ai_client.BATCH_CONFIG', {"max_concurrency": 4}), \
+                patch.object(self.client, '_call_provider', side_effect=self._fake_call):
+            results = await asyncio.gather(*(self.client.chat_completion_batch(batch) for batch in batches))
+
+        assert results[1] == [f"score:lead-1-{i}" for i in range(6)]
+        assert self.max_in_flight == 4
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flush_does_not_strand_submitters(self):
+        """Wird der Flush-Task abgebrochen, warten die Aufrufer nicht ewig"""
+        started = asyncio.Event()
+
+        async def handler(requests):
+            started.set()
+            await asyncio.sleep(3600)
+
+        batcher = MicroBatcher(handler, max_batch_size=2, max_wait=10)
+        submissions = asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        await started.wait()
+        for task in list(batcher._inflight):
+            task.cancel()
+
+        results = await asyncio.wait_for(submissions, timeout=1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_submissions_are_coalesced(self):
+        """Gleichzeitige Einzelanfragen landen in einem Batch und werden korrekt zugeordnet"""
+        with patch.object(self.client, '_call_provider', side_effect=self._fake_call):
+            results = await asyncio.gather(*(
+                self.client.submit_batched(**self._request(f"lead-{i}")) for i in range(5)
+            ))
+
+        assert results == [f"score:lead-{i}" for i in range(5)]
+        assert self.client.get_batch_stats() == {"requests": 5, "batches": 1, "largest_batch": 5}
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_immediately(self):
+        """Bei max_batch_size wird ohne Wartezeit geflusht; Fehler landen beim Aufrufer"""
+        async def handler(requests):
+            return [ValueError("x") if r == "bad" else r.upper() for r in requests]
+
+        batcher = MicroBatcher(handler, max_batch_size=2, max_wait=10)
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True), timeout=1
+        )
+        assert results == ["A", "B"]
+
+        bad = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("bad"), batcher.submit("c"), return_exceptions=True), timeout=1
+        )
+        assert isinstance(bad[0], ValueError) and bad[1] == "C"
+
+class TestUsageLedger:
+    """Tests für Token-, Kosten- und Latenz-Buchung im Usage-Ledger"""
+
+    MESSAGES = [{"role": "user", "content": "x" * 400}]
+
+    @pytest.mark.asyncio
+    async def test_calls_are_recorded_with_cost_and_attribution(self, tmp_path):
+        """Jeder Aufruf landet mit Agent, Pod, Tokens und Kosten im Ledger"""
+        ledger = UsageLedger(db_path=str(tmp_path / "usage.db"))
+        client = MultiProviderAIClient(
+            response_cache=LLMResponseCache(db_path=None), usage_ledger=ledger
+        )
+
+        with patch.object(client, '_call_provider', new_callable=AsyncMock) as mock_call:
+            mock_call.return_value = "y" * 200
+            await client.chat_completion(self.MESSAGES, task_name="financial_analysis",
+                                         temperature=0.1, agent_id="OPS-003", pod="operations")
+            await client.chat_completion(self.MESSAGES, task_name="financial_analysis",
+                                         temperature=0.1, agent_id="OPS-003", pod="operations")
+            await client.chat_completion(self.MESSAGES, task_name="validate_input",
+                                         temperature=0.7, agent_id="ACQ-002", pod="akquise")
+
+        by_agent = {row["agent"]: row for row in client.get_usage_breakdown("agent")}
+        assert by_agent["OPS-003"]["calls"] == 2
+        assert by_agent["OPS-003"]["cache_hits"] == 1
+        assert by_agent["OPS-003"]["prompt_tokens"] == 200
+        assert by_agent["OPS-003"]["completion_tokens"] == 100
+        # gemini-1.5-pro: 100 * 1.25 + 50 * 5.00 USD pro 1 Mio. Tokens, nur der Nicht-Cache-Treffer
+        assert by_agent["OPS-003"]["cost_usd"] == pytest.approx(0.000375)
+
+        analysis = client.get_cost_analysis()
+        assert analysis["total_calls"] == 3
+        assert analysis["cache_hit_rate"] == pytest.approx(1 / 3)
+        assert {row["pod"] for row in analysis["by_pod"]} == {"operations", "akquise"}
+
+    @pytest.mark.asyncio
+    async def test_failures_are_recorded_without_cost(self, tmp_path):
+        """Fehlgeschlagene Aufrufe zählen als Fehler ohne Kosten"""
+        ledger = UsageLedger(db_path=str(tmp_path / "usage.db"))
+        client = MultiProviderAIClient(usage_ledger=ledger)
+
+        with patch.object(client, '_call_provider', side_effect=Exception("down")):
+            with pytest.raises(Exception):
+                await client.chat_completion(self.MESSAGES, task_name="lead_qualification", agent_id="ACQ-002")
+
+        [row] = ledger.aggregate("agent")
+        assert row["errors"] == 1 and row["cost_usd"] == 0
+
+    def test_writes_are_batched(self, tmp_path):
+        """Einträge werden gepuffert und erst ab flush_size geschrieben"""
+        ledger = UsageLedger(db_path=str(tmp_path / "usage.db"), flush_size=3, flush_interval=3600)
+
+        for _ in range(2):
+            ledger.record("gemini", "gemini-1.5-flash", "needs_analysis", 10, 10, 0.1)
+        assert not (tmp_path / "usage.db").exists()
+
+        ledger.record("gemini", "gemini-1.5-flash", "needs_analysis", 10, 10, 0.1)
+        assert ledger._buffer == []
+        assert [row["calls"] for row in ledger.aggregate("hour")] == [3]
+
+    @pytest.mark.asyncio
+    async def test_flush_commits_off_the_event_loop(self, tmp_path):
+        """Volle Puffer werden im Writer-Thread der Async-Fassade committet"""
+        ledger = UsageLedger(db_path=str(tmp_path / "usage.db"), flush_size=2, flush_interval=3600)
+        original_insert = ledger._insert
+        insert_threads = []
+
+        def tracking_insert(rows, conn):
+            insert_threads.append(threading.get_ident())
+            return original_insert(rows, conn)
+
+        ledger._insert = tracking_insert
+        for _ in range(4):
+            ledger.record("gemini", "gemini-1.5-flash", "needs_analysis", 10, 10, 0.1, agent_id="ACQ-002")
+
+        [row] = await ledger.aggregate_async("agent")
+        assert row["calls"] == 4
+        assert insert_threads and threading.get_ident() not in insert_threads
+        assert (await ledger.get_cost_analysis_async())["total_calls"] == 4
+
+    def test_unknown_group_by_is_rejected(self, tmp_path):
+        """Nur bekannte Gruppierungen werden in SQL übernommen"""
+        ledger = UsageLedger(db_path=str(tmp_path / "usage.db"))
+        with pytest.raises(ValueError):
+            ledger.aggregate("agent_id; DROP TABLE llm_usage_ledger")
@@ -0,0 +1,720 @@
+"""
+Tests für die Datenbank-Infrastruktur
+Testet die gepoolte Verbindungsverwaltung mit WAL-Pragmas
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from utils.connection_manager import ConnectionManager, get_connection
+from utils.async_db import AsyncDatabase
+import utils.migrations
+from utils.telemetry import TelemetryBuffer
+from utils.kpi_rollups import dashboard_metrics, period_series, rebuild_rollups
+from utils.agent_health import evaluate_agent_health, record_heartbeat
+from utils.base_agent import BaseAgent
+from agents.ceo_agent import CEOAgent
+from agents.pods.akquise.inbound_agent import InboundAgent
+from utils.migrations import LATEST_VERSION, Migration, get_schema_version, migrate, query_plan_report
+
+class TestConnectionManager:
+    """Tests für Pooling und Pragmas der SQLite-Verbindungen"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.manager = ConnectionManager(pool_size=2, busy_timeout_ms=2000)
+
+    def teardown_method(self):
+        self.manager.close_all()
+
+    def test_pragmas_are_applied(self, tmp_path):
+        """WAL, synchronous=NORMAL und busy_timeout sind gesetzt"""
+        conn = self.manager.connect(str(tmp_path / "agents.db"))
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 2000
+        conn.close()
+
+    def test_close_returns_connection_to_pool(self, tmp_path):
+        """close() schließt nicht, sondern stellt die Verbindung zur Wiederverwendung bereit"""
+        db_path = str(tmp_path / "agents.db")
+        first = self.manager.connect(db_path)
+        first.close()
+        first.close()  # doppeltes close() darf die Verbindung nicht doppelt einreihen
+        second = self.manager.connect(db_path)
+        third = self.manager.connect(db_path)
+
+        assert second is first
+        assert third is not first
+        assert self.manager.get_stats()["opened"] == 2
+        second.close()
+        third.close()
+
+    def test_release_discards_uncommitted_work_and_resets_state(self, tmp_path):
+        """Wie beim echten Schließen gehen nicht committete Änderungen verloren"""
+        db_path = str(tmp_path / "agents.db")
+        conn = self.manager.connect(db_path)
+        conn.execute("CREATE TABLE leads (id INTEGER)")
+        conn.commit()
+        conn.row_factory = sqlite3.Row
+        conn.execute("INSERT INTO leads VALUES (1)")
+        conn.close()
+
+        conn = self.manager.connect(db_path)
+        assert conn.row_factory is None
+        assert conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0] == 0
+        conn.close()
+
+    def test_replaced_database_file_is_reopened(self, tmp_path):
+        """Gelöschte oder neu angelegte Datenbanken werden nicht über alte Verbindungen gelesen"""
+        db_path = str(tmp_path / "agents.db")
+        conn = self.manager.connect(db_path)
+        conn.execute("CREATE TABLE old_schema (id INTEGER)")
+        conn.commit()
+        conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+        conn = self.manager.connect(db_path)
+        tables = conn.execute("SELECT name FROM sqlite_master").fetchall()
+        conn.close()
+
+        assert tables == []
+
+    def test_connections_are_per_thread(self, tmp_path):
+        """Jeder Thread bekommt eigene Verbindungen (sqlite3 check_same_thread)"""
+        db_path = str(tmp_path / "agents.db")
+        main_conn = self.manager.connect(db_path)
+        main_conn.close()
+        seen = []
+
+        def worker():
+            conn = self.manager.connect(db_path)
+            seen.append(conn)
+            conn.execute("SELECT 1")
+            conn.close()
+            self.manager.close_all()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        assert seen[0] is not main_conn
+
+    def test_concurrent_writers_wait_instead_of_failing(self, tmp_path):
+        """busy_timeout und WAL lassen parallele Writer aufeinander warten"""
+        db_path = str(tmp_path / "agents.db")
+        setup = self.manager.connect(db_path)
+        setup.execute("CREATE TABLE activity (agent TEXT, n INTEGER)")
+        setup.commit()
+        setup.close()
+        errors = []
+
+        def writer(agent):
+            try:
+                for n in range(50):
+                    conn = self.manager.connect(db_path)
+                    conn.execute("INSERT INTO activity VALUES (?, ?)", (agent, n))
+                    conn.commit()
+                    conn.close()
+            except sqlite3.Error as e:
+                errors.append(e)
+            finally:
+                self.manager.close_all()
+
+        threads = [threading.Thread(target=writer, args=(f"AGENT-{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        conn = self.manager.connect(db_path)
+        assert errors == []
+        assert conn.execute("SELECT COUNT(*) FROM activity").fetchone()[0] == 200
+        conn.close()
+
+    def test_memory_databases_are_not_pooled(self):
+        """:memory: ergibt weiterhin jedes Mal eine eigene, echte Verbindung"""
+        conn = self.manager.connect(":memory:")
+        conn.execute("CREATE TABLE t (id INTEGER)")
+        conn.close()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+class TestAsyncDatabase:
+    """Tests für die asynchrone Datenbank-Fassade (Writer-Thread + Reader-Pool)"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.db = None
+
+    def teardown_method(self):
+        if self.db is not None:
+            self.db.close()
+
+    def _create(self, tmp_path) -> AsyncDatabase:
+        db_path = str(tmp_path / "agents.db")
+        conn = get_connection(db_path)
+        conn.execute("CREATE TABLE kpi_metrics (id INTEGER PRIMARY KEY, agent_id TEXT, value REAL)")
+        conn.commit()
+        conn.close()
+        self.db = AsyncDatabase(db_path, readers=2)
+        return self.db
+
+    @pytest.mark.asyncio
+    async def test_execute_and_fetch(self, tmp_path):
+        """Schreiben mit Commit, Lesen über den Reader-Pool"""
+        db = self._create(tmp_path)
+
+        result = await db.execute("INSERT INTO kpi_metrics (agent_id, value) VALUES (?, ?)", ("CEO-001", 1.5))
+        await db.executemany("INSERT INTO kpi_metrics (agent_id, value) VALUES (?, ?)",
+                             [("ACQ-001", 1), ("ACQ-001", 2)])
+
+        assert result.lastrowid == 1
+        assert await db.fetchval("SELECT COUNT(*) FROM kpi_metrics") == 3
+        assert await db.fetchone("SELECT value FROM kpi_metrics WHERE id = ?", (1,)) == (1.5,)
+        rows = await db.fetchall("SELECT agent_id FROM kpi_metrics WHERE agent_id = ?", ("ACQ-001",),
+                                 row_factory=sqlite3.Row)
+        assert [row["agent_id"] for row in rows] == ["ACQ-001", "ACQ-001"]
+
+    @pytest.mark.asyncio
+    async def test_failed_transaction_is_rolled_back(self, tmp_path):
+        """Mehrere Statements einer Transaktion werden ganz oder gar nicht geschrieben"""
+        db = self._create(tmp_path)
+
+        def write(conn):
+            conn.execute("INSERT INTO kpi_metrics (agent_id, value) VALUES ('CEO-001', 1)")
+            conn.execute("INSERT INTO missing_table VALUES (1)")
+
+        with pytest.raises(sqlite3.OperationalError):
+            await db.transaction(write)
+
+        assert await db.fetchval("SELECT COUNT(*) FROM kpi_metrics") == 0
+        assert db.get_stats()["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_submit_is_ordered_with_awaited_writes(self, tmp_path):
+        """Fire-and-forget-Schreibzugriffe laufen im selben Writer-Thread in Reihenfolge"""
+        db = self._create(tmp_path)
+
+        for value in range(10):
+            db.submit("INSERT INTO kpi_metrics (agent_id, value) VALUES (?, ?)", ("FIN-001", value))
+        await db.execute("UPDATE kpi_metrics SET value = value * 10")
+
+        values = await db.fetchall("SELECT value FROM kpi_metrics ORDER BY id")
+        assert [row[0] for row in values] == [value * 10 for value in range(10)]
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running_while_write_waits_for_lock(self, tmp_path):
+        """Ein auf den Datenbank-Lock wartender Schreibzugriff blockiert andere Agenten nicht"""
+        db = self._create(tmp_path)
+        blocker = sqlite3.connect(db.db_path)
+        blocker.execute("BEGIN IMMEDIATE")
+        ticks = 0
+
+        async def other_agent():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(other_agent())
+        write = asyncio.create_task(db.execute("INSERT INTO kpi_metrics (agent_id, value) VALUES ('CEO-001', 1)"))
+        await asyncio.sleep(0.2)
+        assert not write.done()
+        blocker.rollback()
+        blocker.close()
+        await write
+        ticker.cancel()
+
+        assert ticks >= 10
+
+    def test_flush_and_close_write_pending_submits(self, tmp_path):
+        """Ausstehende Schreibzugriffe gehen beim Shutdown nicht verloren"""
+        db = self._create(tmp_path)
+
+        db.submit("INSERT INTO kpi_metrics (agent_id, value) VALUES ('CEO-001', 1)")
+        db.flush()
+        db.submit("INSERT INTO kpi_metrics (agent_id, value) VALUES ('CEO-001', 2)")
+        db.close()
+        db.submit("INSERT INTO kpi_metrics (agent_id, value) VALUES ('CEO-001', 3)")
+
+        conn = get_connection(db.db_path)
+        assert conn.execute("SELECT COUNT(*) FROM kpi_metrics").fetchone()[0] == 3
+        conn.close()
+
+    @pytest.mark.asyncio
+    async def test_lead_statistics_are_read_through_the_facade(self, tmp_path):
+        """Die Lead-Statistiken des Inbound-Agenten laufen im Reader-Pool statt auf dem Event-Loop"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        conn = get_connection(db_path)
+        conn.executemany(
+            "INSERT INTO leads (id, source, qualification_score) VALUES (?, 'email', ?)",
+            [("lead-1", 8), ("lead-2", 3)]
+        )
+        conn.commit()
+        conn.close()
+        agent = InboundAgent()
+        agent.db_path = db_path
+        loop_thread = threading.get_ident()
+        query_threads = []
+        original_query = agent._query_lead_statistics
+
+        def tracking_query(conn):
+            query_threads.append(threading.get_ident())
+            return original_query(conn)
+
+        agent._query_lead_statistics = tracking_query
+        stats = await agent.get_lead_statistics()
+
+        assert stats == {"leads_today": 2, "leads_week": 2, "qualified_week": 1, "qualification_rate": 0.5}
+        assert query_threads and loop_thread not in query_threads
+
+class TestMigrations:
+    """Tests für den versionierten Migrations-Runner"""
+
+    def _columns(self, db_path, table):
+        conn = get_connection(db_path)
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        conn.close()
+        return columns
+
+    def test_fresh_database_is_migrated_once(self, tmp_path):
+        """Alle Versionen werden genau einmal angewendet und protokolliert"""
+        db_path = str(tmp_path / "db" / "agents.db")
+
+        assert migrate(db_path) == list(range(1, LATEST_VERSION + 1))
+        assert migrate(db_path) == []
+        assert get_schema_version(db_path) == LATEST_VERSION
+        assert "full_result" in self._columns(db_path, "pricing_results")
+        assert "due_date" in self._columns(db_path, "invoices")
+
+    def test_target_version_and_incremental_upgrade(self, tmp_path):
+        """Migrationen lassen sich schrittweise nachziehen"""
+        db_path = str(tmp_path / "agents.db")
+
+        assert migrate(db_path, target=1) == [1]
+        assert get_schema_version(db_path) == 1
+        assert migrate(db_path) == list(range(2, LATEST_VERSION + 1))
+
+    def test_setup_environment_schema_is_upgraded(self, tmp_path):
+        """Von setup_environment.py angelegte Tabellen erhalten die fehlenden Spalten"""
+        db_path = str(tmp_path / "agents.db")
+        conn = get_connection(db_path)
+        conn.execute("""
+            CREATE TABLE agents (id TEXT PRIMARY KEY, name TEXT NOT NULL, pod TEXT,
+                                 status TEXT DEFAULT 'active', last_active TIMESTAMP, created_at TIMESTAMP)
+        """)
+        conn.execute("""
+            CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, sender_id TEXT, receiver_id TEXT,
+                                   message_type TEXT, content TEXT, metadata TEXT,
+                                   status TEXT DEFAULT 'pending', created_at TIMESTAMP, processed_at TIMESTAMP)
+        """)
+        conn.execute("INSERT INTO messages (receiver_id, content) VALUES ('ACQ-001', '{}')")
+        conn.commit()
+        conn.close()
+
+        migrate(db_path)
+
+        assert {"attempts", "visible_at", "lease_owner", "last_error"} <= self._columns(db_path, "messages")
+        assert {"specialization", "last_action"} <= self._columns(db_path, "agents")
+        conn = get_connection(db_path)
+        assert conn.execute("SELECT attempts FROM messages").fetchone()[0] == 0
+        conn.close()
+
+    def test_legacy_agent_messages_are_upgraded(self, tmp_path):
+        """agent_messages aus dem alten utils/database.py erhält priority_num, Lease-Spalten und Dispatch-Index"""
+        db_path = str(tmp_path / "agents.db")
+        conn = get_connection(db_path)
+        conn.execute("""
+            CREATE TABLE agent_messages (
+                id TEXT PRIMARY KEY, sender_id TEXT NOT NULL, receiver_id TEXT NOT NULL,
+                message_type TEXT NOT NULL, content TEXT NOT NULL, priority TEXT NOT NULL,
+                status TEXT DEFAULT 'pending', created_at TEXT NOT NULL, processed_at TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX idx_agent_messages_receiver ON agent_messages(receiver_id)")
+        conn.executemany(
+            "INSERT INTO agent_messages (id, sender_id, receiver_id, message_type, content, priority, created_at) "
+            "VALUES (?, 'CEO-001', 'ACQ-002', 'task_request', '{}', ?, '2025-01-01')",
+            [("m1", "urgent"), ("m2", "low"), ("m3", "normal")]
+        )
+        conn.execute(
+            "INSERT INTO agent_messages (id, sender_id, receiver_id, message_type, content, priority, created_at) "
+            "VALUES ('r1', 'SALES-005', 'SALES-002', 'task_response', '{\"correlation_id\": \"m1\"}', 'normal', '2025-01-01')"
+        )
+        conn.commit()
+        conn.close()
+
+        assert migrate(db_path) == list(range(1, LATEST_VERSION + 1))
+
+        assert {"priority_num", "attempts", "visible_at", "lease_owner", "last_error"} <= self._columns(
+            db_path, "agent_messages")
+        conn = get_connection(db_path)
+        levels = dict(conn.execute("SELECT id, priority_num FROM agent_messages WHERE id LIKE 'm%'"))
+        correlation = conn.execute("SELECT correlation_id FROM agent_messages WHERE id = 'r1'").fetchone()[0]
+        index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_agent_messages_dispatch'"
+        ).fetchone()
+        conn.close()
+        assert levels == {"m1": 3, "m2": 0, "m3": 1}
+        assert correlation == "m1"
+        assert index is not None
+
+    def test_failed_migration_is_rolled_back(self, tmp_path, monkeypatch):
+        """Eine fehlschlagende Migration hinterlässt weder Tabellen noch Versionseintrag"""
+        db_path = str(tmp_path / "agents.db")
+
+        def broken(conn):
+            conn.execute("CREATE TABLE half_done (id INTEGER)")
+            conn.execute("INSERT INTO missing_table VALUES (1)")
+
+        monkeypatch.setattr(utils.migrations, "MIGRATIONS", [Migration(1, "broken", broken)])
+        with pytest.raises(sqlite3.OperationalError):
+            migrate(db_path)
+
+        assert get_schema_version(db_path) == 0
+        conn = get_connection(db_path)
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+        conn.close()
+
+    def test_agent_queries_use_indexes(self, tmp_path):
+        """EXPLAIN QUERY PLAN: keine Abfrage der Agenten durchläuft leads, projects, invoices, messages oder kpi_metrics vollständig"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+
+        report = query_plan_report(db_path)
+
+        assert [entry["query"] for entry in report if entry["error"]] == []
+        scanned = [entry["query"] for entry in report if entry["full_scan"]]
+        # Nur die kleine, feste agents-Tabelle wird gescannt
+        assert scanned == ["CEOAgent.monitor_system_health (Heartbeats)"]
+
+class TestTelemetryBuffer:
+    """Tests für die gepufferte KPI-/Aktivitäts-Telemetrie"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.buffer = None
+
+    def teardown_method(self):
+        if self.buffer is not None:
+            self.buffer.close()
+
+    def _create(self, tmp_path, **kwargs):
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        self.buffer = TelemetryBuffer(**{"interval": 60, **kwargs})
+        return db_path
+
+    def _rows(self, db_path, sql):
+        conn = get_connection(db_path)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_counters_are_summed_per_metric(self, tmp_path):
+        """Tausende Datenpunkte ergeben eine Zeile je (Agent, Kennzahl, Periode)"""
+        db_path = self._create(tmp_path, max_pending=10000)
+        for _ in range(1000):
+            self.buffer.record_kpi(db_path, "ACQ-001", "ACQ-001_llm_calls", 1)
+        self.buffer.record_kpi(db_path, "OPS-001", "revenue_invoiced", 1200.5)
+        self.buffer.record_kpi(db_path, "OPS-001", "revenue_invoiced", 800)
+
+        assert self._rows(db_path, "SELECT COUNT(*) FROM kpi_metrics") == [(0,)]
+        assert self.buffer.flush() == 2
+        assert self._rows(db_path, "SELECT agent_id, metric_name, value, period FROM kpi_metrics ORDER BY agent_id") == [
+            ("ACQ-001", "ACQ-001_llm_calls", 1000, "daily"),
+            ("OPS-001", "revenue_invoiced", 2000.5, "daily"),
+        ]
+        assert self.buffer.get_stats()["flushes"] == 1
+
+    def test_activities_keep_order_and_call_time(self, tmp_path):
+        """Aktivitäten werden gesammelt geschrieben, Zeitstempel stammen vom Aufruf"""
+        db_path = self._create(tmp_path)
+        for i in range(5):
+            self.buffer.record_activity(db_path, "CEO-001", f"Entscheidung {i}")
+        self.buffer.flush()
+
+        rows = self._rows(db_path, "SELECT activity, timestamp FROM agent_activities ORDER BY id")
+        assert [row[0] for row in rows] == [f"Entscheidung {i}" for i in range(5)]
+        assert all(len(row[1]) == 19 for row in rows)
+
+    def test_close_flushes_exactly_once(self, tmp_path):
+        """Shutdown schreibt ausstehende Zähler einmal; spätere Datenpunkte gehen direkt in die DB"""
+        db_path = self._create(tmp_path)
+        self.buffer.record_kpi(db_path, "ACQ-001", "leads_processed", 1)
+        self.buffer.record_kpi(db_path, "ACQ-001", "leads_processed", 1)
+
+        self.buffer.close()
+        self.buffer.close()
+        self.buffer.record_kpi(db_path, "ACQ-001", "leads_processed", 1)
+
+        assert self._rows(db_path, "SELECT SUM(value), COUNT(*) FROM kpi_metrics") == [(3, 2)]
+
+    def test_background_thread_flushes_on_interval_and_threshold(self, tmp_path):
+        """Der Flush-Thread schreibt nach dem Intervall bzw. sobald max_pending erreicht ist"""
+        db_path = self._create(tmp_path, interval=0.05)
+        self.buffer.record_kpi(db_path, "ACQ-001", "leads_processed", 1)
+        deadline = time.time() + 2
+        while self.buffer.get_stats()["rows_written"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert self._rows(db_path, "SELECT COUNT(*) FROM kpi_metrics") == [(1,)]
+
+        self.buffer.close()
+        self.buffer = TelemetryBuffer(interval=60, max_pending=3)
+        for i in range(3):
+            self.buffer.record_activity(db_path, "CEO-001", f"Aktivität {i}")
+        deadline = time.time() + 2
+        while self.buffer.get_stats()["rows_written"] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert self._rows(db_path, "SELECT COUNT(*) FROM agent_activities") == [(3,)]
+
+    def test_locked_database_defers_rows_to_next_flush(self, tmp_path, monkeypatch):
+        """Bei Sperrkonflikten bleiben die Zähler im Puffer statt verloren zu gehen"""
+        db_path = self._create(tmp_path)
+        manager = ConnectionManager(busy_timeout_ms=50)
+        self.buffer.record_kpi(db_path, "ACQ-001", "leads_processed", 2)
+        blocker = sqlite3.connect(db_path)
+        blocker.execute("BEGIN EXCLUSIVE")
+
+        monkeypatch.setattr("utils.telemetry.get_connection", manager.connect)
+        assert self.buffer.flush() == 0
+        monkeypatch.undo()
+        blocker.rollback()
+        blocker.close()
+        manager.close_all()
+
+        assert self.buffer.get_stats()["pending_counters"] == 1
+        assert self.buffer.flush() == 1
+        assert self._rows(db_path, "SELECT value FROM kpi_metrics") == [(2,)]
+
+class TestKpiRollups:
+    """Tests für die per Trigger gepflegten Dashboard-Rollups"""
+
+    def _scan_metrics(self, conn):
+        """Die bisherigen Vollscans des CEO-Dashboards als Referenz"""
+        return {
+            "monthly_revenue": conn.execute(
+                "SELECT COALESCE(SUM(budget), 0) FROM projects WHERE created_at >= date('now', '-30 days')"
+            ).fetchone()[0],
+            "weekly_leads": conn.execute(
+                "SELECT COUNT(*) FROM leads WHERE created_at >= date('now', '-7 days')"
+            ).fetchone()[0],
+            "completed_projects": conn.execute(
+                "SELECT COUNT(*) FROM projects WHERE status = 'completed'"
+            ).fetchone()[0],
+            "active_projects": conn.execute(
+                "SELECT COUNT(*) FROM projects WHERE status IN ('planned', 'in_progress')"
+            ).fetchone()[0],
+            "total_projects": conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0],
+        }
+
+    def _insert_history(self, conn, rng, rows=200):
+        statuses = ["setup", "planned", "in_progress", "completed"]
+        for i in range(rows):
+            created = datetime.now() - timedelta(days=rng.randint(0, 90), hours=rng.randint(0, 23))
+            conn.execute(
+                "INSERT INTO leads (id, source, status, created_at) VALUES (?, 'email', 'new', ?)",
+                (f"lead-{i}", created.isoformat())
+            )
+            conn.execute(
+                "INSERT INTO projects (lead_id, name, status, budget, created_at) VALUES (?, ?, ?, ?, ?)",
+                (f"lead-{i}", f"Projekt {i}", rng.choice(statuses), rng.choice([None, 5000, 12500.5]),
+                 created.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        conn.commit()
+
+    def test_triggers_match_full_scans(self, tmp_path):
+        """Inserts, Updates und Deletes halten die Rollups exakt auf dem Stand der Vollscans"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        rng = random.Random(7)
+        conn = get_connection(db_path)
+        self._insert_history(conn, rng)
+
+        conn.execute("UPDATE projects SET status = 'completed' WHERE id % 3 = 0")
+        conn.execute("UPDATE projects SET budget = budget * 2 WHERE id % 5 = 0")
+        conn.execute("UPDATE projects SET created_at = datetime('now', '-1 day') WHERE id % 7 = 0")
+        conn.execute("DELETE FROM projects WHERE id % 11 = 0")
+        conn.execute("DELETE FROM leads WHERE rowid % 13 = 0")
+        conn.execute("""
+            INSERT INTO leads (id, source, status, created_at) VALUES ('lead-1', 'web', 'qualified', ?)
+            ON CONFLICT (id) DO UPDATE SET status = excluded.status, created_at = excluded.created_at
+        """, (datetime.now().isoformat(),))
+        conn.commit()
+
+        assert dashboard_metrics(conn) == pytest.approx(self._scan_metrics(conn))
+        conn.close()
+
+    def test_existing_rows_are_backfilled(self, tmp_path):
+        """Vor der Migration vorhandene Daten landen beim Upgrade in den Rollups"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path, target=3)
+        conn = get_connection(db_path)
+        self._insert_history(conn, random.Random(3), rows=50)
+        conn.close()
+
+        migrate(db_path)
+
+        conn = get_connection(db_path)
+        expected = self._scan_metrics(conn)
+        assert dashboard_metrics(conn) == pytest.approx(expected)
+        rebuild_rollups(conn)
+        assert dashboard_metrics(conn) == pytest.approx(expected)
+        conn.close()
+
+    def test_period_series_buckets(self, tmp_path):
+        """Tages-, Wochen- (ab Montag) und Monatsbuckets"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        conn = get_connection(db_path)
+        for created, budget in [("2024-05-05 10:00:00", 100), ("2024-05-06T09:00:00.123456", 200),
+                                ("2024-05-31 23:00:00", 300), ("2024-06-01 08:00:00", 400)]:
+            conn.execute("INSERT INTO projects (name, budget, created_at) VALUES ('p', ?, ?)", (budget, created))
+        conn.commit()
+
+        months = period_series(conn, "projects", "month")
+        weeks = period_series(conn, "projects", "week")
+        with pytest.raises(ValueError):
+            period_series(conn, "projects", "quarter")
+        conn.close()
+
+        assert [(m["period_start"], m["count"], m["total"]) for m in months] == [
+            ("2024-06-01", 1, 400), ("2024-05-01", 3, 600)]
+        assert [(w["period_start"], w["total"]) for w in weeks] == [
+            ("2024-05-27", 700), ("2024-05-06", 200), ("2024-04-29", 100)]
+
+class TestAgentHealth:
+    """Tests für Heartbeats und die entdoppelten Health-Alerts"""
+
+    def _states(self, conn, now, timeout=60):
+        transitions = evaluate_agent_health(conn, timeout=timeout, now=now)
+        conn.commit()
+        return sorted((t.agent_id, t.state) for t in transitions)
+
+    def test_alert_lifecycle(self, tmp_path):
+        """new -> ongoing -> resolved; ein erneuter Ausfall öffnet einen neuen Alert"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        conn = get_connection(db_path)
+        record_heartbeat(conn, "ACQ-001", "Inbound Agent", "w1", now=0)
+        record_heartbeat(conn, "ACQ-002", "Qualifier Agent", "w1", now=90)
+
+        assert self._states(conn, now=50) == []
+        assert self._states(conn, now=100) == [("ACQ-001", "new")]
+        assert self._states(conn, now=130) == [("ACQ-001", "ongoing")]
+        assert self._states(conn, now=200) == [("ACQ-001", "ongoing"), ("ACQ-002", "new")]
+
+        record_heartbeat(conn, "ACQ-001", "Inbound Agent", "w1", now=210)
+        assert self._states(conn, now=220) == [("ACQ-001", "resolved"), ("ACQ-002", "ongoing")]
+        assert self._states(conn, now=230) == [("ACQ-002", "ongoing")]
+        assert self._states(conn, now=300) == [("ACQ-001", "new"), ("ACQ-002", "ongoing")]
+
+        rows = conn.execute(
+            "SELECT agent_id, state, occurrences FROM health_alerts ORDER BY id"
+        ).fetchall()
+        conn.close()
+        assert rows == [("ACQ-001", "resolved", 3), ("ACQ-002", "open", 4), ("ACQ-001", "open", 1)]
+
+    def test_stopped_agents_and_healthy_workers_do_not_alert(self, tmp_path):
+        """Sauber gestoppte Agenten und Agenten mit einem frischen Worker gelten als gesund"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        conn = get_connection(db_path)
+        record_heartbeat(conn, "ACQ-002", "Qualifier Agent", "crashed", now=0)
+        record_heartbeat(conn, "ACQ-002", "Qualifier Agent", "alive", now=500)
+        record_heartbeat(conn, "FIN-001", "Finance Agent", "w1", now=0)
+        assert self._states(conn, now=100) == [("FIN-001", "new")]
+
+        record_heartbeat(conn, "FIN-001", "Finance Agent", "w1", status="stopped", now=0)
+        assert self._states(conn, now=520) == [("FIN-001", "resolved")]
+        conn.close()
+
+    @pytest.mark.asyncio
+    async def test_base_agent_heartbeat_is_throttled(self, tmp_path):
+        """Ein Heartbeat je Intervall; der Stopp wird sofort geschrieben"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        agent = BaseAgent("SALES-003", "Proposal Writer Agent", "vertrieb")
+        agent.db_path = db_path
+        agent.heartbeat_interval = 3600
+
+        await agent.heartbeat()
+        conn = get_connection(db_path)
+        first = conn.execute("SELECT beat_at FROM agent_heartbeats").fetchone()[0]
+        conn.close()
+        await agent.heartbeat()
+        await agent.heartbeat("stopped", force=True)
+
+        conn = get_connection(db_path)
+        rows = conn.execute("SELECT agent_id, worker_id, status, beat_at FROM agent_heartbeats").fetchall()
+        conn.close()
+        assert len(rows) == 1
+        assert rows[0][:3] == ("SALES-003", agent.worker_id, "stopped")
+        assert rows[0][3] >= first
+
+    @pytest.mark.asyncio
+    async def test_ceo_calls_llm_only_for_new_alerts(self, tmp_path):
+        """Wiederholte Überwachungszyklen analysieren denselben Ausfall nur einmal"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        conn = get_connection(db_path)
+        record_heartbeat(conn, "ACQ-001", "Inbound Agent", "w1", now=time.time() - 3600)
+        conn.commit()
+        conn.close()
+        ceo = CEOAgent()
+        ceo.db_path = db_path
+        ceo.process_with_llm = AsyncMock(return_value="Neustart empfohlen")
+
+        states = []
+        for _ in range(5):
+            states.append([t.state for t in await ceo.monitor_system_health()])
+        assert states == [["new"]] + [["ongoing"]] * 4
+        assert ceo.process_with_llm.await_count == 1
+
+        conn = get_connection(db_path)
+        record_heartbeat(conn, "ACQ-001", "Inbound Agent", "w1")
+        conn.commit()
+        conn.close()
+        assert [t.state for t in await ceo.monitor_system_health()] == ["resolved"]
+        assert await ceo.monitor_system_health() == []
+        assert ceo.process_with_llm.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_kpi_dashboard_refreshes_llm_usage_on_its_own_interval(self, tmp_path):
+        """Das Dashboard liest Rollups asynchron und aggregiert das Usage-Ledger nur je Refresh-Intervall"""
+        db_path = str(tmp_path / "agents.db")
+        migrate(db_path)
+        ceo = CEOAgent()
+        ceo.db_path = db_path
+        ceo.ai_client = MagicMock(
+            get_cost_analysis_async=AsyncMock(return_value={"total_calls": 3}),
+            get_usage_breakdown_async=AsyncMock(return_value=[])
+        )
+
+        for _ in range(3):
+            dashboard = await ceo.get_kpi_dashboard()
+        assert dashboard["metrics"]["weekly_leads"] == 0
+        assert dashboard["llm_usage"] == {"total_calls": 3, "hourly": []}
+        assert ceo.ai_client.get_cost_analysis_async.await_count == 1
+
+        ceo._llm_usage_at -= 3600
+        await ceo.get_kpi_dashboard()
+        assert ceo.ai_client.get_cost_analysis_async.await_count == 2
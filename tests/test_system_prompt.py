@@ -0,0 +1,210 @@
+"""
+Tests für den System-Prompt der Agenten
+Testet Knowledge-Base-Store, Token-Budget und vorkompilierte Prompt-Templates
+ohne echte API-Aufrufe
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from utils.base_agent import BaseAgent
+from utils.knowledge_base import KnowledgeBaseStore, get_knowledge_base_store
+from utils.prompt_budget import count_tokens, select_sections, split_sections
+from utils.prompt_template import PromptTemplate
+
+PLAYBOOK = """# Sales Playbook
+
+## Überblick
+Vertriebsstrategie für berneby development.
+
+## Preisgestaltung
+### Starter Package
+Festpreis 5.000€ für kleine Automatisierungen.
+
+### Enterprise Package
+Individuelle Preisverhandlung ab 20.000€.
+
+## Einwandbehandlung
+### "Zu teuer"
+ROI-Berechnung zeigen und Amortisation erklären.
+
+## Nachfass-Strategie
+E-Mail nach drei Tagen, Anruf nach sieben Tagen.
+"""
+
+class TestPromptBudget:
+    """Tests für die Auswahl relevanter Knowledge-Base-Abschnitte"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.sections = split_sections("sales_playbook.md", PLAYBOOK)
+
+    def test_split_sections_by_heading(self):
+        """Abschnitte werden an Überschriften bis Ebene 3 getrennt"""
+        headings = [section.heading for section in self.sections]
+
+        assert headings[0] == "Sales Playbook"
+        assert "Starter Package" in headings
+        assert '"Zu teuer"' in headings
+        assert sum(section.tokens for section in self.sections) >= count_tokens(PLAYBOOK) - len(self.sections)
+
+    def test_relevant_sections_are_selected_within_budget(self):
+        """Bei knappem Budget gewinnen die Abschnitte mit passenden Begriffen"""
+        budget = 40
+        result = select_sections(self.sections, "Kunde findet das Angebot zu teuer, ROI-Berechnung nötig", budget)
+
+        assert result.used_tokens <= budget
+        assert "ROI-Berechnung zeigen" in result.text
+        assert "Anruf nach sieben Tagen" not in result.text
+        assert result.saved_tokens == result.total_tokens - result.used_tokens > 0
+        assert result.text.startswith("## sales_playbook.md")
+
+    def test_selection_keeps_document_order(self):
+        """Ausgewählte Abschnitte erscheinen in Originalreihenfolge"""
+        result = select_sections(self.sections, "Nachfass Anruf Preisverhandlung Enterprise", 1000)
+
+        assert result.dropped_sections == 0
+        assert result.text.index("Enterprise Package") < result.text.index("Nachfass-Strategie")
+
+class FakeClock:
+    """Steuerbare Uhr für Prüfintervalle"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestKnowledgeBaseStore:
+    """Tests für den prozessweiten, mtime-basierten Knowledge-Base-Cache"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.clock = FakeClock()
+        self.store = KnowledgeBaseStore(reload_interval=2, clock=self.clock)
+
+    def test_loads_once_and_serves_from_memory(self, tmp_path):
+        """Innerhalb des Prüfintervalls gibt es keinen Platten-Zugriff"""
+        (tmp_path / "playbook.md").write_text(PLAYBOOK, encoding="utf-8")
+
+        first = self.store.get(str(tmp_path))
+        (tmp_path / "playbook.md").write_text("# Geändert", encoding="utf-8")
+        second = self.store.get(str(tmp_path))
+
+        assert first is second
+        assert "## playbook.md" in first.full_text
+        assert self.store.get_stats()["loads"] == 1
+
+    def test_reloads_after_file_change(self, tmp_path):
+        """Geänderte und neue Dateien werden nach dem Prüfintervall erkannt"""
+        kb_file = tmp_path / "playbook.md"
+        kb_file.write_text(PLAYBOOK, encoding="utf-8")
+        first = self.store.get(str(tmp_path))
+
+        kb_file.write_text("# Neues Playbook\nNur noch ein Abschnitt.", encoding="utf-8")
+        os.utime(kb_file, ns=(0, first.signature[0][1] + 1_000_000))
+        (tmp_path / "faq.md").write_text("# FAQ", encoding="utf-8")
+        self.clock.now = 5
+        second = self.store.get(str(tmp_path))
+
+        assert second is not first
+        assert "Nur noch ein Abschnitt." in second.full_text
+        assert [section.source for section in second.sections] == ["faq.md", "playbook.md"]
+
+        self.clock.now = 10
+        assert self.store.get(str(tmp_path)) is second
+        assert self.store.get_stats()["loads"] == 2
+
+    def test_missing_directory_yields_empty_snapshot(self, tmp_path):
+        """Agenten ohne Knowledge Base bekommen einen leeren Snapshot"""
+        snapshot = self.store.get(str(tmp_path / "fehlt"))
+
+        assert snapshot.full_text == ""
+        assert snapshot.sections == ()
+
+    def test_agents_share_snapshot(self):
+        """Alle Agenten eines Pods nutzen denselben unveränderlichen Snapshot"""
+        first = BaseAgent("SALES-001", "Needs Analysis Agent", "vertrieb")
+        second = BaseAgent("SALES-003", "Proposal Writer Agent", "vertrieb")
+
+        assert first.load_knowledge_sections() is second.load_knowledge_sections()
+        assert first.load_knowledge_base() == get_knowledge_base_store().get("knowledge_base/vertrieb").full_text
+
+class TestSystemPrompt:
+    """Tests für den budgetierten System-Prompt des BaseAgent"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.agent = BaseAgent("SALES-003", "Proposal Writer Agent", "vertrieb")
+
+    def test_knowledge_base_is_trimmed_to_budget(self):
+        """Einfache Tasks bekommen weniger Kontext als komplexe"""
+        basic = self.agent.get_knowledge_context("Preise", task_name="validate_input")
+        complex_ = self.agent.get_knowledge_context("Preise", task_name="strategic_planning")
+
+        assert count_tokens(basic) < count_tokens(complex_)
+        stats = self.agent.get_prompt_budget_stats()
+        assert stats["prompts"] == 2
+        assert stats["kb_tokens_saved"] > 0
+
+    def test_system_prompt_contains_relevant_knowledge(self):
+        """Der System-Prompt enthält die zur Anfrage passenden Playbook-Abschnitte"""
+        prompt = self.agent.get_system_prompt("Einwandbehandlung: Kunde sagt zu teuer", task_name="validate_input")
+
+        assert "## DOMAIN KNOWLEDGE" in prompt
+        assert "Zu teuer" in prompt
+        assert "SALES-003" in prompt
+
+    def test_static_block_is_compiled_once(self):
+        """Identität, Firmenkontext und Kostenprofil werden nur einmal gerendert"""
+        with patch.object(self.agent, 'get_cost_optimization_info',
+                          wraps=self.agent.get_cost_optimization_info) as cost_info:
+            first = self.agent.get_system_prompt("Angebot", task_name="validate_input")
+            second = self.agent.get_system_prompt("Nachfass", task_name="validate_input")
+
+        cost_info.assert_called_once()
+        assert first.split("## CURRENT CONTEXT")[1] == second.split("## CURRENT CONTEXT")[1]
+        assert "$" not in first
+
+    def test_instruction_change_invalidates_template(self):
+        """Geänderte Instruktionen führen zu einem neu kompilierten Prompt"""
+        self.agent.get_system_prompt()
+        compiled = self.agent._compiled_prompt
+
+        self.agent.instructions = "Schreibt überzeugende Angebote. Weitere Details."
+        prompt = self.agent.get_system_prompt()
+
+        assert self.agent._compiled_prompt is not compiled
+        assert "Core Function: Schreibt überzeugende Angebote" in prompt
+
+    def test_prompt_size_is_tracked(self):
+        """Statische und gerenderte Prompt-Größe werden mitgeschrieben"""
+        prompt = self.agent.get_system_prompt("Preisgestaltung Enterprise", task_name="strategic_planning")
+        stats = self.agent.get_prompt_size_stats()
+
+        assert stats["renders"] == 1
+        assert stats["last_rendered_tokens"] == count_tokens(prompt)
+        assert 0 < stats["static_tokens"] < stats["max_rendered_tokens"]
+
+class TestPromptTemplate:
+    """Tests für das Kompilieren und Rendern von Prompt-Templates"""
+
+    def test_static_values_are_inlined_and_slots_remain(self):
+        """Nicht übergebene Platzhalter bleiben als Slots erhalten"""
+        compiled = PromptTemplate("Agent $name kostet $$5 | ${context} | $name").compile(name="ACQ-002")
+
+        assert compiled.slots == ("context",)
+        assert compiled.render(context="Lead-Daten") == "Agent ACQ-002 kostet $5 | Lead-Daten | ACQ-002"
+
+    def test_missing_slot_raises(self):
+        """Fehlende dynamische Werte werden nicht stillschweigend leer gerendert"""
+        compiled = PromptTemplate("Kontext: $context").compile()
+
+        with pytest.raises(KeyError):
+            compiled.render()
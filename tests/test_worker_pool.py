@@ -0,0 +1,166 @@
+"""
+Tests für horizontal skalierte Agenten-Worker
+Testet Worker-Spezifikationen, den Supervisor und mehrere Worker-Prozesse,
+die sich eine SQLite-Nachrichtentabelle teilen
+"""
+
+import pytest
+import multiprocessing
+import sqlite3
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from utils.base_agent import BaseAgent
+from utils.work_queue import SQLiteWorkQueue
+from utils.worker_pool import WorkerSupervisor, agent_class_path, parse_worker_specs, run_agent_worker
+
+FORK = multiprocessing.get_context("fork")
+
+class CountingAgent(BaseAgent):
+    """Agent, der jede verarbeitete Nachricht mit seiner PID protokolliert"""
+
+    def __init__(self):
+        super().__init__("ACQ-002", "Lead Qualification Agent", "akquise")
+        self.db_path = os.environ["WORKER_TEST_DB"]
+
+    async def process_message(self, message):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO handled (message_id, pid) VALUES (?, ?)", (message["id"], os.getpid()))
+        return True
+
+def crashing_worker(agent_id, agent_class, index):
+    os._exit(3)
+
+def idle_worker(agent_id, agent_class, index):
+    time.sleep(30)
+
+class FakeClock:
+    """Steuerbare Uhr für den Restart-Backoff"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+class TestWorkerSpecs:
+    """Tests für das Parsen von --workers"""
+
+    def test_parse_multiple_and_comma_separated(self):
+        """Mehrfach- und komma-getrennte Angaben werden zusammengeführt"""
+        assert parse_worker_specs(["ACQ-002=4", "ACQ-001=2, SALES-001=1"]) == {
+            "ACQ-002": 4, "ACQ-001": 2, "SALES-001": 1
+        }
+
+    @pytest.mark.parametrize("spec", ["ACQ-002", "ACQ-002=0", "ACQ-002=viele", "=2"])
+    def test_invalid_specs_raise(self, spec):
+        """Ungültige Angaben werden mit ValueError abgelehnt"""
+        with pytest.raises(ValueError):
+            parse_worker_specs([spec])
+
+class TestWorkerSupervisor:
+    """Tests für Neustart und Shutdown der Worker-Prozesse"""
+
+    def setup_method(self):
+        """Setup für jeden Test"""
+        self.clock = FakeClock()
+
+    def test_crashed_worker_is_restarted_with_backoff(self):
+        """Abgestürzte Worker werden nach exponentiell wachsendem Backoff neu gestartet"""
+        supervisor = WorkerSupervisor(
+            target=crashing_worker, restart_backoff=1, max_restart_backoff=60, context=FORK, clock=self.clock
+        )
+        supervisor.add("ACQ-002", "unused:Agent", 1)
+        supervisor.start()
+        slot = supervisor.slots[0]
+        slot.process.join(5)
+
+        assert supervisor.check() == 0  # Backoff läuft
+        self.clock.now = 1
+        assert supervisor.check() == 1
+        first_restart = slot.process.pid
+        slot.process.join(5)
+
+        assert supervisor.check() == 0
+        self.clock.now = 2.5
+        assert supervisor.check() == 0  # zweiter Backoff: 2 Sekunden
+        self.clock.now = 3
+        assert supervisor.check() == 1
+        assert slot.restarts == 2 and slot.process.pid != first_restart
+        supervisor.stop(timeout=5)
+
+    def test_stop_terminates_workers_without_restart(self):
+        """Beim Shutdown werden Worker beendet und nicht neu gestartet"""
+        supervisor = WorkerSupervisor(target=idle_worker, restart_backoff=0, context=FORK, clock=self.clock)
+        supervisor.add("ACQ-002", "unused:Agent", 2)
+        supervisor.start()
+
+        assert [worker["worker"] for worker in supervisor.get_status()] == ["ACQ-002-worker-0", "ACQ-002-worker-1"]
+        supervisor.stop(timeout=5)
+
+        assert supervisor.check() == 0
+        assert not any(worker["alive"] for worker in supervisor.get_status())
+
+    def _seed_messages(self, tmp_path, monkeypatch) -> str:
+        db_path = str(tmp_path / "agents.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE agents (id TEXT PRIMARY KEY, last_action TEXT)")
+            conn.execute("""
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, sender_id TEXT, receiver_id TEXT,
+                    message_type TEXT, content TEXT, metadata TEXT, status TEXT DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, processed_at TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE TABLE handled (message_id INTEGER, pid INTEGER)")
+            conn.executemany(
+                "INSERT INTO messages (sender_id, receiver_id, message_type, content) VALUES (?, ?, ?, ?)",
+                [("ACQ-001", "ACQ-002", "qualify_lead", f'{{"lead_id": {i}}}') for i in range(30)]
+            )
+        monkeypatch.setenv("WORKER_TEST_DB", db_path)
+        return db_path
+
+    def test_workers_share_messages_without_duplicates(self, tmp_path, monkeypatch):
+        """Mehrere Worker-Prozesse verarbeiten jede Nachricht genau einmal"""
+        db_path = self._seed_messages(tmp_path, monkeypatch)
+
+        supervisor = WorkerSupervisor(target=run_agent_worker, context=FORK)
+        supervisor.add("ACQ-002", agent_class_path(CountingAgent()), 3)
+        supervisor.start()
+        queue = SQLiteWorkQueue(db_path)
+        try:
+            assert wait_until(lambda: queue.get_stats("ACQ-002").get("processed") == 30)
+        finally:
+            supervisor.stop(timeout=10)
+
+        with sqlite3.connect(db_path) as conn:
+            handled = [row[0] for row in conn.execute("SELECT message_id FROM handled")]
+        assert sorted(handled) == list(range(1, 31))
+
+    def test_orchestrator_key_may_differ_from_agent_id(self, tmp_path, monkeypatch):
+        """Der --workers-Schlüssel bezeichnet nur den Platz; der Agent konsumiert unter seiner agent_id"""
+        db_path = self._seed_messages(tmp_path, monkeypatch)
+
+        supervisor = WorkerSupervisor(target=run_agent_worker, context=FORK)
+        supervisor.add("SALES-005", agent_class_path(CountingAgent()), 2)
+        supervisor.start()
+        queue = SQLiteWorkQueue(db_path)
+        try:
+            assert wait_until(lambda: queue.get_stats("ACQ-002").get("processed") == 30)
+            assert supervisor.check() == 0
+            assert all(worker["alive"] and worker["restarts"] == 0 for worker in supervisor.get_status())
+        finally:
+            supervisor.stop(timeout=10)
@@ -0,0 +1,117 @@
+"""
+Heartbeats und entdoppelte Health-Alerts der Agenten
+Jeder Worker schreibt aus seiner Agentenschleife höchstens alle
+AGENT_HEARTBEAT_INTERVAL Sekunden einen Heartbeat (agent_heartbeats, Migration 5).
+Der CEO-Agent wertet sie mit evaluate_agent_health() aus; je Agent gibt es
+höchstens einen offenen Alert in health_alerts:
+
+    kein Alert --(Heartbeat veraltet)--> new --(weiter veraltet)--> ongoing
+    offen --(Heartbeat wieder frisch oder Agent sauber gestoppt)--> resolved
+
+Nur new und resolved sind Zustandswechsel - ongoing-Alerts werden lediglich
+gezählt und lösen keine erneute LLM-Analyse aus.
+"""
+
+import os
+import time
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+AGENT_HEARTBEAT_INTERVAL = float(os.getenv("AGENT_HEARTBEAT_INTERVAL", "15"))
+# Ohne Heartbeat seit so vielen Sekunden gilt ein laufender Agent als ausgefallen
+AGENT_HEARTBEAT_TIMEOUT = float(os.getenv("AGENT_HEARTBEAT_TIMEOUT", "600"))
+
+STALE_HEARTBEAT = "stale_heartbeat"
+
+@dataclass(frozen=True)
+class AlertTransition:
+    """Zustand eines Alerts nach einer Auswertung (new, ongoing oder resolved)"""
+
+    alert_key: str
+    agent_id: str
+    agent_name: str
+    state: str
+    last_heartbeat: float
+    opened_at: float
+    occurrences: int
+
+def record_heartbeat(conn: sqlite3.Connection, agent_id: str, agent_name: str, worker_id: str,
+                     status: str = "running", now: Optional[float] = None):
+    """Aktualisiert den Heartbeat eines Workers (status 'stopped' beim sauberen Beenden)"""
+    conn.execute("""
+        INSERT INTO agent_heartbeats (agent_id, worker_id, agent_name, status, beat_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (agent_id, worker_id) DO UPDATE SET
+            agent_name = excluded.agent_name,
+            status = excluded.status,
+            beat_at = excluded.beat_at
+    """, (agent_id, worker_id, agent_name, status, time.time() if now is None else now))
+
+def stale_agents(conn: sqlite3.Connection, timeout: float = AGENT_HEARTBEAT_TIMEOUT,
+                 now: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Agenten, deren jüngster Heartbeat 'running' meldet und älter als timeout ist.
+    Ein abgestürzter Worker zählt nicht, solange ein anderer Worker desselben
+    Agenten frische Heartbeats schreibt.
+    """
+    cutoff = (time.time() if now is None else now) - timeout
+    # SQLite liefert bei MAX() die übrigen Spalten aus der Zeile mit dem Maximum
+    rows = conn.execute("""
+        SELECT agent_id, agent_name, status, MAX(beat_at) FROM agent_heartbeats GROUP BY agent_id
+    """)
+    return {
+        agent_id: {"agent_name": agent_name, "last_heartbeat": beat_at}
+        for agent_id, agent_name, status, beat_at in rows
+        if status == "running" and beat_at < cutoff
+    }
+
+def evaluate_agent_health(conn: sqlite3.Connection, timeout: float = AGENT_HEARTBEAT_TIMEOUT,
+                          now: Optional[float] = None) -> List[AlertTransition]:
+    """
+    Gleicht veraltete Heartbeats mit den offenen Alerts ab und schreibt die
+    Zustandswechsel nach health_alerts. Läuft als eine Transaktion
+    (AsyncDatabase.transaction); der eindeutige Teilindex über offene Alerts
+    verhindert doppelt geöffnete Alerts paralleler Auswertungen.
+    """
+    now = time.time() if now is None else now
+    stale = stale_agents(conn, timeout, now)
+    open_alerts = {
+        agent_id: (alert_id, alert_key, agent_name, opened_at, occurrences)
+        for alert_id, alert_key, agent_id, agent_name, opened_at, occurrences in conn.execute("""
+            SELECT id, alert_key, agent_id, agent_name, opened_at, occurrences FROM health_alerts
+            WHERE state = 'open' AND kind = ?
+        """, (STALE_HEARTBEAT,))
+    }
+
+    transitions = []
+    for agent_id, info in stale.items():
+        if agent_id in open_alerts:
+            alert_id, alert_key, _, opened_at, occurrences = open_alerts[agent_id]
+            occurrences += 1
+            conn.execute("""
+                UPDATE health_alerts SET last_seen_at = ?, occurrences = ? WHERE id = ?
+            """, (now, occurrences, alert_id))
+            state = "ongoing"
+        else:
+            alert_key, opened_at, occurrences = f"{STALE_HEARTBEAT}:{agent_id}", now, 1
+            conn.execute("""
+                INSERT INTO health_alerts (alert_key, kind, agent_id, agent_name, state, opened_at, last_seen_at)
+                VALUES (?, ?, ?, ?, 'open', ?, ?)
+            """, (alert_key, STALE_HEARTBEAT, agent_id, info["agent_name"], now, now))
+            state = "new"
+        transitions.append(AlertTransition(alert_key, agent_id, info["agent_name"], state,
+                                           info["last_heartbeat"], opened_at, occurrences))
+
+    for agent_id, (alert_id, alert_key, agent_name, opened_at, occurrences) in open_alerts.items():
+        if agent_id in stale:
+            continue
+        conn.execute("""
+            UPDATE health_alerts SET state = 'resolved', resolved_at = ? WHERE id = ?
+        """, (now, alert_id))
+        last_heartbeat = conn.execute(
+            "SELECT MAX(beat_at) FROM agent_heartbeats WHERE agent_id = ?", (agent_id,)
+        ).fetchone()[0]
+        transitions.append(AlertTransition(alert_key, agent_id, agent_name, "resolved",
+                                           last_heartbeat or 0.0, opened_at, occurrences))
+    return transitions
@@ -4,15 +4,25 @@ Implements the standardized JSON-based messaging system for agent communication
 as specified in the Umsetzungsplan.
 """
 
-import json
+import os
 import uuid
 import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from enum import Enum
 import sqlite3
-from utils.database import get_database_connection
+import utils.database
+from utils.connection_manager import get_connection
+from utils.async_db import get_async_db
+from utils.work_queue import PRIORITY_LEVELS, SQLiteWorkQueue
+from utils.message_history import MESSAGE_HISTORY_SIZE, MessageHistoryBuffer
+from utils.group_commit import GroupCommitWriter
+from utils.message_codec import MessageCodec, decode_content, get_message_codec
+
+BUS_REQUEST_TIMEOUT = float(os.getenv("BUS_REQUEST_TIMEOUT", "120"))
+# Intervall, in dem request() zusätzlich in SQLite nach Antworten anderer Prozesse sucht
+BUS_REQUEST_POLL_INTERVAL = float(os.getenv("BUS_REQUEST_POLL_INTERVAL", "1"))
 
 class MessageType(Enum):
     TASK_REQUEST = "task_request"
@@ -28,8 +38,13 @@ class MessagePriority(Enum):
     NORMAL = "normal"
     HIGH = "high"
     URGENT = "urgent"
+    
+    @property
+    def level(self) -> int:
+        """Numeric priority for ordering (higher = more urgent)"""
+        return PRIORITY_LEVELS[self.value]
 
-@dataclass
+@dataclass(slots=True)
 class AgentMessage:
     """Standard message format for agent communication"""
     message_id: str
@@ -46,27 +61,84 @@ class AgentMessage:
     correlation_id: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert message to dictionary for JSON serialization"""
-        data = asdict(self)
+        """Convert message to dictionary for JSON serialization (payload is shared, not deep-copied)"""
+        data = {name: getattr(self, name) for name in MESSAGE_FIELDS}
         data['message_type'] = self.message_type.value
         data['priority'] = self.priority.value
         return data
     
+    def content_dict(self) -> Dict[str, Any]:
+        """Fields stored in the content column of agent_messages"""
+        return {name: getattr(self, name) for name in CONTENT_FIELDS}
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'AgentMessage':
         """Create message from dictionary"""
+        data = dict(data)
         data['message_type'] = MessageType(data['message_type'])
         data['priority'] = MessagePriority(data['priority'])
         return cls(**data)
+    
+    @classmethod
+    def from_content(cls, message_id: str, timestamp: str, sender_agent: str, receiver_agent: str,
+                     message_type: str, priority: str, content: Dict[str, Any]) -> 'AgentMessage':
+        """Create message from the agent_messages columns and the decoded content column"""
+        return cls(
+            message_id, timestamp, sender_agent, receiver_agent,
+            MessageType(message_type), MessagePriority(priority),
+            content.get('task_id'),
+            content.get('lead_id'),
+            content.get('project_id'),
+            content.get('payload'),
+            content.get('requires_response', False),
+            content.get('correlation_id')
+        )
+
+MESSAGE_FIELDS = tuple(field.name for field in fields(AgentMessage))
+CONTENT_FIELDS = ("task_id", "lead_id", "project_id", "payload", "requires_response", "correlation_id")
+
+# Spalten in der Reihenfolge, die message_from_row erwartet
+MESSAGE_COLUMNS = "id, sender_id, receiver_id, message_type, content, priority, created_at"
+
+def message_from_row(row) -> AgentMessage:
+    """Build an AgentMessage from an agent_messages row (MESSAGE_COLUMNS order)"""
+    return AgentMessage.from_content(row[0], row[6], row[1], row[2], row[3], row[5], decode_content(row[4]))
 
 class MessageBus:
     """Central message bus for agent communication"""
     
-    def __init__(self):
+    def __init__(self, history_size: int = MESSAGE_HISTORY_SIZE, codec: MessageCodec = None,
+                 db_path: str = None):
         self.subscribers: Dict[str, List[callable]] = {}
-        self.message_history: List[AgentMessage] = []
+        # Ohne db_path gilt utils.database.DATABASE_PATH zum Zeitpunkt des Zugriffs
+        self._db_path = db_path
+        self._work_queue: Optional[SQLiteWorkQueue] = None
+        # Serialisierung der content-Spalte (orjson, falls installiert)
+        self.codec = codec or get_message_codec()
+        # Begrenzter Ringpuffer statt unbegrenzt wachsender Liste
+        self.message_history = MessageHistoryBuffer(history_size)
+        # Inserts/Updates werden im Hintergrund gebündelt committet
+        self.writer = GroupCommitWriter(self._connect)
+        # Offene request()-Aufrufe: Request-ID (= correlation_id der Antwort) -> (Loop, Future)
+        self._pending_requests: Dict[str, tuple] = {}
+        self.request_stats = {"requests": 0, "resolved_in_memory": 0, "resolved_from_db": 0, "timeouts": 0}
         self.init_database()
     
+    @property
+    def db_path(self) -> str:
+        return self._db_path or utils.database.DATABASE_PATH
+    
+    @property
+    def work_queue(self) -> SQLiteWorkQueue:
+        """Lease-Queue über agent_messages der aktuellen Datenbank"""
+        path = self.db_path
+        if self._work_queue is None or self._work_queue.db_path != path:
+            self._work_queue = SQLiteWorkQueue(path, table="agent_messages", priority_column="priority_num")
+        return self._work_queue
+    
+    def _connect(self) -> sqlite3.Connection:
+        return get_connection(self.db_path)
+    
     def init_database(self):
         """Initialize message storage in database"""
         # Database tables are now created in utils/database.py
@@ -79,14 +151,22 @@ class MessageBus:
             self.subscribers[agent_name] = []
         self.subscribers[agent_name].append(callback)
     
-    def publish(self, message: AgentMessage) -> str:
-        """Publish a message to the bus"""
+    def publish(self, message: AgentMessage, durable: bool = False) -> str:
+        """
+        Publish a message to the bus.
+        With durable=True the call returns only after the message is committed
+        (use for critical messages); otherwise it is group-committed within milliseconds.
+        """
         # Store in database
-        self._store_message(message)
+        self._store_message(message, durable)
         
         # Add to in-memory history
         self.message_history.append(message)
         
+        # Wartenden request()-Aufruf direkt bedienen
+        if message.message_type == MessageType.TASK_RESPONSE and message.correlation_id:
+            self._resolve_request(message)
+        
         # Notify subscribers
         if message.receiver_agent in self.subscribers:
             for callback in self.subscribers[message.receiver_agent]:
@@ -97,130 +177,211 @@ class MessageBus:
         
         return message.message_id
     
-    def _store_message(self, message: AgentMessage):
+    async def request(self, message: AgentMessage, timeout: float = BUS_REQUEST_TIMEOUT,
+                      poll_interval: float = BUS_REQUEST_POLL_INTERVAL) -> AgentMessage:
+        """
+        Publish a request and await the correlated TASK_RESPONSE.
+        Responses published on this bus resolve the call immediately; responses written
+        by other processes are picked up from SQLite every `poll_interval` seconds.
+        Raises asyncio.TimeoutError if no response arrives within `timeout`.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        message.requires_response = True
+        self._pending_requests[message.message_id] = (loop, future)
+        self.request_stats["requests"] += 1
+        deadline = loop.time() + timeout
+        try:
+            self.publish(message)
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.request_stats["timeouts"] += 1
+                    raise asyncio.TimeoutError(
+                        f"No response to {message.message_id} from {message.receiver_agent} within {timeout}s"
+                    )
+                try:
+                    response = await asyncio.wait_for(asyncio.shield(future), min(remaining, poll_interval))
+                    self.request_stats["resolved_in_memory"] += 1
+                    break
+                except asyncio.TimeoutError:
+                    # Durable Fallback: Antwort eines anderen Prozesses in SQLite
+                    response = await self._find_response(message.message_id, message.sender_agent)
+                    if response is not None:
+                        self.request_stats["resolved_from_db"] += 1
+                        break
+        finally:
+            self._pending_requests.pop(message.message_id, None)
+            future.cancel()
+        
+        # Die Antwort ist zugestellt und soll nicht zusätzlich im Posteingang landen
+        self.mark_message_processed(response.message_id)
+        return response
+    
+    def respond(self, request: AgentMessage, sender: str, result: Dict[str, Any], success: bool = True,
+                durable: bool = False) -> str:
+        """Publish the TASK_RESPONSE for a request (resolves a waiting request() call)"""
+        return self.publish(create_task_response(request, sender, result, success), durable=durable)
+    
+    def _resolve_request(self, response: AgentMessage) -> bool:
+        pending = self._pending_requests.get(response.correlation_id)
+        if pending is None:
+            return False
+        loop, future = pending
+        
+        def deliver():
+            if not future.done():
+                future.set_result(response)
+        
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        if loop is current_loop:
+            deliver()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(deliver)
+        return True
+    
+    async def _find_response(self, correlation_id: str, receiver: str) -> Optional[AgentMessage]:
+        """Look up a pending response for a request in SQLite (reader pool, indexed by correlation_id)"""
+        row = await get_async_db(self.db_path).fetchone(f'''
+            SELECT {MESSAGE_COLUMNS}
+            FROM agent_messages
+            WHERE correlation_id = ? AND receiver_id = ? AND status = 'pending' AND message_type = ?
+            ORDER BY created_at ASC
+            LIMIT 1
+        ''', (correlation_id, receiver, MessageType.TASK_RESPONSE.value))
+        return message_from_row(row) if row is not None else None
+    
+    def get_request_stats(self) -> Dict[str, int]:
+        return {**self.request_stats, "pending": len(self._pending_requests)}
+    
+    def _store_message(self, message: AgentMessage, durable: bool = False):
         """Store message in database using standardized schema"""
-        conn = get_database_connection()
-        cursor = conn.cursor()
+        # Ältere Datenbanken um priority_num und Lease-Spalten ergänzen
+        self.work_queue.ensure_schema()
         
         # Map to the standardized schema from database.py
-        content = {
-            "task_id": message.task_id,
-            "lead_id": message.lead_id,
-            "project_id": message.project_id,
-            "payload": message.payload,
-            "requires_response": message.requires_response,
-            "correlation_id": message.correlation_id
-        }
+        content = self.codec.encode(message.content_dict())
         
-        cursor.execute('''
+        self.writer.submit('''
             INSERT INTO agent_messages 
-            (id, sender_id, receiver_id, message_type, content, priority, status, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            (id, sender_id, receiver_id, message_type, content, priority, priority_num, status, created_at,
+             correlation_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             message.message_id,
             message.sender_agent,
             message.receiver_agent,
             message.message_type.value,
-            json.dumps(content),
+            content,
             message.priority.value,
+            message.priority.level,
             'pending',
-            message.timestamp
-        ))
-        
-        conn.commit()
-        conn.close()
+            message.timestamp,
+            message.correlation_id
+        ), durable=durable)
+    
+    def flush(self):
+        """Wait until all buffered writes are committed"""
+        self.writer.flush()
+    
+    def close(self):
+        """Flush pending writes and stop the background writer"""
+        self.writer.close()
     
     def get_unprocessed_messages(self, agent_name: str) -> List[AgentMessage]:
-        """Get unprocessed messages for an agent"""
-        conn = get_database_connection()
+        """Get unprocessed messages for an agent (most urgent first, aged low priorities move up)"""
+        self.flush()
+        self.work_queue.ensure_schema()
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT id, sender_id, receiver_id, message_type, content, priority, created_at
+        cursor.execute(f'''
+            SELECT {MESSAGE_COLUMNS}
             FROM agent_messages
             WHERE receiver_id = ? AND status = 'pending'
-            ORDER BY priority DESC, created_at ASC
+            ORDER BY {self.work_queue.dispatch_order()}
         ''', (agent_name,))
         
         messages = []
         for row in cursor.fetchall():
-            # Parse content back to individual fields
-            content = json.loads(row[4]) if row[4] else {}
-            
-            message_data = {
-                'message_id': row[0],
-                'timestamp': row[6],
-                'sender_agent': row[1],
-                'receiver_agent': row[2],
-                'message_type': MessageType(row[3]),
-                'priority': MessagePriority(row[5]),
-                'task_id': content.get('task_id'),
-                'lead_id': content.get('lead_id'),
-                'project_id': content.get('project_id'),
-                'payload': content.get('payload'),
-                'requires_response': content.get('requires_response', False),
-                'correlation_id': content.get('correlation_id')
-            }
-            messages.append(AgentMessage(**message_data))
+            messages.append(message_from_row(row))
         
         conn.close()
         return messages
     
+    def claim_messages(self, agent_name: str, worker_id: str, limit: int = 10) -> List[AgentMessage]:
+        """Atomically lease up to `limit` pending messages to one worker (at-least-once)"""
+        self.flush()
+        messages = []
+        for row in self.work_queue.claim(agent_name, worker_id, limit):
+            messages.append(AgentMessage.from_content(
+                row['id'], row['created_at'], row['sender_id'], row['receiver_id'],
+                row['message_type'], row['priority'], decode_content(row['content'])
+            ))
+        return messages
+    
+    def ack_message(self, message_id: str, worker_id: str) -> bool:
+        """Acknowledge a claimed message; False if the lease was lost"""
+        return self.work_queue.ack(message_id, worker_id)
+    
+    def release_message(self, message_id: str, worker_id: str, error: str = "") -> str:
+        """Return a claimed message for retry or move it to the dead letters"""
+        return self.work_queue.nack(message_id, worker_id, error)
+    
     def mark_message_processed(self, message_id: str):
         """Mark a message as processed"""
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        self.writer.submit('''
             UPDATE agent_messages 
             SET status = 'processed', processed_at = ?
             WHERE id = ?
         ''', (datetime.utcnow().isoformat(), message_id))
-        
-        conn.commit()
-        conn.close()
     
     def get_message_history(self, agent_name: str = None, limit: int = 100) -> List[AgentMessage]:
-        """Get message history, optionally filtered by agent"""
-        conn = get_database_connection()
-        cursor = conn.cursor()
+        """
+        Get message history (newest first), optionally filtered by agent.
+        Served from the in-memory ring buffer; older entries are read from SQLite.
+        """
+        messages = self.message_history.recent(agent_name, limit)
+        if len(messages) >= limit:
+            return messages
         
+        # Ältere (verdrängte oder von anderen Prozessen geschriebene) Einträge aus SQLite
+        seen = {message.message_id for message in messages}
+        before = messages[-1].timestamp if messages else None
+        return messages + [
+            message for message in self._load_history(agent_name, limit - len(messages) + len(seen), before)
+            if message.message_id not in seen
+        ][:limit - len(messages)]
+    
+    def _load_history(self, agent_name: Optional[str], limit: int, before: Optional[str]) -> List[AgentMessage]:
+        """Read history rows from SQLite, newest first, optionally up to a timestamp"""
+        conditions = []
+        params: list = []
         if agent_name:
-            cursor.execute('''
-                SELECT id, sender_id, receiver_id, message_type, content, priority, created_at
-                FROM agent_messages
-                WHERE sender_id = ? OR receiver_id = ?
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (agent_name, agent_name, limit))
-        else:
-            cursor.execute('''
-                SELECT id, sender_id, receiver_id, message_type, content, priority, created_at
-                FROM agent_messages
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
+            conditions.append("(sender_id = ? OR receiver_id = ?)")
+            params += [agent_name, agent_name]
+        if before:
+            conditions.append("created_at <= ?")
+            params.append(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        self.flush()
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {MESSAGE_COLUMNS}
+            FROM agent_messages
+            {where}
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (*params, limit))
         
         messages = []
         for row in cursor.fetchall():
-            # Parse content back to individual fields
-            content = json.loads(row[4]) if row[4] else {}
-            
-            message_data = {
-                'message_id': row[0],
-                'timestamp': row[6],
-                'sender_agent': row[1],
-                'receiver_agent': row[2],
-                'message_type': MessageType(row[3]),
-                'priority': MessagePriority(row[5]),
-                'task_id': content.get('task_id'),
-                'lead_id': content.get('lead_id'),
-                'project_id': content.get('project_id'),
-                'payload': content.get('payload'),
-                'requires_response': content.get('requires_response', False),
-                'correlation_id': content.get('correlation_id')
-            }
-            messages.append(AgentMessage(**message_data))
+            messages.append(message_from_row(row))
         
         conn.close()
         return messages
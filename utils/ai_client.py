@@ -5,11 +5,13 @@ Unterstützt OpenAI, Gemini und weitere AI-Provider mit Fallback-Funktionalität
 
 import os
 import json
+import time
 import asyncio
 import logging
 import ssl
 import certifi
-from typing import Dict, List, Optional, Union
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from enum import Enum
 import openai
 import requests
@@ -20,9 +22,24 @@ from config.ai_task_config import (
     get_task_complexity,
     get_primary_provider,
     get_fallback_chain,
-    get_model_for_provider
+    get_model_for_provider,
+    get_cache_ttl,
+    is_cacheable_by_default,
+    is_hedged_task,
+    HEDGING_CONFIG,
+    BATCH_CONFIG
+)
+from utils.llm_cache import LLMResponseCache
+from utils.micro_batcher import MicroBatcher
+from utils.usage_ledger import UsageLedger
+from utils.connection_manager import get_connection
+from utils.provider_health import ProviderHealthRegistry
+from utils.rate_limiter import (
+    RateLimiterRegistry,
+    RateLimitError,
+    parse_retry_after,
+    estimate_tokens
 )
-import sqlite3
 from contextlib import closing
 
 # Lade Umgebungsvariablen
@@ -32,6 +49,24 @@ load_dotenv()
 # SSL Context für sichere API-Aufrufe
 ssl_context = ssl.create_default_context(cafile=certifi.where())
 
+# HTTP-Connection-Pool für Provider-Aufrufe (per Umgebungsvariable anpassbar)
+HTTP_POOL_LIMIT = int(os.getenv("AI_HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("AI_HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("AI_HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("AI_HTTP_DNS_CACHE_TTL", "300"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("AI_HTTP_REQUEST_TIMEOUT", "120"))
+
+# API-Endpunkte der Provider (überschreibbar, z.B. für Proxies oder lokale Test-Server)
+API_BASE_URLS = {
+    "openai": os.getenv("OPENAI_API_BASE", "https://api.openai.com"),
+    "anthropic": os.getenv("ANTHROPIC_API_BASE", "https://api.anthropic.com"),
+    "gemini": os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com"),
+    "deepseek": os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com")
+}
+
+# Response-Cache global abschaltbar
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
 DATABASE_PATH = 'database/agent_system.db'
 
 class DatabaseManager:
@@ -39,13 +74,13 @@ class DatabaseManager:
         self.db_path = db_path
 
     def execute_query(self, query, params=()):
-        with closing(sqlite3.connect(self.db_path)) as conn:
+        with closing(get_connection(self.db_path)) as conn:
             with closing(conn.cursor()) as cursor:
                 cursor.execute(query, params)
                 conn.commit()
 
     def fetch_query(self, query, params=()):
-        with closing(sqlite3.connect(self.db_path)) as conn:
+        with closing(get_connection(self.db_path)) as conn:
             with closing(conn.cursor()) as cursor:
                 cursor.execute(query, params)
                 return cursor.fetchall()
@@ -127,32 +162,106 @@ class DatabaseManager:
 class MultiProviderAIClient:
     """Intelligent AI client that automatically selects and falls back between providers"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        pool_limit: int = HTTP_POOL_LIMIT,
+        pool_limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        request_timeout: float = HTTP_REQUEST_TIMEOUT,
+        response_cache: Optional[LLMResponseCache] = None,
+        base_urls: Optional[Dict[str, str]] = None,
+        usage_ledger: Optional[UsageLedger] = None
+    ):
+        self.base_urls = {**API_BASE_URLS, **(base_urls or {})}
         self._initialize_clients()
         self.rate_limit_retries = 3
         self.rate_limit_delay = 1.0
-        self.usage_log = []
+        # Append-only Ledger für Tokens, Kosten und Latenz je Aufruf
+        self.usage_ledger = usage_ledger or UsageLedger()
+        
+        # Connection-Pool Konfiguration
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        
+        # Langlebige Sessions, eine pro Event-Loop (aiohttp-Sessions sind loop-gebunden)
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        
+        # Content-adressierter Response-Cache
+        if response_cache is None and LLM_CACHE_ENABLED:
+            response_cache = LLMResponseCache()
+        self.response_cache = response_cache
+        
+        # Circuit Breaker und Latenzmessung je Provider/Modell
+        self.health = ProviderHealthRegistry()
         
-        # Gemeinsame Session für alle API-Aufrufe
-        self.session = None
+        # Gemeinsame Token-Buckets und Concurrency-Limits je Provider
+        self.rate_limiters = RateLimiterRegistry()
+        
+        # Time-to-first-token der Streaming-Aufrufe je Provider
+        self.stream_ttft: Dict[str, deque] = {}
+        
+        # Micro-Batcher für gleichzeitige Einzelanfragen mehrerer Agenten
+        self.batcher = MicroBatcher(self.chat_completion_batch)
+        # Gemeinsames Concurrency-Limit aller Batches, eines je Event-Loop
+        self._batch_semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
         
     async def __aenter__(self):
         """Setup for async context manager"""
-        self.session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=ssl_context)
-        )
+        await self._get_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Cleanup for async context manager"""
-        if self.session:
-            await self.session.close()
+        await self.aclose()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Gibt die gepoolte Session des aktuellen Event-Loops zurück (legt sie bei Bedarf an)"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # Sessions beendeter Event-Loops verwerfen
+            self._sessions = {
+                owner: s for owner, s in self._sessions.items()
+                if not owner.is_closed()
+            }
+            connector = aiohttp.TCPConnector(
+                ssl=ssl_context,
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._sessions[loop] = session
+        return session
+    
+    async def aclose(self):
+        """Schließt alle gepoolten HTTP-Sessions und schreibt das Usage-Ledger weg"""
+        await self.usage_ledger.flush_async()
+        sessions, self._sessions = self._sessions, {}
+        current_loop = asyncio.get_running_loop()
+        for owner, session in sessions.items():
+            if session.closed:
+                continue
+            if owner is current_loop:
+                await session.close()
+            elif owner.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), owner)
             
     def _initialize_clients(self):
         """Initialize connections to all supported AI providers"""
         # OpenAI setup
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
+            api_key=self.openai_api_key
         )
         
         # Anthropic setup
@@ -169,44 +278,583 @@ class MultiProviderAIClient:
         messages: List[Dict[str, str]],
         task_name: str,
         temperature: float = 0.3,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        provider: Optional[str] = None,
+        cache: Optional[bool] = None,
+        hedge: Optional[bool] = None,
+        agent_id: Optional[str] = None,
+        pod: Optional[str] = None
     ) -> str:
         """
         Get a chat completion using the appropriate provider based on task complexity
-        with automatic fallback handling
+        with automatic fallback handling.
+        
+        Responses are served from the response cache when `cache=True` or, by default,
+        when the temperature is deterministic enough; `cache=False` bypasses the cache.
+        Latency-critical tasks (see HEDGING_CONFIG) fire a hedged request to the next
+        provider when the first one is slower than its p95; `hedge` overrides this.
+        Every call is recorded in the usage ledger, attributed to `agent_id` and `pod`.
         """
-        if not self.session:
-            self.session = aiohttp.ClientSession(
-                connector=aiohttp.TCPConnector(ssl=ssl_context)
+        started = time.monotonic()
+        prompt_tokens = estimate_tokens(messages)
+        try:
+            provider_name, model, response, cache_hit = await self._complete(
+                messages, task_name, temperature, max_tokens, provider, cache, hedge
+            )
+        except Exception:
+            self.usage_ledger.record(
+                None, None, task_name, prompt_tokens, 0, time.monotonic() - started,
+                success=False, agent_id=agent_id, pod=pod
             )
+            raise
+        
+        self.usage_ledger.record(
+            provider_name, model, task_name, prompt_tokens, len(response or "") // 4,
+            time.monotonic() - started, cache_hit=cache_hit, agent_id=agent_id, pod=pod
+        )
+        return response
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        task_name: str,
+        temperature: float,
+        max_tokens: int,
+        provider: Optional[str],
+        cache: Optional[bool],
+        hedge: Optional[bool]
+    ) -> Tuple[str, str, str, bool]:
+        """Routing, Cache, Hedging und Fallback; gibt (provider, model, response, cache_hit) zurück"""
+        use_cache = self.response_cache is not None and (
+            cache if cache is not None else is_cacheable_by_default(temperature)
+        )
+        if hedge is None:
+            hedge = is_hedged_task(task_name)
+        
+        candidates = self._route_candidates(task_name, provider)
+        
+        def cache_key_for(provider_name: str, model: str) -> Optional[str]:
+            if not use_cache:
+                return None
+            return LLMResponseCache.make_key(provider_name, model, messages, temperature, max_tokens)
+        
+        async def store(provider_name: str, model: str, response: str):
+            cache_key = cache_key_for(provider_name, model)
+            if cache_key is not None:
+                await self.response_cache.set_async(
+                    cache_key, response, get_cache_ttl(task_name),
+                    provider=provider_name, model=model
+                )
+        
+        # Hedged request: first two healthy providers race after a p95 deadline
+        next_index = 0
+        if hedge and len(candidates) >= 2:
+            for provider_name, model in candidates[:2]:
+                cache_key = cache_key_for(provider_name, model)
+                cached = await self.response_cache.get_async(cache_key) if cache_key else None
+                if cached is not None:
+                    return provider_name, model, cached, True
+            try:
+                (provider_name, model), response = await self._hedged_attempt(
+                    candidates[0], candidates[1], messages, temperature, max_tokens
+                )
+                await store(provider_name, model, response)
+                return provider_name, model, response, False
+            except Exception as e:
+                logging.warning(f"Hedged request failed: {str(e)}")
+            next_index = 2
+        
+        # Try remaining healthy providers, fastest first
+        for provider_name, model in candidates[next_index:]:
+            cache_key = cache_key_for(provider_name, model)
+            cached = await self.response_cache.get_async(cache_key) if cache_key else None
+            if cached is not None:
+                return provider_name, model, cached, True
             
-        try:
-            # Determine task complexity and get provider chain
-            complexity = get_task_complexity(task_name)
-            primary_provider = get_primary_provider(complexity)
-            fallback_chain = get_fallback_chain(complexity)
+            try:
+                response = await self._attempt(provider_name, model, messages, temperature, max_tokens)
+            except Exception as e:
+                logging.warning(f"Provider {provider_name} failed: {str(e)}")
+                continue
             
-            # Try providers in sequence
-            for provider in [primary_provider] + fallback_chain:
+            await store(provider_name, model, response)
+            return provider_name, model, response, False
+        
+        raise Exception("All providers failed")
+
+    async def chat_completion_batch(
+        self,
+        batch: List[Dict],
+        max_concurrency: Optional[int] = None
+    ) -> List[Union[str, Exception]]:
+        """
+        Führt mehrere Chat-Completions als begrenzten parallelen Fan-out aus.
+        
+        Jede Anfrage ist ein Dict mit den Argumenten von `chat_completion`
+        (messages, task_name, optional temperature, max_tokens, provider, cache, hedge).
+        Die Ergebnisse kommen in Eingabereihenfolge zurück; fehlgeschlagene Anfragen
+        liefern ihre Exception statt den gesamten Batch abzubrechen.
+        
+        Ohne max_concurrency teilen sich alle gleichzeitigen Batches eines Event-Loops
+        (auch die des Micro-Batchers) BATCH_CONFIG["max_concurrency"] Slots; ein
+        explizites max_concurrency begrenzt nur diesen Aufruf.
+        """
+        if max_concurrency is None:
+            semaphore = self._batch_semaphore()
+        else:
+            semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(request: Dict) -> str:
+            async with semaphore:
+                return await self.chat_completion(**request)
+        
+        return await asyncio.gather(*(run(request) for request in batch), return_exceptions=True)
+
+    def _batch_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._batch_semaphores.get(loop)
+        if semaphore is None:
+            self._batch_semaphores = {
+                owner: s for owner, s in self._batch_semaphores.items()
+                if not owner.is_closed()
+            }
+            semaphore = self._batch_semaphores[loop] = asyncio.Semaphore(max(1, BATCH_CONFIG["max_concurrency"]))
+        return semaphore
+
+    async def submit_batched(
+        self,
+        messages: List[Dict[str, str]],
+        task_name: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        provider: Optional[str] = None,
+        cache: Optional[bool] = None,
+        agent_id: Optional[str] = None,
+        pod: Optional[str] = None
+    ) -> str:
+        """
+        Wie `chat_completion`, aber über den Micro-Batcher: gleichzeitige Anfragen
+        werden kurz gesammelt und gemeinsam über `chat_completion_batch` ausgeführt.
+        """
+        return await self.batcher.submit({
+            "messages": messages,
+            "task_name": task_name,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "provider": provider,
+            "cache": cache,
+            "agent_id": agent_id,
+            "pod": pod
+        })
+
+    def get_batch_stats(self) -> Dict[str, int]:
+        """Gibt Anzahl gesammelter Anfragen und Batches des Micro-Batchers zurück"""
+        return self.batcher.get_stats()
+
+    async def _attempt(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Einzelner Provider-Aufruf mit Circuit-Breaker-Buchung"""
+        breaker = self.health.get(provider, model)
+        if not breaker.allow_request():
+            raise Exception(f"Circuit for {provider}/{model} is open")
+        
+        limiter = self.rate_limiters.get(provider)
+        try:
+            for retry in range(self.rate_limit_retries + 1):
                 try:
-                    model = get_model_for_provider(provider, complexity)
-                    response = await self._call_provider(
-                        provider=provider,
+                    async with limiter.slot(estimate_tokens(messages)):
+                        started = time.monotonic()
+                        response = await self._call_provider(
+                            provider=provider,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            model=model
+                        )
+                    break
+                except RateLimitError as e:
+                    # 429: Provider für alle Agenten pausieren, dann erneut versuchen
+                    delay = e.retry_after if e.retry_after is not None else self.rate_limit_delay * (2 ** retry)
+                    limiter.penalize(delay)
+                    if retry == self.rate_limit_retries:
+                        raise
+                    logging.warning(f"{provider} rate limited, retrying in {delay:.1f}s")
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        
+        breaker.record_success(time.monotonic() - started)
+        limiter.record_usage(len(response or "") // 4)
+        return response
+
+    def _hedge_delay(self, provider: str, model: str) -> float:
+        """Wartezeit bis zum Hedge: p95-Latenz des ersten Providers"""
+        breaker = self.health.get(provider, model)
+        p95 = breaker.latency_percentile(HEDGING_CONFIG["percentile"]) if breaker.has_latency_data else None
+        if p95 is None:
+            return HEDGING_CONFIG["default_delay"]
+        return max(HEDGING_CONFIG["min_delay"], p95)
+
+    async def _hedged_attempt(
+        self,
+        first: tuple,
+        second: tuple,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> tuple:
+        """
+        Startet den ersten Provider und nach Ablauf der Hedge-Deadline (oder bei Fehler)
+        zusätzlich den zweiten. Die erste erfolgreiche Antwort gewinnt, der Rest wird abgebrochen.
+        """
+        def launch(candidate: tuple) -> asyncio.Task:
+            task = asyncio.create_task(
+                self._attempt(candidate[0], candidate[1], messages, temperature, max_tokens)
+            )
+            pending[task] = candidate
+            return task
+        
+        pending: Dict[asyncio.Task, tuple] = {}
+        launch(first)
+        hedge_started = False
+        errors = []
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=None if hedge_started else self._hedge_delay(*first),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    candidate = pending.pop(task)
+                    if task.exception() is None:
+                        return candidate, task.result()
+                    errors.append(f"{candidate[0]}: {task.exception()}")
+                
+                if not hedge_started:
+                    # Deadline überschritten oder erster Provider fehlgeschlagen
+                    hedge_started = True
+                    launch(second)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        raise Exception(f"Hedged providers failed: {'; '.join(errors)}")
+
+    def _route_candidates(self, task_name: str, provider: Optional[str] = None) -> List[tuple]:
+        """Baut die deduplizierte Provider/Modell-Kette und sortiert sie nach Health"""
+        complexity = get_task_complexity(task_name)
+        chain = [get_primary_provider(complexity)] + get_fallback_chain(complexity)
+        if provider:
+            chain = [provider] + chain
+        
+        candidates = []
+        for provider_name in chain:
+            try:
+                candidates.append((provider_name, get_model_for_provider(provider_name, complexity)))
+            except KeyError:
+                logging.warning(f"No model configured for provider {provider_name}")
+        
+        ordered = self.health.order_candidates(candidates)
+        if not ordered:
+            logging.warning(f"All circuits open for task {task_name}")
+        return ordered
+
+    def get_cost_analysis(self, since_hours: Optional[float] = 24) -> Dict:
+        """Gibt Kosten, Tokens und Cache-Quote je Provider, Agent und Pod zurück"""
+        return self.usage_ledger.get_cost_analysis(since_hours)
+
+    def get_usage_breakdown(self, group_by: str = "agent", since_hours: Optional[float] = 24) -> List[Dict]:
+        """Aggregiert das Usage-Ledger nach agent, pod, provider, model, task oder hour"""
+        return self.usage_ledger.aggregate(group_by, since_hours)
+
+    async def get_cost_analysis_async(self, since_hours: Optional[float] = 24) -> Dict:
+        """Wie get_cost_analysis, ohne den Event-Loop zu blockieren"""
+        return await self.usage_ledger.get_cost_analysis_async(since_hours)
+
+    async def get_usage_breakdown_async(self, group_by: str = "agent", since_hours: Optional[float] = 24) -> List[Dict]:
+        """Wie get_usage_breakdown, ohne den Event-Loop zu blockieren"""
+        return await self.usage_ledger.aggregate_async(group_by, since_hours)
+
+    def get_provider_health(self) -> Dict[str, Dict]:
+        """Gibt Circuit-Status, Fehlerrate und Latenzen je Provider/Modell zurück"""
+        return self.health.snapshot()
+
+    def get_rate_limit_stats(self) -> Dict[str, Dict]:
+        """Gibt Requests, 429-Drosselungen und Wartezeiten je Provider zurück"""
+        return self.rate_limiters.get_stats()
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        task_name: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        provider: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        pod: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion chunk by chunk (Server-Sent Events).
+        
+        Falls back to the next healthy provider only as long as no chunk has been
+        yielded yet; once output has started, errors are raised to the consumer.
+        """
+        stream_map = {
+            "openai": self._stream_openai,
+            "anthropic": self._stream_anthropic,
+            "gemini": self._stream_gemini,
+            "deepseek": self._stream_deepseek
+        }
+        
+        for provider_name, model in self._route_candidates(task_name, provider):
+            if provider_name not in stream_map:
+                continue
+            breaker = self.health.get(provider_name, model)
+            if not breaker.allow_request():
+                continue
+            
+            limiter = self.rate_limiters.get(provider_name)
+            first_chunk_at = None
+            output_chars = 0
+            try:
+                async with limiter.slot(estimate_tokens(messages)):
+                    started = time.monotonic()
+                    async for chunk in stream_map[provider_name](
                         messages=messages,
                         temperature=temperature,
                         max_tokens=max_tokens,
                         model=model
-                    )
-                    return response
-                except Exception as e:
-                    logging.warning(f"Provider {provider} failed: {str(e)}")
-                    continue
+                    ):
+                        if first_chunk_at is None:
+                            first_chunk_at = time.monotonic()
+                            self._record_ttft(provider_name, first_chunk_at - started)
+                        output_chars += len(chunk)
+                        yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except Exception as e:
+                if isinstance(e, RateLimitError):
+                    limiter.penalize(e.retry_after if e.retry_after is not None else self.rate_limit_delay)
+                breaker.record_failure()
+                if first_chunk_at is not None:
+                    raise
+                logging.warning(f"Provider {provider_name} stream failed: {str(e)}")
+                continue
             
-            raise Exception("All providers failed")
-        finally:
-            if self.session:
-                await self.session.close()
-                self.session = None
+            latency = time.monotonic() - started
+            breaker.record_success(latency)
+            limiter.record_usage(output_chars // 4)
+            self.usage_ledger.record(
+                provider_name, model, task_name, estimate_tokens(messages), output_chars // 4,
+                latency, agent_id=agent_id, pod=pod
+            )
+            return
+        
+        raise Exception("All providers failed")
+
+    def _record_ttft(self, provider: str, seconds: float):
+        self.stream_ttft.setdefault(provider, deque(maxlen=100)).append(seconds)
+
+    def get_streaming_stats(self) -> Dict[str, Dict]:
+        """Gibt Time-to-first-token (Mittelwert und p95) je Provider zurück"""
+        stats = {}
+        for provider, samples in self.stream_ttft.items():
+            ordered = sorted(samples)
+            stats[provider] = {
+                "streams": len(ordered),
+                "avg_ttft": sum(ordered) / len(ordered),
+                "p95_ttft": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+            }
+        return stats
+
+    async def _iter_sse(self, response: aiohttp.ClientResponse) -> AsyncIterator[Tuple[str, str]]:
+        """Parst einen Server-Sent-Events Stream in (event, data) Paare"""
+        event, data_lines = None, []
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if data_lines:
+                    yield event or "message", "\n".join(data_lines)
+                event, data_lines = None, []
+                continue
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+            if field == "event":
+                event = value
+            elif field == "data":
+                data_lines.append(value)
+        if data_lines:
+            yield event or "message", "\n".join(data_lines)
+
+    async def _check_stream_status(self, provider: str, label: str, response: aiohttp.ClientResponse):
+        if response.status == 429:
+            raise RateLimitError(provider, parse_retry_after(response.headers.get("Retry-After")))
+        if response.status != 200:
+            error_text = await response.text()
+            raise Exception(f"{label} API returned status {response.status}: {error_text}")
+
+    async def _stream_openai_compatible(
+        self,
+        provider: str,
+        label: str,
+        url: str,
+        api_key: str,
+        payload: Dict
+    ) -> AsyncIterator[str]:
+        """Gemeinsamer SSE-Stream für OpenAI und DeepSeek (Chat-Completions-Format)"""
+        session = await self._get_session()
+        async with session.post(
+            url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "content-type": "application/json"
+            },
+            json={**payload, "stream": True}
+        ) as response:
+            await self._check_stream_status(provider, label, response)
+            async for _, data in self._iter_sse(response):
+                if data.strip() == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                for choice in chunk.get("choices", []):
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
+
+    async def _stream_openai(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        model: str
+    ) -> AsyncIterator[str]:
+        """Stream OpenAI API"""
+        async for text in self._stream_openai_compatible(
+            "openai", "OpenAI",
+            f"{self.base_urls['openai']}/v1/chat/completions",
+            self.openai_api_key,
+            {
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+        ):
+            yield text
+
+    async def _stream_deepseek(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        model: str
+    ) -> AsyncIterator[str]:
+        """Stream DeepSeek API"""
+        prompt = self._convert_to_deepseek_format(messages)
+        async for text in self._stream_openai_compatible(
+            "deepseek", "DeepSeek",
+            f"{self.base_urls['deepseek']}/v1/chat/completions",
+            self.deepseek_api_key,
+            {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+        ):
+            yield text
+
+    async def _stream_anthropic(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        model: str
+    ) -> AsyncIterator[str]:
+        """Stream Anthropic API"""
+        prompt = self._convert_to_anthropic_format(messages)
+        session = await self._get_session()
+        async with session.post(
+            f"{self.base_urls['anthropic']}/v1/messages",
+            headers={
+                "x-api-key": self.anthropic_api_key,
+                "anthropic-version": "2023-06-01",
+                "content-type": "application/json"
+            },
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "stream": True
+            }
+        ) as response:
+            await self._check_stream_status("anthropic", "Anthropic", response)
+            async for event, data in self._iter_sse(response):
+                payload = json.loads(data)
+                if event == "error" or payload.get("type") == "error":
+                    raise Exception(f"Anthropic stream error: {payload.get('error')}")
+                if payload.get("type") == "content_block_delta":
+                    text = payload.get("delta", {}).get("text")
+                    if text:
+                        yield text
+                elif payload.get("type") == "message_stop":
+                    return
+
+    async def _stream_gemini(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        model: str
+    ) -> AsyncIterator[str]:
+        """Stream Gemini API"""
+        prompt = self._convert_to_gemini_format(messages)
+        session = await self._get_session()
+        async with session.post(
+            f"{self.base_urls['gemini']}/v1/models/{model}:streamGenerateContent?alt=sse",
+            headers={
+                "x-goog-api-key": self.gemini_api_key,
+                "content-type": "application/json"
+            },
+            json={
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": {
+                    "temperature": temperature,
+                    "maxOutputTokens": max_tokens,
+                }
+            }
+        ) as response:
+            await self._check_stream_status("gemini", "Gemini", response)
+            async for _, data in self._iter_sse(response):
+                payload = json.loads(data)
+                for candidate in payload.get("candidates", []):
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
+    def get_cache_stats(self) -> Dict:
+        """Gibt die Hit/Miss-Statistik des Response-Caches zurück"""
+        if self.response_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.response_cache.get_stats()}
 
     async def _call_provider(
         self,
@@ -250,6 +898,8 @@ class MultiProviderAIClient:
                 max_tokens=max_tokens
             )
             return response.choices[0].message.content
+        except openai.RateLimitError as e:
+            raise RateLimitError("openai", parse_retry_after(e.response.headers.get("retry-after")))
         except Exception as e:
             logging.error(f"OpenAI API error: {str(e)}")
             raise
@@ -266,8 +916,9 @@ class MultiProviderAIClient:
             # Convert messages to Anthropic format
             prompt = self._convert_to_anthropic_format(messages)
             
-            async with self.session.post(
-                "https://api.anthropic.com/v1/messages",
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_urls['anthropic']}/v1/messages",
                 headers={
                     "x-api-key": self.anthropic_api_key,
                     "anthropic-version": "2023-06-01",
@@ -280,6 +931,8 @@ class MultiProviderAIClient:
                     "temperature": temperature
                 }
             ) as response:
+                if response.status == 429:
+                    raise RateLimitError("anthropic", parse_retry_after(response.headers.get("Retry-After")))
                 if response.status != 200:
                     error_text = await response.text()
                     raise Exception(f"Anthropic API returned status {response.status}: {error_text}")
@@ -305,8 +958,9 @@ class MultiProviderAIClient:
             # Convert messages to Gemini format
             prompt = self._convert_to_gemini_format(messages)
             
-            async with self.session.post(
-                f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent",
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_urls['gemini']}/v1/models/{model}:generateContent",
                 headers={
                     "x-goog-api-key": self.gemini_api_key,
                     "content-type": "application/json"
@@ -319,6 +973,8 @@ class MultiProviderAIClient:
                     }
                 }
             ) as response:
+                if response.status == 429:
+                    raise RateLimitError("gemini", parse_retry_after(response.headers.get("Retry-After")))
                 if response.status != 200:
                     error_text = await response.text()
                     raise Exception(f"Gemini API returned status {response.status}: {error_text}")
@@ -352,8 +1008,9 @@ class MultiProviderAIClient:
             # Convert messages to DeepSeek format
             prompt = self._convert_to_deepseek_format(messages)
             
-            async with self.session.post(
-                "https://api.deepseek.com/v1/chat/completions",
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_urls['deepseek']}/v1/chat/completions",
                 headers={
                     "Authorization": f"Bearer {self.deepseek_api_key}",
                     "content-type": "application/json"
@@ -365,6 +1022,8 @@ class MultiProviderAIClient:
                     "temperature": temperature
                 }
             ) as response:
+                if response.status == 429:
+                    raise RateLimitError("deepseek", parse_retry_after(response.headers.get("Retry-After")))
                 if response.status != 200:
                     error_text = await response.text()
                     raise Exception(f"DeepSeek API returned status {response.status}: {error_text}")
@@ -404,13 +1063,21 @@ def get_ai_client() -> MultiProviderAIClient:
         _ai_client = MultiProviderAIClient()
     return _ai_client
 
+async def close_ai_client():
+    """Schließt den Connection-Pool der globalen AI-Client-Instanz"""
+    if _ai_client is not None:
+        await _ai_client.aclose()
+
 async def call_llm(
     prompt: str, 
     system_prompt: str = "", 
     temperature: float = 0.3,
     max_tokens: int = 2000,
     provider: Optional[str] = None,
-    agent_type: str = "analysis"
+    agent_type: str = "analysis",
+    cache: Optional[bool] = None,
+    agent_id: Optional[str] = None,
+    pod: Optional[str] = None
 ) -> str:
     """
     Vereinfachte LLM-Aufruf-Funktion mit automatischer Modellauswahl
@@ -424,10 +1091,13 @@ async def call_llm(
     
     return await client.chat_completion(
         messages, 
+        task_name=agent_type,
         temperature=temperature, 
         max_tokens=max_tokens, 
         provider=provider,
-        agent_type=agent_type
+        cache=cache,
+        agent_id=agent_id,
+        pod=pod
     )
 
 async def test_new_models():
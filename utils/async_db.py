@@ -0,0 +1,224 @@
+"""
+Asynchrone Fassade für die SQLite-Agentendatenbank
+Alle Agenten teilen sich einen Event-Loop - blockierende sqlite3-Aufrufe
+(Commits mit fsync, Lock-Wartezeiten) würden jeden anderen Agenten anhalten.
+Schreibzugriffe laufen daher seriell in einem eigenen Writer-Thread,
+Lesezugriffe in einem kleinen Reader-Pool; beide nutzen die gepoolten
+WAL-Verbindungen des ConnectionManagers.
+
+    db = get_async_db(self.db_path)
+    await db.execute("INSERT ...", params)          # commit im Writer-Thread
+    rows = await db.fetchall("SELECT ...", params)  # Reader-Pool
+    db.submit("INSERT ...", params)                 # fire-and-forget aus sync Code
+"""
+
+import os
+import atexit
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from utils.connection_manager import get_connection
+
+ASYNC_DB_READERS = int(os.getenv("ASYNC_DB_READERS", "4"))
+
+class ExecuteResult:
+    """Ergebnis eines Schreibzugriffs (wie die gleichnamigen Cursor-Attribute)"""
+
+    __slots__ = ("lastrowid", "rowcount")
+
+    def __init__(self, lastrowid: Optional[int], rowcount: int):
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+class AsyncDatabase:
+    """Writer-Thread + Reader-Pool über einer SQLite-Datei"""
+
+    def __init__(self, db_path: str, readers: int = ASYNC_DB_READERS):
+        self.db_path = db_path
+        self.readers = max(1, readers)
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._reader_pool: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"writes": 0, "reads": 0, "background_writes": 0, "errors": 0}
+        atexit.register(self.close)
+
+    # --- Schreibzugriffe (seriell im Writer-Thread) ---
+
+    async def execute(self, sql: str, params: Sequence = ()) -> ExecuteResult:
+        """Führt ein Statement aus und committet es"""
+        return await self._write(self._execute, sql, params)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Sequence]) -> ExecuteResult:
+        return await self._write(self._executemany, sql, list(seq_of_params))
+
+    async def executescript(self, script: str):
+        await self._write(self._executescript, script)
+
+    async def transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        Führt fn(conn) im Writer-Thread als eine Transaktion aus - für mehrere
+        zusammengehörige Statements. Commit bei Erfolg, sonst Rollback.
+        """
+        return await self._write(self._transaction, fn)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Führt eine beliebige blockierende Funktion im Writer-Thread aus (z.B. Queue-Claims)"""
+        return await self._write(partial(fn, *args, **kwargs))
+
+    def submit(self, sql: str, params: Sequence = ()) -> Future:
+        """
+        Reiht einen Schreibzugriff ein, ohne zu warten - für synchrone Aufrufer
+        (log_kpi, log_activity). Fehler werden geloggt.
+        """
+        return self._submit(self._execute, sql, params)
+
+    def submit_transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Wie transaction(), aber ohne zu warten - für synchrone Aufrufer (Usage-Ledger)"""
+        return self._submit(self._transaction, fn)
+
+    def flush(self, timeout: float = 30):
+        """Wartet, bis alle bisher eingereihten Schreibzugriffe ausgeführt sind"""
+        if self._writer is None or self._pid != os.getpid() or self._closed:
+            return
+        self._writer.submit(lambda: None).result(timeout)
+
+    # --- Lesezugriffe (Reader-Pool) ---
+
+    async def fetchone(self, sql: str, params: Sequence = (), row_factory=None) -> Optional[Any]:
+        return await self._read(self._fetch, sql, params, row_factory, 1)
+
+    async def fetchall(self, sql: str, params: Sequence = (), row_factory=None) -> List[Any]:
+        return await self._read(self._fetch, sql, params, row_factory, None)
+
+    async def fetchval(self, sql: str, params: Sequence = (), default: Any = None) -> Any:
+        """Erste Spalte der ersten Zeile"""
+        row = await self.fetchone(sql, params)
+        return row[0] if row is not None else default
+
+    async def read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Führt fn(conn) im Reader-Pool aus (mehrere Abfragen auf einer Verbindung)"""
+        return await self._read(self._with_connection, fn)
+
+    # --- Verwaltung ---
+
+    def close(self):
+        """Führt ausstehende Schreibzugriffe aus und beendet die Threads (Shutdown-Hook)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pid == os.getpid():
+            for executor in (self._writer, self._reader_pool):
+                if executor is not None:
+                    executor.shutdown(wait=True)
+        self._writer = self._reader_pool = None
+
+    def get_stats(self) -> Dict[str, int]:
+        pending = 0
+        if self._writer is not None and self._pid == os.getpid():
+            pending = self._writer._work_queue.qsize()
+        return {**self.stats, "pending_writes": pending}
+
+    async def _write(self, fn: Callable, *args) -> Any:
+        self.stats["writes"] += 1
+        return await self._dispatch(True, fn, *args)
+
+    async def _read(self, fn: Callable, *args) -> Any:
+        self.stats["reads"] += 1
+        return await self._dispatch(False, fn, *args)
+
+    async def _dispatch(self, writer: bool, fn: Callable, *args) -> Any:
+        if self._closed:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(writer), partial(fn, *args))
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+            raise
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        if self._closed:
+            # Nach dem Shutdown direkt schreiben statt Daten zu verlieren
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+        future = self._executor(writer=True).submit(fn, *args)
+        self.stats["background_writes"] += 1
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _executor(self, writer: bool) -> ThreadPoolExecutor:
+        # Nach fork() existieren die Threads des Elternprozesses nicht mehr
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+                    self._reader_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-reader")
+                    self._pid = os.getpid()
+        return self._writer if writer else self._reader_pool
+
+    def _log_failure(self, future: Future):
+        error = future.exception()
+        if error is not None:
+            self.stats["errors"] += 1
+            logging.error(f"Background write to {self.db_path} failed: {error}")
+
+    # --- Laufen in den Worker-Threads ---
+
+    def _execute(self, sql: str, params: Sequence) -> ExecuteResult:
+        with closing(get_connection(self.db_path)) as conn:
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return ExecuteResult(cursor.lastrowid, cursor.rowcount)
+
+    def _executemany(self, sql: str, seq_of_params: List[Sequence]) -> ExecuteResult:
+        with closing(get_connection(self.db_path)) as conn:
+            cursor = conn.executemany(sql, seq_of_params)
+            conn.commit()
+            return ExecuteResult(cursor.lastrowid, cursor.rowcount)
+
+    def _executescript(self, script: str):
+        with closing(get_connection(self.db_path)) as conn:
+            conn.executescript(script)
+            conn.commit()
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with closing(get_connection(self.db_path)) as conn:
+            result = fn(conn)
+            conn.commit()
+            return result
+
+    def _fetch(self, sql: str, params: Sequence, row_factory, limit: Optional[int]):
+        with closing(get_connection(self.db_path)) as conn:
+            if row_factory is not None:
+                conn.row_factory = row_factory
+            cursor = conn.execute(sql, params)
+            return cursor.fetchone() if limit == 1 else cursor.fetchall()
+
+    def _with_connection(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with closing(get_connection(self.db_path)) as conn:
+            return fn(conn)
+
+# Global instances (eine Fassade je Datenbankdatei)
+_databases: Dict[str, AsyncDatabase] = {}
+_databases_lock = threading.Lock()
+
+def get_async_db(db_path: str = None) -> AsyncDatabase:
+    """Get or create the async facade for a database file (Standard: DATABASE_PATH)"""
+    path = db_path or os.getenv("DATABASE_PATH", "database/agent_system.db")
+    key = path if path == ":memory:" else os.path.abspath(path)
+    db = _databases.get(key)
+    if db is None or db._closed:
+        with _databases_lock:
+            db = _databases.get(key)
+            if db is None or db._closed:
+                db = _databases[key] = AsyncDatabase(path)
+    return db
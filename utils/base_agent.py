@@ -6,27 +6,104 @@ Implements core functionality for all agent types in the system
 import asyncio
 import json
 import logging
-import sqlite3
 import time
-from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dotenv import load_dotenv
 import os
 import re
+from config.ai_task_config import get_kb_token_budget
+from utils.knowledge_base import get_knowledge_base_store
+from utils.message_notifier import get_message_notifier
+from utils.work_queue import SQLiteWorkQueue, make_worker_id
+from utils.prompt_budget import KnowledgeSection, PromptBudgetStats, select_sections
+from utils.prompt_template import CompiledPrompt, PromptSizeStats, PromptTemplate
+from utils.connection_manager import get_connection
+from utils.async_db import AsyncDatabase, get_async_db
+from utils.telemetry import get_telemetry_buffer
+from utils.agent_health import AGENT_HEARTBEAT_INTERVAL, record_heartbeat
 
 # Load environment variables
 load_dotenv()
 
+# Fallback-Polling der Nachrichten-Tabelle; neue Nachrichten wecken Agenten sofort
+AGENT_POLL_INTERVAL = float(os.getenv("AGENT_POLL_INTERVAL", "30"))
+AGENT_ERROR_BACKOFF = float(os.getenv("AGENT_ERROR_BACKOFF", "10"))
+AGENT_CLAIM_BATCH = int(os.getenv("AGENT_CLAIM_BATCH", "10"))
+
 # Import Multi-Provider AI Client
 try:
-    from utils.ai_client import ai_client
+    from utils.ai_client import get_ai_client
     MULTI_PROVIDER_AVAILABLE = True
 except ImportError:
     # Fallback für Gemini-Integration
     import google.generativeai as genai
     MULTI_PROVIDER_AVAILABLE = False
 
+COMPANY_CONTEXT = {
+    "company_name": "berneby development",
+    "team_size": "2-person SaaS company",
+    "location": "Dresden, Germany",
+    "rate_development": "50€/h",
+    "rate_ai_agents": "75€/h",
+    "rate_consulting": "100€/h",
+    "target_market": "DACH region (Germany, Austria, Switzerland)",
+    "mission": "1M€ revenue in 12 months through AI automation"
+}
+
+# System-Prompt aller Agenten; $domain_knowledge wird pro Anfrage eingesetzt
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate("""# AGENT IDENTITY & ROLE
+You are $agent_name (ID: $agent_id) - a specialized AI agent for $company_name.
+
+## COMPANY CONTEXT
+- Company: $company_name ($team_size, $location)
+- Services: Development ($rate_development), AI Agents ($rate_ai_agents), Consulting ($rate_consulting)
+- Target Market: $target_market
+- Mission: $mission
+
+## YOUR SPECIALIZED ROLE
+Pod: $pod
+Core Function: $core_function
+
+## OPERATIONAL DIRECTIVES
+1. **AUTONOMOUS EXECUTION**: Work independently but escalate critical decisions
+2. **CUSTOMER-FIRST**: Every action must create customer value
+3. **QUALITY ASSURANCE**: All outputs must meet professional standards
+4. **COMPLIANCE**: Follow DSGVO/AI Act requirements automatically
+5. **EFFICIENCY**: Optimize for speed without sacrificing quality
+
+## OUTPUT REQUIREMENTS
+- Always provide structured JSON responses when requested
+- Include reasoning steps for complex decisions (Chain of Thought)
+- Be specific and actionable in recommendations
+- Use professional German business language
+- Include confidence scores for uncertain decisions
+
+## FEW-SHOT EXAMPLES
+Example Input: "Analyze this lead: TechCorp GmbH, 50 employees, budget 25k€"
+Example Output: {
+    "analysis": "High-value enterprise lead",
+    "score": 85,
+    "reasoning": "Large team size indicates complexity needs, substantial budget shows serious intent",
+    "next_action": "Schedule needs analysis call within 24h",
+    "confidence": 0.9
+}
+
+## ESCALATION TRIGGERS
+- Budget decisions >10,000€
+- Legal/compliance uncertainties  
+- Customer complaints or dissatisfaction
+- Technical failures or system errors
+
+$domain_knowledge
+
+## CURRENT CONTEXT
+Pod: $pod
+Agent Type: $agent_type
+Optimization Level: $optimization_level
+
+Remember: You are part of an autonomous AI agency. Every decision should move us closer to the 1M€ revenue goal while maintaining exceptional quality and compliance.""")
+
 class BaseAgent:
     """Base class for all AI agents in the system"""
     
@@ -37,10 +114,15 @@ class BaseAgent:
         self.instructions = instructions
         self.knowledge_base_path = knowledge_base_path or f"knowledge_base/{pod}"
         self.db_path = os.getenv("DATABASE_PATH", "database/agent_system.db")
+        self.worker_id = make_worker_id(agent_id)
+        self.poll_interval = AGENT_POLL_INTERVAL
+        self.heartbeat_interval = AGENT_HEARTBEAT_INTERVAL
+        self._last_heartbeat = 0.0
+        self._message_queue: Optional[SQLiteWorkQueue] = None
         
         # Setup AI Client (Multi-Provider oder Fallback)
         if MULTI_PROVIDER_AVAILABLE:
-            self.ai_client = ai_client
+            self.ai_client = get_ai_client()
             self.model = "multi-provider"
         else:
             genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -49,6 +131,14 @@ class BaseAgent:
         
         self.running = False
         
+        # Token-Ersparnis durch das Knowledge-Base-Budget
+        self.prompt_budget_stats = PromptBudgetStats()
+        
+        # Vorkompilierter System-Prompt (statischer Block) und Prompt-Größe
+        self._compiled_prompt: Optional[CompiledPrompt] = None
+        self._compiled_prompt_key = None
+        self.prompt_size_stats = PromptSizeStats()
+        
         # Setup logging
         logging.basicConfig(
             level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")),
@@ -61,185 +151,159 @@ class BaseAgent:
         self.logger = logging.getLogger(f"{self.agent_id}-{self.name}")
         
     def load_knowledge_base(self) -> str:
-        """Load knowledge base content for the agent"""
-        kb_content = ""
-        kb_path = Path(self.knowledge_base_path)
-        
-        if kb_path.exists():
-            for file_path in kb_path.glob("*.md"):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        kb_content += f"\n\n## {file_path.name}\n{f.read()}"
-                except Exception as e:
-                    self.logger.warning(f"Could not load {file_path}: {e}")
+        """Load knowledge base content for the agent (served from the process-wide KB store)"""
+        return get_knowledge_base_store().get(self.knowledge_base_path).full_text
+    
+    def load_knowledge_sections(self) -> Tuple[KnowledgeSection, ...]:
+        """Load the knowledge base split into sections for budgeted prompts"""
+        return get_knowledge_base_store().get(self.knowledge_base_path).sections
+    
+    def get_knowledge_context(self, query: str = "", task_name: str = None) -> str:
+        """
+        Selects the knowledge base sections most relevant to `query` within the
+        token budget of the task's complexity and records the saved tokens
+        """
+        if not self.knowledge_base_path:
+            return ""
         
-        return kb_content
+        budget = get_kb_token_budget(task_name or self._determine_agent_type())
+        result = select_sections(self.load_knowledge_sections(), query, budget)
+        self.prompt_budget_stats.add(result)
+        if result.saved_tokens:
+            self.logger.debug(
+                f"KB budget {budget}: {result.kept_sections} sections kept, "
+                f"{result.dropped_sections} dropped, {result.saved_tokens} tokens saved"
+            )
+        return result.text
+    
+    def get_prompt_budget_stats(self) -> Dict[str, int]:
+        """Returns the cumulative knowledge base tokens used and saved"""
+        return self.prompt_budget_stats.as_dict()
     
-    def get_system_prompt(self) -> str:
+    def get_system_prompt(self, query: str = "", task_name: str = None) -> str:
         """Get optimized system prompt following Prompt Engineering Best Practices"""
+        compiled = self._get_compiled_prompt()
         
-        # Variables für dynamische Prompts
-        company_context = {
-            "name": "berneby development",
-            "team_size": "2-person SaaS company",
-            "location": "Dresden, Germany",
-            "services": {
-                "development": "50€/h",
-                "ai_agents": "75€/h", 
-                "consulting": "100€/h"
-            },
-            "target_market": "DACH region (Germany, Austria, Switzerland)",
-            "mission": "1M€ revenue in 12 months through AI automation"
-        }
+        # Nur die für die Anfrage relevanten Knowledge-Base-Abschnitte (Token-Budget)
+        knowledge = self.get_knowledge_context(query, task_name)
+        domain_knowledge = f"## DOMAIN KNOWLEDGE\n{knowledge}" if knowledge else ""
         
-        base_prompt = f"""# AGENT IDENTITY & ROLE
-You are {self.name} (ID: {self.agent_id}) - a specialized AI agent for {company_context['name']}.
-
-## COMPANY CONTEXT
-- Company: {company_context['name']} ({company_context['team_size']}, {company_context['location']})
-- Services: Development ({company_context['services']['development']}), AI Agents ({company_context['services']['ai_agents']}), Consulting ({company_context['services']['consulting']})
-- Target Market: {company_context['target_market']}
-- Mission: {company_context['mission']}
-
-## YOUR SPECIALIZED ROLE
-Pod: {self.pod}
-Core Function: {self.instructions.split('.')[0] if self.instructions else 'Specialized agent operations'}
-
-## OPERATIONAL DIRECTIVES
-1. **AUTONOMOUS EXECUTION**: Work independently but escalate critical decisions
-2. **CUSTOMER-FIRST**: Every action must create customer value
-3. **QUALITY ASSURANCE**: All outputs must meet professional standards
-4. **COMPLIANCE**: Follow DSGVO/AI Act requirements automatically
-5. **EFFICIENCY**: Optimize for speed without sacrificing quality
-
-## OUTPUT REQUIREMENTS
-- Always provide structured JSON responses when requested
-- Include reasoning steps for complex decisions (Chain of Thought)
-- Be specific and actionable in recommendations
-- Use professional German business language
-- Include confidence scores for uncertain decisions
-
-## FEW-SHOT EXAMPLES
-Example Input: "Analyze this lead: TechCorp GmbH, 50 employees, budget 25k€"
-Example Output: {{
-    "analysis": "High-value enterprise lead",
-    "score": 85,
-    "reasoning": "Large team size indicates complexity needs, substantial budget shows serious intent",
-    "next_action": "Schedule needs analysis call within 24h",
-    "confidence": 0.9
-}}
-
-## ESCALATION TRIGGERS
-- Budget decisions >10,000€
-- Legal/compliance uncertainties  
-- Customer complaints or dissatisfaction
-- Technical failures or system errors
-
-{f"## DOMAIN KNOWLEDGE\\n{self.load_knowledge_base()}" if hasattr(self, 'knowledge_base_path') and self.knowledge_base_path else ""}
-
-## CURRENT CONTEXT
-Pod: {self.pod}
-Agent Type: {self._determine_agent_type()}
-Optimization Level: {self.get_cost_optimization_info()['recommended_model']}
-
-Remember: You are part of an autonomous AI agency. Every decision should move us closer to the 1M€ revenue goal while maintaining exceptional quality and compliance."""
-
-        return base_prompt
+        prompt = compiled.render(domain_knowledge=domain_knowledge)
+        self.prompt_size_stats.add(compiled, prompt)
+        return prompt
+    
+    def _get_compiled_prompt(self) -> CompiledPrompt:
+        """Renders the static prompt block once; recompiles when identity or instructions change"""
+        cache_key = (self.name, self.agent_id, self.pod, self.instructions)
+        if self._compiled_prompt is None or self._compiled_prompt_key != cache_key:
+            self._compiled_prompt = SYSTEM_PROMPT_TEMPLATE.compile(
+                agent_name=self.name,
+                agent_id=self.agent_id,
+                pod=self.pod,
+                core_function=self.instructions.split('.')[0] if self.instructions else 'Specialized agent operations',
+                agent_type=self._determine_agent_type(),
+                optimization_level=self.get_cost_optimization_info()['recommended_model'],
+                **COMPANY_CONTEXT
+            )
+            self._compiled_prompt_key = cache_key
+        return self._compiled_prompt
+    
+    def get_prompt_size_stats(self) -> Dict[str, int]:
+        """Returns the static and rendered system prompt size in tokens"""
+        return self.prompt_size_stats.as_dict()
     
     async def send_message(self, receiver_id: str, message_type: str, content: Dict, metadata: Dict = None):
         """Send a message to another agent"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            message_data = {
-                "sender_id": self.agent_id,
-                "receiver_id": receiver_id,
-                "message_type": message_type,
-                "content": json.dumps(content),
-                "metadata": json.dumps(metadata or {}),
-                "status": "pending"
-            }
-            
-            cursor.execute("""
+            await self.db.execute("""
                 INSERT INTO messages (sender_id, receiver_id, message_type, content, metadata, status)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (
-                message_data["sender_id"],
-                message_data["receiver_id"], 
-                message_data["message_type"],
-                message_data["content"],
-                message_data["metadata"],
-                message_data["status"]
+                self.agent_id,
+                receiver_id,
+                message_type,
+                json.dumps(content),
+                json.dumps(metadata or {}),
+                "pending"
             ))
             
-            conn.commit()
-            conn.close()
+            # Empfänger sofort wecken (SQLite bleibt das dauerhafte Log)
+            get_message_notifier().notify(receiver_id)
             
             self.logger.info(f"Sent {message_type} message to {receiver_id}")
             
         except Exception as e:
             self.logger.error(f"Failed to send message: {e}")
     
-    async def get_pending_messages(self) -> List[Dict]:
-        """Get pending messages for this agent"""
+    @property
+    def db(self) -> AsyncDatabase:
+        """Async facade over this agent's database (writes in a background thread)"""
+        return get_async_db(self.db_path)
+    
+    @property
+    def message_queue(self) -> SQLiteWorkQueue:
+        """Lease-based queue over the messages table of this agent's database"""
+        if self._message_queue is None or self._message_queue.db_path != self.db_path:
+            self._message_queue = SQLiteWorkQueue(self.db_path)
+        return self._message_queue
+    
+    async def get_pending_messages(self, limit: int = AGENT_CLAIM_BATCH) -> List[Dict]:
+        """Claim pending messages for this agent (leased to this worker until acked or expired)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, sender_id, message_type, content, metadata, created_at
-                FROM messages 
-                WHERE receiver_id = ? AND status = 'pending'
-                ORDER BY created_at ASC
-            """, (self.agent_id,))
-            
             messages = []
-            for row in cursor.fetchall():
-                message = {
-                    "id": row[0],
-                    "sender_id": row[1],
-                    "message_type": row[2],
-                    "content": json.loads(row[3]),
-                    "metadata": json.loads(row[4]),
-                    "created_at": row[5]
-                }
-                messages.append(message)
-            
-            conn.close()
+            rows = await self.db.run(self.message_queue.claim, self.agent_id, self.worker_id, limit)
+            for row in rows:
+                messages.append({
+                    "id": row["id"],
+                    "sender_id": row["sender_id"],
+                    "message_type": row["message_type"],
+                    "content": json.loads(row["content"]),
+                    "metadata": json.loads(row["metadata"] or "{}"),
+                    "created_at": row["created_at"],
+                    "attempts": row["attempts"]
+                })
             return messages
             
         except Exception as e:
             self.logger.error(f"Failed to get messages: {e}")
             return []
     
+    async def renew_leases(self, messages: List[Dict]) -> set:
+        """Extend the leases of claimed messages; returns the IDs still owned by this worker"""
+        try:
+            return await self.db.run(
+                self.message_queue.extend_leases, [message["id"] for message in messages], self.worker_id
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to extend message leases: {e}")
+            return set()
+    
     async def mark_message_processed(self, message_id: int):
-        """Mark a message as processed"""
+        """Mark a message as processed (acknowledges the lease)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE messages 
-                SET status = 'processed', processed_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (message_id,))
-            
-            conn.commit()
-            conn.close()
-            
+            if not await self.db.run(self.message_queue.ack, message_id, self.worker_id):
+                self.logger.warning(f"Lease for message {message_id} expired before ack")
         except Exception as e:
             self.logger.error(f"Failed to mark message processed: {e}")
     
-    async def call_llm(self, prompt: str, context: str = "", provider: str = None) -> str:
+    async def release_message(self, message_id: int, error: str = ""):
+        """Return a failed message to the queue for retry (or dead-letter it after max attempts)"""
+        try:
+            status = await self.db.run(self.message_queue.nack, message_id, self.worker_id, error)
+            if status == "dead":
+                self.logger.error(f"Message {message_id} moved to dead letters: {error}")
+        except Exception as e:
+            self.logger.error(f"Failed to release message {message_id}: {e}")
+    
+    async def call_llm(self, prompt: str, context: str = "", provider: str = None, task_name: str = None) -> str:
         """
         Ruft LLM mit optimaler Modellauswahl auf
         """
-        # Bestimme Agent-Typ basierend auf Agent-ID oder Pod
-        agent_type = self._determine_agent_type()
+        # Bestimme Agent-Typ basierend auf Agent-ID oder Pod (oder expliziter Task)
+        agent_type = task_name or self._determine_agent_type()
         
         # Erstelle System-Prompt mit Kontext
-        system_prompt = self.get_system_prompt()
+        system_prompt = self.get_system_prompt(query=prompt, task_name=agent_type)
         if context:
             system_prompt += f"\n\nZusätzlicher Kontext:\n{context}"
         
@@ -251,7 +315,9 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
                 provider=provider,
                 agent_type=agent_type,
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                agent_id=self.agent_id,
+                pod=self.pod
             )
             
             # Logge erfolgreichen API-Call
@@ -271,7 +337,9 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
                         provider=provider,
                         agent_type="inbound",  # Nano-Modell
                         temperature=0.3,
-                        max_tokens=1000
+                        max_tokens=1000,
+                        agent_id=self.agent_id,
+                        pod=self.pod
                     )
                     print(f"✅ Fallback zu Nano-Modell erfolgreich")
                     return response
@@ -321,25 +389,32 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
         
         return pod_mapping.get(self.pod, "analysis")
 
-    async def process_with_llm(self, prompt: str, temperature: float = 0.3, max_tokens: int = 1500, provider: str = None, agent_type: str = None) -> str:
-        """Process a prompt with the LLM"""
+    async def process_with_llm(self, prompt: str, temperature: float = 0.3, max_tokens: int = 1500, provider: str = None, agent_type: str = None, cache: Optional[bool] = None, batch: bool = False) -> str:
+        """Process a prompt with the LLM (batch=True routes through the client's micro-batcher)"""
         try:
-            # Get system prompt
-            system_prompt = self.get_system_prompt()
-            
             # Determine agent type for metrics
             if not agent_type:
                 agent_type = self._determine_agent_type()
             
+            # Get system prompt (knowledge base trimmed to the task's budget)
+            system_prompt = self.get_system_prompt(query=prompt, task_name=agent_type)
+            
             # Try multi-provider client first
             if MULTI_PROVIDER_AVAILABLE:
                 try:
-                    response = await self.ai_client.chat_completion(
-                        prompt=prompt,
-                        system_prompt=system_prompt,
+                    complete = self.ai_client.submit_batched if batch else self.ai_client.chat_completion
+                    response = await complete(
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        task_name=agent_type,
                         temperature=temperature,
                         max_tokens=max_tokens,
-                        provider=provider
+                        provider=provider,
+                        cache=cache,
+                        agent_id=self.agent_id,
+                        pod=self.pod
                     )
                     self.log_kpi(f"{self.agent_id}_{agent_type}_calls", 1)
                     return response
@@ -387,6 +462,54 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
             self.logger.error(f"LLM processing error: {str(e)}")
             return error_msg
 
+    async def stream_with_llm(self, prompt: str, temperature: float = 0.3, max_tokens: int = 1500, provider: str = None, agent_type: str = None):
+        """Streamt die LLM-Antwort chunkweise (async generator)"""
+        if not agent_type:
+            agent_type = self._determine_agent_type()
+
+        if not MULTI_PROVIDER_AVAILABLE:
+            # Ohne Multi-Provider-Client: komplette Antwort als einzelner Chunk
+            yield await self.process_with_llm(prompt, temperature, max_tokens, provider, agent_type)
+            return
+
+        async for chunk in self.ai_client.stream_completion(
+            messages=[
+                {"role": "system", "content": self.get_system_prompt(query=prompt, task_name=agent_type)},
+                {"role": "user", "content": prompt}
+            ],
+            task_name=agent_type,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            provider=provider,
+            agent_id=self.agent_id,
+            pod=self.pod
+        ):
+            yield chunk
+        self.log_kpi(f"{self.agent_id}_{agent_type}_calls", 1)
+
+    async def stream_llm_to_file(self, prompt: str, output_path: str, header: str = "", **kwargs) -> str:
+        """
+        Streamt eine lange Antwort direkt in eine Datei, damit Teilergebnisse
+        sofort auf der Platte liegen. Gibt den vollständigen Text zurück.
+        """
+        path = Path(output_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        parts = []
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                if header:
+                    f.write(header)
+                async for chunk in self.stream_with_llm(prompt, **kwargs):
+                    parts.append(chunk)
+                    f.write(chunk)
+                    f.flush()
+            return "".join(parts)
+        except Exception as e:
+            self.logger.error(f"LLM streaming error ({path}): {str(e)}")
+            if parts:
+                return "".join(parts)
+            return f"Error processing request: {str(e)}"
+
     def get_cost_optimization_info(self) -> Dict:
         """Gibt Kostenoptimierungs-Informationen zurück"""
         agent_type = self._determine_agent_type()
@@ -441,18 +564,9 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
         return savings_info.get(agent_type, "Optimiert für Aufgabentyp")
     
     def log_kpi(self, metric_name: str, value: float, target: float = None, period: str = "daily"):
-        """Log KPI metrics to database"""
+        """Log KPI metrics (summed in memory, written in batches by the telemetry buffer)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO kpi_metrics (agent_id, metric_name, value, target, period)
-                VALUES (?, ?, ?, ?, ?)
-            """, (self.agent_id, metric_name, value, target, period))
-            
-            conn.commit()
-            conn.close()
+            get_telemetry_buffer().record_kpi(self.db_path, self.agent_id, metric_name, value, target, period)
             
             self.logger.info(f"Logged KPI {metric_name}: {value} (target: {target})")
             
@@ -460,18 +574,9 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
             self.logger.error(f"Failed to log KPI: {e}")
 
     def log_activity(self, message: str):
-        """Log agent activity with timestamp"""
+        """Log agent activity with timestamp (written in batches by the telemetry buffer)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO agent_activities (agent_id, activity, timestamp)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (self.agent_id, message))
-            
-            conn.commit()
-            conn.close()
+            get_telemetry_buffer().record_activity(self.db_path, self.agent_id, message)
             
             self.logger.info(message)
             
@@ -481,7 +586,7 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
     def update_system_state(self, key: str, value: str):
         """Update system state in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -498,7 +603,7 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
     def get_system_state(self, key: str) -> str:
         """Get system state value"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT value FROM system_state WHERE key = ?", (key,))
@@ -523,18 +628,42 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
         
         # Register agent as active
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
+            await self.db.execute("""
                 UPDATE agents 
                 SET status = 'active', last_action = CURRENT_TIMESTAMP
                 WHERE id = ?
             """, (self.agent_id,))
-            conn.commit()
-            conn.close()
         except Exception as e:
             self.logger.error(f"Failed to register agent: {e}")
+        await self.heartbeat(force=True)
         
+        notifier = get_message_notifier()
+        inbox = notifier.subscribe(self.agent_id)
+        try:
+            await self._process_inbox(notifier, inbox)
+        finally:
+            notifier.unsubscribe(self.agent_id, inbox)
+            # Sauber beendet - kein Alert für absichtlich gestoppte Agenten
+            await self.heartbeat("stopped", force=True)
+    
+    async def heartbeat(self, status: str = "running", force: bool = False):
+        """Schreibt höchstens alle heartbeat_interval Sekunden einen Heartbeat (siehe utils/agent_health.py)"""
+        now = time.time()
+        if not force and now - self._last_heartbeat < self.heartbeat_interval:
+            return
+        self._last_heartbeat = now
+        
+        def write(conn):
+            record_heartbeat(conn, self.agent_id, self.name, self.worker_id, status, now)
+            conn.execute("UPDATE agents SET last_action = CURRENT_TIMESTAMP WHERE id = ?", (self.agent_id,))
+        
+        try:
+            await self.db.transaction(write)
+        except Exception as e:
+            self.logger.error(f"Failed to write heartbeat: {e}")
+    
+    async def _process_inbox(self, notifier, inbox: asyncio.Event):
+        """Processes messages whenever the inbox is notified (or the fallback poll interval elapses)"""
         while self.running:
             try:
                 # Check kill switch
@@ -542,39 +671,46 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
                     self.logger.warning("Kill switch activated - stopping agent")
                     break
                 
+                # Vor dem Lesen zurücksetzen: Nachrichten während der Verarbeitung wecken erneut
+                inbox.clear()
+                
                 # Process pending messages
                 messages = await self.get_pending_messages()
-                for message in messages:
+                released = False
+                for index, message in enumerate(messages):
+                    # Leases aller noch wartenden Nachrichten des Batches verlängern - sonst
+                    # laufen sie während langer LLM-Aufrufe ab und ein anderer Worker verarbeitet sie doppelt
+                    if index and message["id"] not in await self.renew_leases(messages[index:]):
+                        self.logger.warning(f"Lease for message {message['id']} lost - skipping")
+                        continue
                     try:
                         success = await self.process_message(message)
                         if success:
                             await self.mark_message_processed(message["id"])
+                        else:
+                            await self.release_message(message["id"], "process_message returned False")
+                            released = True
                     except Exception as e:
                         self.logger.error(f"Error processing message {message['id']}: {e}")
+                        await self.release_message(message["id"], str(e))
+                        released = True
                 
                 # Run agent-specific tasks
                 await self.run_periodic_tasks()
                 
-                # Update last action timestamp
-                try:
-                    conn = sqlite3.connect(self.db_path)
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        UPDATE agents 
-                        SET last_action = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    """, (self.agent_id,))
-                    conn.commit()
-                    conn.close()
-                except Exception as e:
-                    self.logger.error(f"Failed to update timestamp: {e}")
+                # Heartbeat (gedrosselt) statt eines Schreibzugriffs je Durchlauf
+                await self.heartbeat()
                 
-                # Sleep before next iteration
-                await asyncio.sleep(5)  # Check every 5 seconds
+                # Wait for the next message (polling only as recovery fallback)
+                # Freigegebene Nachrichten werden nach retry_delay wieder sichtbar
+                timeout = self.poll_interval
+                if released:
+                    timeout = min(timeout, self.message_queue.retry_delay)
+                await notifier.wait(inbox, timeout)
                 
             except Exception as e:
                 self.logger.error(f"Error in agent loop: {e}")
-                await asyncio.sleep(10)  # Longer sleep on error
+                await asyncio.sleep(AGENT_ERROR_BACKOFF)  # Longer sleep on error
     
     async def run_periodic_tasks(self):
         """Run periodic tasks specific to this agent - to be overridden"""
@@ -583,6 +719,7 @@ Remember: You are part of an autonomous AI agency. Every decision should move us
     def stop(self):
         """Stop the agent loop"""
         self.running = False
+        get_message_notifier().notify(self.agent_id)  # Wartende Schleife sofort beenden
         self.logger.info(f"Agent {self.name} stopping")
     
     async def run_loop(self):
@@ -623,7 +760,7 @@ Respond with JSON:
 """
         
         try:
-            relevance_response = await self.call_llm(relevance_prompt)
+            relevance_response = await self.call_llm(relevance_prompt, task_name="validate_input")
             relevance_data = json.loads(relevance_response)
             
             if not relevance_data.get("is_relevant", True):
@@ -11,9 +11,9 @@ import logging
 from typing import Dict, Any, List, Optional, Set
 from datetime import datetime, timedelta
 from enum import Enum
-import sqlite3
 from contextlib import closing
 import hashlib
+from utils.connection_manager import get_connection
 
 class ComplianceLevel(Enum):
     LOW_RISK = "low_risk"
@@ -277,7 +277,7 @@ class ComplianceAgent:
         
         # Speichere in Datenbank
         try:
-            with closing(sqlite3.connect(self.db_path)) as conn:
+            with closing(get_connection(self.db_path)) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -301,7 +301,7 @@ class ComplianceAgent:
         """Protokolliert Compliance-Prüfungen"""
         
         try:
-            with closing(sqlite3.connect(self.db_path)) as conn:
+            with closing(get_connection(self.db_path)) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
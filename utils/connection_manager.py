@@ -0,0 +1,192 @@
+"""
+Zentrale SQLite-Verbindungsverwaltung
+Gepoolte Verbindungen je Thread (und damit je Event-Loop) mit WAL-Journal,
+synchronous=NORMAL, busy_timeout, mmap und Cache-Pragmas, die einmal pro
+physischer Verbindung gesetzt werden.
+
+Aufrufer verwenden weiterhin das gewohnte Muster
+    conn = get_connection(self.db_path) ... conn.close()
+close() gibt die Verbindung an den Pool zurück (offene Transaktionen werden
+wie beim echten Schließen verworfen).
+"""
+
+import os
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Maximale Anzahl ruhender Verbindungen je Thread und Datenbank
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3-Verbindung, deren close() sie an den Pool zurückgibt"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._manager: Optional["ConnectionManager"] = None
+        self._pool_key: Optional[str] = None
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._checked_out = False
+
+    def close(self):
+        if self._manager is None:
+            super().close()
+        else:
+            self._manager.release(self)
+
+    def close_physical(self):
+        self._manager = None
+        super().close()
+
+class ConnectionManager:
+    """Verwaltet Thread-lokale Pools von SQLite-Verbindungen je Datenbankdatei"""
+
+    def __init__(
+        self,
+        pool_size: int = SQLITE_POOL_SIZE,
+        busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+        journal_mode: str = SQLITE_JOURNAL_MODE,
+        synchronous: str = SQLITE_SYNCHRONOUS,
+        cache_size_kb: int = SQLITE_CACHE_SIZE_KB,
+        mmap_size: int = SQLITE_MMAP_SIZE
+    ):
+        self.pool_size = pool_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {"opened": 0, "reused": 0, "closed": 0}
+
+    def connect(self, db_path: str, isolation_level: Optional[str] = "") -> sqlite3.Connection:
+        """
+        Liefert eine exklusiv ausgeliehene Verbindung des aktuellen Threads.
+        isolation_level=None schaltet wie bei sqlite3.connect in den Autocommit-Modus.
+        """
+        if db_path == ":memory:" or db_path.startswith("file:"):
+            # Jede In-Memory-Verbindung ist eine eigene Datenbank - nicht poolen
+            conn = sqlite3.connect(db_path, isolation_level=isolation_level, uri=db_path.startswith("file:"))
+            self._apply_pragmas(conn)
+            return conn
+
+        key = os.path.abspath(db_path)
+        conn = self._checkout(key)
+        if conn is None:
+            conn = self._open(key)
+        conn._checked_out = True
+        conn.isolation_level = isolation_level
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Nimmt eine Verbindung zurück; offene Transaktionen werden zurückgerollt"""
+        if not conn._checked_out:
+            return  # doppeltes close()
+        conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+            conn.isolation_level = ""
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        idle = self._idle(conn._pool_key)
+        if len(idle) < self.pool_size:
+            idle.append(conn)
+        else:
+            self._discard(conn)
+
+    def close_all(self):
+        """Schließt alle ruhenden Verbindungen des aktuellen Threads"""
+        for idle in self._pools().values():
+            while idle:
+                self._discard(idle.pop())
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "idle": sum(len(idle) for idle in self._pools().values())}
+
+    def _pools(self) -> Dict[str, List[PooledConnection]]:
+        # Nach fork() gehören geerbte Verbindungen dem Elternprozess - nicht weiterverwenden
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.pools = {}
+        return self._local.pools
+
+    def _idle(self, key: str) -> List[PooledConnection]:
+        return self._pools().setdefault(key, [])
+
+    def _checkout(self, key: str) -> Optional[PooledConnection]:
+        idle = self._idle(key)
+        file_id = self._file_id(key)
+        while idle:
+            conn = idle.pop()
+            if file_id is not None and conn._file_id == file_id:
+                self._count("reused")
+                return conn
+            # Datei wurde gelöscht oder ersetzt
+            self._discard(conn)
+        return None
+
+    def _open(self, key: str) -> PooledConnection:
+        conn = sqlite3.connect(key, factory=PooledConnection, timeout=self.busy_timeout_ms / 1000)
+        self._apply_pragmas(conn)
+        conn._manager = self
+        conn._pool_key = key
+        conn._file_id = self._file_id(key)
+        self._count("opened")
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        try:
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.execute(f"PRAGMA cache_size = {-abs(int(self.cache_size_kb))}")
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+        except sqlite3.OperationalError as e:
+            # z.B. Journal-Wechsel während ein anderer Prozess schreibt - beim nächsten Öffnen erneut
+            logging.debug(f"Could not apply SQLite pragmas: {e}")
+
+    def _discard(self, conn: PooledConnection):
+        try:
+            conn.close_physical()
+        except sqlite3.Error:
+            pass
+        self._count("closed")
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def _file_id(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+# Global instance
+_manager = None
+
+def get_connection_manager() -> ConnectionManager:
+    """Get or create the process-wide connection manager"""
+    global _manager
+    if _manager is None:
+        _manager = ConnectionManager()
+    return _manager
+
+def get_connection(db_path: str = None, isolation_level: Optional[str] = "") -> sqlite3.Connection:
+    """Gepoolte Verbindung mit WAL-Pragmas (Standard: DATABASE_PATH)"""
+    path = db_path or os.getenv("DATABASE_PATH", "database/agent_system.db")
+    return get_connection_manager().connect(path, isolation_level)
@@ -0,0 +1,173 @@
+"""
+Group Commit für SQLite-Schreibzugriffe
+Ein Hintergrund-Thread sammelt Inserts/Updates mehrerer Aufrufer und schreibt
+sie alle N Millisekunden oder M Zeilen in einer gemeinsamen Transaktion;
+optional synchron ("durable") für kritische Nachrichten
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from itertools import groupby
+from typing import Callable, Dict, Optional, Sequence
+
+GROUP_COMMIT_INTERVAL_MS = float(os.getenv("GROUP_COMMIT_INTERVAL_MS", "20"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "200"))
+
+class _Write:
+    """Ein ausstehender Schreibzugriff (sql=None markiert eine Flush-Barriere)"""
+
+    __slots__ = ("sql", "params", "done", "error")
+
+    def __init__(self, sql: Optional[str], params: Sequence = (), wait: bool = False):
+        self.sql = sql
+        self.params = params
+        self.done = threading.Event() if wait else None
+        self.error: Optional[Exception] = None
+
+_STOP = object()
+
+class GroupCommitWriter:
+    """Bündelt Schreibzugriffe aus beliebigen Threads/Event-Loops in wenige Commits"""
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        interval_ms: float = GROUP_COMMIT_INTERVAL_MS,
+        max_rows: int = GROUP_COMMIT_MAX_ROWS
+    ):
+        self.connect = connect
+        self.max_delay = interval_ms / 1000
+        self.max_rows = max_rows
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"writes": 0, "commits": 0, "largest_batch": 0, "durable_writes": 0, "errors": 0}
+        atexit.register(self.close)
+
+    def submit(self, sql: str, params: Sequence = (), durable: bool = False, timeout: float = 30):
+        """
+        Reiht einen Schreibzugriff ein. Mit durable=True wird bis zum Commit
+        gewartet (der aktuelle Batch wird sofort geschrieben) und Fehler werden
+        an den Aufrufer weitergereicht.
+        """
+        if self._closed:
+            # Nach dem Shutdown direkt schreiben statt Daten zu verlieren
+            self._commit([_Write(sql, params)])
+            return
+        write = _Write(sql, params, wait=durable)
+        self._ensure_thread()
+        self._queue.put(write)
+        if durable:
+            self.stats["durable_writes"] += 1
+            if not write.done.wait(timeout):
+                raise TimeoutError(f"Durable write not committed within {timeout}s")
+            if write.error is not None:
+                raise write.error
+
+    def flush(self, timeout: float = 30):
+        """Wartet, bis alle bisher eingereihten Schreibzugriffe committet sind"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        barrier = _Write(None, wait=True)
+        self._queue.put(barrier)
+        barrier.done.wait(timeout)
+
+    def close(self):
+        """Schreibt ausstehende Zugriffe und beendet den Hintergrund-Thread (Shutdown-Hook)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def get_stats(self) -> Dict[str, float]:
+        commits = self.stats["commits"]
+        return {
+            **self.stats,
+            "pending": self._queue.qsize(),
+            "avg_batch": round(self.stats["writes"] / commits, 1) if commits else 0.0
+        }
+
+    def _ensure_thread(self):
+        # Nach fork() existiert der Thread des Elternprozesses nicht mehr
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            # Wartende Aufrufer (durable/flush) beenden das Sammeln sofort
+            while item.done is None and len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if stopping:
+                # Restliche Einträge vor dem Beenden mitschreiben
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        writes = [write for write in batch if write.sql is not None]
+        if writes:
+            try:
+                with closing(self.connect()) as conn:
+                    # Aufeinanderfolgende gleiche Statements per executemany, Reihenfolge bleibt erhalten
+                    for sql, group in groupby(writes, key=lambda write: write.sql):
+                        conn.executemany(sql, [write.params for write in group])
+                    conn.commit()
+                self.stats["writes"] += len(writes)
+                self.stats["commits"] += 1
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(writes))
+            except sqlite3.Error as e:
+                logging.warning(f"Group commit of {len(writes)} writes failed ({e}) - retrying individually")
+                self._commit_individually(writes)
+        for write in batch:
+            if write.done is not None:
+                write.done.set()
+
+    def _commit_individually(self, writes):
+        for write in writes:
+            try:
+                with closing(self.connect()) as conn:
+                    conn.execute(write.sql, write.params)
+                    conn.commit()
+                self.stats["writes"] += 1
+                self.stats["commits"] += 1
+            except sqlite3.Error as e:
+                write.error = e
+                self.stats["errors"] += 1
+                logging.error(f"Write failed: {e}")
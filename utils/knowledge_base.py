@@ -0,0 +1,125 @@
+"""
+Knowledge Base Store für berneby development
+Prozessweiter Cache der Knowledge-Base-Dateien: wird einmal geladen, über
+Datei-mtimes invalidiert und liefert unveränderliche, vorgerenderte Prompt-Fragmente
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.prompt_budget import KnowledgeSection, split_sections
+
+# Mindestabstand zwischen zwei mtime-Prüfungen eines Verzeichnisses (Sekunden)
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "2"))
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+@dataclass(frozen=True)
+class KnowledgeBaseSnapshot:
+    """Unveränderlicher Stand einer Knowledge Base (ein Verzeichnis)"""
+    path: str
+    signature: Signature
+    full_text: str
+    sections: Tuple[KnowledgeSection, ...]
+    loaded_at: float
+
+class KnowledgeBaseStore:
+    """Lädt Knowledge-Base-Verzeichnisse einmal pro Prozess und erkennt Änderungen"""
+
+    def __init__(self, reload_interval: float = KB_RELOAD_INTERVAL, clock: Callable[[], float] = time.monotonic):
+        self.reload_interval = reload_interval
+        self._clock = clock
+        self._snapshots: Dict[str, KnowledgeBaseSnapshot] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "hits": 0, "checks": 0}
+
+    def get(self, path: str) -> KnowledgeBaseSnapshot:
+        """Gibt den aktuellen Snapshot zurück; Platten-I/O nur beim Laden oder nach Ablauf des Prüfintervalls"""
+        key = str(Path(path))
+        now = self._clock()
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and now - self._checked_at[key] < self.reload_interval:
+            self.stats["hits"] += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and now - self._checked_at[key] < self.reload_interval:
+                self.stats["hits"] += 1
+                return snapshot
+
+            self.stats["checks"] += 1
+            signature = self._signature(key)
+            if snapshot is None or snapshot.signature != signature:
+                snapshot = self._load(key, signature)
+                self._snapshots[key] = snapshot
+            else:
+                self.stats["hits"] += 1
+            self._checked_at[key] = now
+            return snapshot
+
+    def invalidate(self, path: Optional[str] = None):
+        """Verwirft gecachte Snapshots (eines Verzeichnisses oder alle)"""
+        with self._lock:
+            if path is None:
+                self._snapshots.clear()
+                self._checked_at.clear()
+            else:
+                self._snapshots.pop(str(Path(path)), None)
+                self._checked_at.pop(str(Path(path)), None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "directories": len(self._snapshots)}
+
+    @staticmethod
+    def _signature(path: str) -> Signature:
+        kb_path = Path(path)
+        if not kb_path.exists():
+            return ()
+        entries = []
+        for file_path in sorted(kb_path.glob("*.md")):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            entries.append((file_path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def _load(self, path: str, signature: Signature) -> KnowledgeBaseSnapshot:
+        self.stats["loads"] += 1
+        full_text = ""
+        sections = []
+        for name, _, _ in signature:
+            file_path = Path(path) / name
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                logging.warning(f"Could not load {file_path}: {e}")
+                continue
+            full_text += f"\n\n## {name}\n{content}"
+            sections.extend(split_sections(name, content))
+
+        return KnowledgeBaseSnapshot(
+            path=path,
+            signature=signature,
+            full_text=full_text,
+            sections=tuple(sections),
+            loaded_at=time.time()
+        )
+
+# Global instance
+_kb_store = None
+
+def get_knowledge_base_store() -> KnowledgeBaseStore:
+    """Get or create the process-wide knowledge base store"""
+    global _kb_store
+    if _kb_store is None:
+        _kb_store = KnowledgeBaseStore()
+    return _kb_store
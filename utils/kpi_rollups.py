@@ -0,0 +1,119 @@
+"""
+Materialisierte KPI-Rollups für das CEO-Dashboard
+Trigger auf leads und projects (Migration 4 in utils/migrations.py) pflegen
+je Tag, Woche und Monat Anzahl und Budgetsumme (kpi_rollups) sowie die
+aktuelle Anzahl je Status (status_counts). Dashboard-Abfragen lesen nur noch
+diese Tabellen - höchstens ein Eintrag pro Tag im Fenster, unabhängig davon,
+wie viele Jahre an Leads und Projekten sich ansammeln.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List
+
+ROLLUP_SOURCES = ("leads", "projects")
+
+# Periodenbeginn je Granularität (Wochen beginnen montags)
+ROLLUP_GRAINS = {
+    "day": "date({ts})",
+    "week": "date({ts}, '-6 days', 'weekday 1')",
+    "month": "date({ts}, 'start of month')",
+}
+
+# Aufsummierter Wert je Quelle (leads zählen nur)
+ROLLUP_TOTALS = {
+    "leads": "0",
+    "projects": "COALESCE({row}.budget, 0)",
+}
+
+def rolling_window(conn: sqlite3.Connection, source: str, days: int) -> Dict[str, float]:
+    """Anzahl und Summe der Einträge mit created_at >= date('now', '-N days')"""
+    count, total = conn.execute("""
+        SELECT COALESCE(SUM(row_count), 0), COALESCE(SUM(total), 0)
+        FROM kpi_rollups
+        WHERE source = ? AND grain = 'day' AND period_start >= date('now', ?)
+    """, (source, f"-{int(days)} days")).fetchone()
+    return {"count": count, "total": total}
+
+def status_counts(conn: sqlite3.Connection, source: str) -> Dict[str, int]:
+    """Aktuelle Anzahl je Status"""
+    return dict(conn.execute(
+        "SELECT status, row_count FROM status_counts WHERE source = ? AND row_count != 0", (source,)
+    ))
+
+def period_series(conn: sqlite3.Connection, source: str, grain: str = "month", periods: int = 12) -> List[Dict]:
+    """Neueste Perioden zuerst, z.B. Budget je Monat für Berichte"""
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f"Unknown rollup grain '{grain}', expected one of {sorted(ROLLUP_GRAINS)}")
+    rows = conn.execute("""
+        SELECT period_start, row_count, total FROM kpi_rollups
+        WHERE source = ? AND grain = ?
+        ORDER BY period_start DESC LIMIT ?
+    """, (source, grain, periods))
+    return [{"period_start": start, "count": count, "total": total} for start, count, total in rows]
+
+def dashboard_metrics(conn: sqlite3.Connection) -> Dict[str, float]:
+    """Kennzahlen des CEO-Dashboards und Tagesberichts aus den Rollups"""
+    projects_by_status = status_counts(conn, "projects")
+    return {
+        "monthly_revenue": rolling_window(conn, "projects", 30)["total"],
+        "weekly_leads": rolling_window(conn, "leads", 7)["count"],
+        "completed_projects": projects_by_status.get("completed", 0),
+        "active_projects": sum(projects_by_status.get(status, 0) for status in ("planned", "in_progress")),
+        "total_projects": sum(projects_by_status.values()),
+    }
+
+def rollup_triggers(source: str) -> List[str]:
+    """CREATE TRIGGER-Statements, die kpi_rollups und status_counts für eine Quelle pflegen"""
+    def apply_row(row: str, sign: str) -> str:
+        total = ROLLUP_TOTALS[source].format(row=row)
+        return "".join(f"""
+            INSERT INTO kpi_rollups (source, grain, period_start, row_count, total)
+            SELECT '{source}', '{grain}', {bucket.format(ts=f'{row}.created_at')}, {sign}1, {sign}{total}
+            WHERE date({row}.created_at) IS NOT NULL
+            ON CONFLICT (source, grain, period_start) DO UPDATE SET
+                row_count = row_count + excluded.row_count,
+                total = total + excluded.total;""" for grain, bucket in ROLLUP_GRAINS.items())
+
+    def apply_status(row: str, sign: str) -> str:
+        return f"""
+            INSERT INTO status_counts (source, status, row_count)
+            VALUES ('{source}', COALESCE({row}.status, ''), {sign}1)
+            ON CONFLICT (source, status) DO UPDATE SET row_count = row_count + excluded.row_count;"""
+
+    rollup_columns = "created_at, budget" if source == "projects" else "created_at"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_insert AFTER INSERT ON {source}
+        BEGIN{apply_row('NEW', '')}{apply_status('NEW', '')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_delete AFTER DELETE ON {source}
+        BEGIN{apply_row('OLD', '-')}{apply_status('OLD', '-')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_update AFTER UPDATE OF {rollup_columns} ON {source}
+        BEGIN{apply_row('OLD', '-')}{apply_row('NEW', '')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{source}_status_update AFTER UPDATE OF status ON {source}
+        WHEN COALESCE(OLD.status, '') != COALESCE(NEW.status, '')
+        BEGIN{apply_status('OLD', '-')}{apply_status('NEW', '')}
+        END""",
+    ]
+
+def rebuild_rollups(conn: sqlite3.Connection, sources: Iterable[str] = ROLLUP_SOURCES):
+    """Berechnet die Rollups vollständig neu (Backfill bzw. nach Massenimporten ohne Trigger)"""
+    for source in sources:
+        total = ROLLUP_TOTALS[source].format(row=source)
+        conn.execute("DELETE FROM kpi_rollups WHERE source = ?", (source,))
+        conn.execute("DELETE FROM status_counts WHERE source = ?", (source,))
+        for grain, bucket in ROLLUP_GRAINS.items():
+            period = bucket.format(ts="created_at")
+            conn.execute(f"""
+                INSERT INTO kpi_rollups (source, grain, period_start, row_count, total)
+                SELECT '{source}', '{grain}', {period}, COUNT(*), COALESCE(SUM({total}), 0)
+                FROM {source}
+                WHERE date(created_at) IS NOT NULL
+                GROUP BY {period}
+            """)
+        conn.execute(f"""
+            INSERT INTO status_counts (source, status, row_count)
+            SELECT '{source}', COALESCE(status, ''), COUNT(*) FROM {source}
+            GROUP BY COALESCE(status, '')
+        """)
@@ -0,0 +1,256 @@
+"""
+LLM Response Cache für berneby development
+Content-adressierter Cache für identische LLM-Anfragen mit In-Memory-LRU
+und SQLite-Disk-Tier. Abgelaufene Zeilen werden beim Schreiben höchstens alle
+LLM_CACHE_PURGE_INTERVAL Sekunden gelöscht, die Tabelle ist auf
+LLM_CACHE_MAX_DISK_ENTRIES Zeilen begrenzt. Async-Aufrufer (chat_completion)
+nutzen get_async/set_async - der Disk-Tier läuft dann im Writer-Thread der
+Async-Fassade statt auf dem Event-Loop.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+from utils.connection_manager import get_connection
+from utils.async_db import get_async_db
+
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "database/llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "10000"))
+LLM_CACHE_PURGE_INTERVAL = float(os.getenv("LLM_CACHE_PURGE_INTERVAL", "300"))
+
+class LLMResponseCache:
+    """Zweistufiger Response-Cache: LRU im Speicher, SQLite auf der Platte"""
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        db_path: Optional[str] = LLM_CACHE_DB_PATH,
+        max_disk_entries: int = LLM_CACHE_MAX_DISK_ENTRIES,
+        purge_interval: float = LLM_CACHE_PURGE_INTERVAL
+    ):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_purged": 0
+        }
+        self._disk_ready = False
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Erzeugt einen stabilen Content-Hash aus allen antwortrelevanten Parametern"""
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "messages": messages,
+                "temperature": round(float(temperature), 4),
+                "max_tokens": int(max_tokens)
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Liest eine Antwort aus dem Cache (erst Speicher, dann Platte)"""
+        now = time.time()
+        response = self._memory_get(key, now)
+        if response is not None:
+            return response
+        return self._disk_result(key, self._disk_get(key, now))
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Wie get(); die Platte wird im Writer-Thread gelesen (abgelaufene Treffer werden dort gelöscht)"""
+        now = time.time()
+        response = self._memory_get(key, now)
+        if response is not None:
+            return response
+        entry = await get_async_db(self.db_path).run(self._disk_get, key, now) if self.db_path else None
+        return self._disk_result(key, entry)
+
+    def set(self, key: str, response: str, ttl: float, provider: str = None, model: str = None):
+        """Speichert eine Antwort in beiden Cache-Stufen"""
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._memory_set(key, response, expires_at)
+        self._disk_set(key, response, expires_at, provider, model)
+        self.stats["stores"] += 1
+
+    async def set_async(self, key: str, response: str, ttl: float, provider: str = None, model: str = None):
+        """Wie set(); der Disk-Write läuft im Writer-Thread der Async-Fassade"""
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._memory_set(key, response, expires_at)
+        if self.db_path:
+            await get_async_db(self.db_path).run(self._disk_set, key, response, expires_at, provider, model)
+        self.stats["stores"] += 1
+
+    def purge(self) -> int:
+        """Löscht abgelaufene Zeilen und kappt den Disk-Tier; gibt die Anzahl gelöschter Zeilen zurück"""
+        if not self._ensure_disk():
+            return 0
+        try:
+            with closing(get_connection(self.db_path)) as conn:
+                deleted = self._purge(conn, time.time())
+                conn.commit()
+                return deleted
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache purge failed: {e}")
+            return 0
+
+    def clear(self):
+        """Leert beide Cache-Stufen"""
+        self._memory.clear()
+        if not self._ensure_disk():
+            return
+        try:
+            with closing(get_connection(self.db_path)) as conn:
+                conn.execute("DELETE FROM llm_response_cache")
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache clear failed: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gibt Hit/Miss-Zähler und die Trefferquote zurück"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+        }
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= now:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.stats["hits"] += 1
+        self.stats["memory_hits"] += 1
+        return response
+
+    def _disk_result(self, key: str, entry: Optional[Tuple[float, str]]) -> Optional[str]:
+        """Übernimmt einen Disk-Treffer in den Speicher und zählt Treffer bzw. Fehlschlag"""
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, response = entry
+        self._memory_set(key, response, expires_at)
+        self.stats["hits"] += 1
+        self.stats["disk_hits"] += 1
+        return response
+
+    def _memory_set(self, key: str, response: str, expires_at: float):
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _ensure_disk(self) -> bool:
+        """Legt die Cache-Tabelle beim ersten Zugriff an"""
+        if not self.db_path:
+            return False
+        if self._disk_ready:
+            return True
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(get_connection(self.db_path)) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_response_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        provider TEXT,
+                        model TEXT,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires ON llm_response_cache(expires_at)")
+                conn.commit()
+            self._disk_ready = True
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache disk tier unavailable: {e}")
+            self.db_path = None
+        return self._disk_ready
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if not self._ensure_disk():
+            return None
+        try:
+            with closing(get_connection(self.db_path)) as conn:
+                row = conn.execute(
+                    "SELECT expires_at, response FROM llm_response_cache WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+                if row and row[0] <= now:
+                    conn.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+                    conn.commit()
+                    return None
+                return row
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache read failed: {e}")
+            return None
+
+    def _disk_set(self, key: str, response: str, expires_at: float, provider: str, model: str):
+        if not self._ensure_disk():
+            return
+        now = time.time()
+        try:
+            with closing(get_connection(self.db_path)) as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO llm_response_cache
+                    (cache_key, response, provider, model, created_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (key, response, provider, model, now, expires_at))
+                # Opportunistisch aufräumen - sonst wächst die Tabelle unbegrenzt
+                if now - self._last_purge >= self.purge_interval:
+                    self._last_purge = now
+                    self._purge(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache write failed: {e}")
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> int:
+        """Abgelaufene Zeilen (Index auf expires_at) und darüber hinaus die am frühesten ablaufenden"""
+        deleted = conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,)).rowcount
+        if self.max_disk_entries > 0:
+            deleted += conn.execute("""
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache
+                    ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_disk_entries,)).rowcount
+        self.stats["disk_purged"] += deleted
+        return deleted
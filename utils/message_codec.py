@@ -0,0 +1,150 @@
+"""
+Serialisierung des content-Felds von Agent-Nachrichten
+Austauschbare Codecs: stdlib json, orjson (wenn installiert) und msgpack als
+binäre Option. Das Dekodieren erkennt das Format am gespeicherten Wert, damit
+Datenbanken mit gemischten Einträgen lesbar bleiben.
+
+Microbenchmark: python -m utils.message_codec
+"""
+
+import os
+import json
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# auto | json | orjson | msgpack
+MESSAGE_CODEC = os.getenv("MESSAGE_CODEC", "auto")
+
+class MessageCodec:
+    """Kodiert content-Dicts für die Datenbank und zurück"""
+
+    name = "json"
+    binary = False
+
+    def encode(self, content: Dict[str, Any]) -> Union[str, bytes]:
+        return json.dumps(content)
+
+    def decode(self, value: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(value)
+
+class OrjsonCodec(MessageCodec):
+    """orjson - speichert weiterhin JSON-Text (json_extract und ältere Leser funktionieren)"""
+
+    name = "orjson"
+
+    def encode(self, content: Dict[str, Any]) -> str:
+        return orjson.dumps(content).decode("utf-8")
+
+    def decode(self, value: Union[str, bytes]) -> Dict[str, Any]:
+        return orjson.loads(value)
+
+class MsgpackCodec(MessageCodec):
+    """msgpack - kompakter Binär-BLOB; für SQLite-JSON-Funktionen nicht lesbar"""
+
+    name = "msgpack"
+    binary = True
+
+    def encode(self, content: Dict[str, Any]) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+    def decode(self, value: bytes) -> Dict[str, Any]:
+        return msgpack.unpackb(bytes(value), raw=False)
+
+_json_loads: Callable[[Union[str, bytes]], Any] = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def decode_content(value: Union[str, bytes, None]) -> Dict[str, Any]:
+    """Dekodiert JSON-Text (beliebiger Codec) oder msgpack-BLOBs"""
+    if not value:
+        return {}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack-encoded message found but msgpack is not installed")
+        return msgpack.unpackb(bytes(value), raw=False)
+    return _json_loads(value)
+
+CODECS = {"json": MessageCodec, "orjson": OrjsonCodec, "msgpack": MsgpackCodec}
+
+def get_message_codec(name: str = None) -> MessageCodec:
+    """Codec nach Name; "auto" wählt orjson, falls installiert, sonst json"""
+    name = (name or MESSAGE_CODEC).lower()
+    if name == "auto":
+        name = "orjson" if ORJSON_AVAILABLE else "json"
+    if name not in CODECS:
+        raise ValueError(f"Unknown message codec '{name}', expected one of {sorted(CODECS)} or 'auto'")
+    if name == "orjson" and not ORJSON_AVAILABLE or name == "msgpack" and not MSGPACK_AVAILABLE:
+        raise ValueError(f"Message codec '{name}' requires the {name} package")
+    return CODECS[name]()
+
+def benchmark(iterations: int = 20000) -> Dict[str, Dict[str, float]]:
+    """
+    Mikrosekunden pro Nachricht: Kodieren (Nachricht -> gespeicherter Wert) und
+    Dekodieren (Datenbankzeile -> AgentMessage) je Codec, verglichen mit dem
+    bisherigen Pfad über dataclasses.asdict und stdlib json
+    """
+    import timeit
+    from dataclasses import asdict
+    from utils.agent_messaging import AgentMessage, MessagePriority, MessageType, create_task_request
+
+    message = create_task_request(
+        "SALES-002", "SALES-005", "calculate_pricing",
+        {"components": ["AI Lead Qualification", "Automated Proposal Generation"],
+         "budget_range": "50000-100000", "hours": [40, 80, 120], "rush": False},
+        lead_id="lead-4711"
+    )
+
+    def legacy_encode():
+        data = asdict(message)
+        return json.dumps({key: data[key] for key in (
+            "task_id", "lead_id", "project_id", "payload", "requires_response", "correlation_id")})
+
+    def legacy_decode(value):
+        content = json.loads(value)
+        data = {
+            "message_id": message.message_id, "timestamp": message.timestamp,
+            "sender_agent": message.sender_agent, "receiver_agent": message.receiver_agent,
+            "message_type": MessageType(message.message_type.value),
+            "priority": MessagePriority(message.priority.value),
+            **{key: content.get(key) for key in (
+                "task_id", "lead_id", "project_id", "payload", "requires_response", "correlation_id")}
+        }
+        return AgentMessage(**data)
+
+    candidates = {"legacy": (legacy_encode, legacy_decode)}
+    for name in CODECS:
+        try:
+            codec = get_message_codec(name)
+        except ValueError:
+            continue
+        candidates[name] = (
+            lambda codec=codec: codec.encode(message.content_dict()),
+            lambda value, codec=codec: AgentMessage.from_content(
+                message.message_id, message.timestamp, message.sender_agent, message.receiver_agent,
+                message.message_type.value, message.priority.value, codec.decode(value)
+            )
+        )
+
+    results = {}
+    for name, (encode, decode) in candidates.items():
+        encoded = encode()
+        results[name] = {
+            "encode_us": round(timeit.timeit(encode, number=iterations) / iterations * 1e6, 2),
+            "decode_us": round(timeit.timeit(lambda: decode(encoded), number=iterations) / iterations * 1e6, 2),
+            "bytes": len(encoded if isinstance(encoded, bytes) else encoded.encode("utf-8"))
+        }
+    return results
+
+if __name__ == "__main__":
+    for codec_name, timings in benchmark().items():
+        print(f"{codec_name:8} encode {timings['encode_us']:6.2f} µs  "
+              f"decode {timings['decode_us']:6.2f} µs  {timings['bytes']} bytes")
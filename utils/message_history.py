@@ -0,0 +1,87 @@
+"""
+Begrenzte Nachrichten-Historie für den MessageBus
+Ringpuffer fester Kapazität mit Sekundärindex je Agent (Sender und Empfänger);
+ältere Einträge liegen nur noch in SQLite
+"""
+
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+MESSAGE_HISTORY_SIZE = int(os.getenv("MESSAGE_HISTORY_SIZE", "1000"))
+
+class MessageHistoryBuffer:
+    """Ringpuffer der zuletzt veröffentlichten Nachrichten mit Index je Agent"""
+
+    def __init__(self, capacity: int = MESSAGE_HISTORY_SIZE):
+        if capacity < 1:
+            raise ValueError("Message history capacity must be >= 1")
+        self.capacity = capacity
+        self._slots: List[Optional[Any]] = [None] * capacity
+        self._next_seq = 0
+        # Laufende Sequenznummern je Agent, aufsteigend - die älteste steht vorne
+        self._by_agent: Dict[str, Deque[int]] = {}
+        self.evicted = 0
+
+    def append(self, message) -> int:
+        """Speichert eine Nachricht und verdrängt bei voller Kapazität die älteste"""
+        seq = self._next_seq
+        slot = seq % self.capacity
+        oldest = self._slots[slot]
+        if oldest is not None:
+            self._unindex(oldest, seq - self.capacity)
+            self.evicted += 1
+        self._slots[slot] = message
+        for agent in self._agents_of(message):
+            self._by_agent.setdefault(agent, deque()).append(seq)
+        self._next_seq += 1
+        return seq
+
+    def recent(self, agent_name: str = None, limit: int = 100) -> List[Any]:
+        """Neueste Nachrichten zuerst, optional nur die eines Agenten"""
+        if agent_name is None:
+            first = max(0, self._next_seq - self.capacity)
+            seqs = range(self._next_seq - 1, max(first, self._next_seq - limit) - 1, -1)
+        else:
+            index = self._by_agent.get(agent_name, ())
+            seqs = [index[i] for i in range(len(index) - 1, max(-1, len(index) - 1 - limit), -1)]
+        return [self._slots[seq % self.capacity] for seq in seqs]
+
+    def count(self, agent_name: str = None) -> int:
+        if agent_name is None:
+            return len(self)
+        return len(self._by_agent.get(agent_name, ()))
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self._by_agent.clear()
+        self._next_seq = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "capacity": self.capacity,
+            "size": len(self),
+            "agents": len(self._by_agent),
+            "published": self._next_seq,
+            "evicted": self.evicted
+        }
+
+    def __len__(self) -> int:
+        return min(self._next_seq, self.capacity)
+
+    def __iter__(self) -> Iterator[Any]:
+        """Älteste zuerst (wie die frühere Listen-Historie)"""
+        return reversed(self.recent(limit=self.capacity))
+
+    def _agents_of(self, message) -> List[str]:
+        if message.sender_agent == message.receiver_agent:
+            return [message.sender_agent]
+        return [message.sender_agent, message.receiver_agent]
+
+    def _unindex(self, message, seq: int):
+        for agent in self._agents_of(message):
+            index = self._by_agent.get(agent)
+            if index and index[0] == seq:
+                index.popleft()
+                if not index:
+                    del self._by_agent[agent]
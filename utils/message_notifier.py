@@ -0,0 +1,67 @@
+"""
+In-Process-Benachrichtigung für Agent-Nachrichten
+Weckt wartende Agenten sofort, wenn eine Nachricht für sie gespeichert wurde;
+SQLite bleibt das dauerhafte Log, Polling nur noch Fallback zur Wiederherstellung
+"""
+
+import asyncio
+from typing import Dict, Set, Tuple
+
+class MessageNotifier:
+    """Pro Empfänger ein asyncio.Event je abonnierendem Agenten"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self.stats = {"notifications": 0, "wakeups": 0, "timeouts": 0}
+
+    def subscribe(self, receiver_id: str) -> asyncio.Event:
+        """Registriert einen Empfänger im laufenden Event-Loop und gibt sein Inbox-Event zurück"""
+        event = asyncio.Event()
+        self._subscribers.setdefault(receiver_id, set()).add((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, receiver_id: str, event: asyncio.Event):
+        subscribers = self._subscribers.get(receiver_id, set())
+        subscribers.difference_update({entry for entry in subscribers if entry[1] is event})
+        if not subscribers:
+            self._subscribers.pop(receiver_id, None)
+
+    def notify(self, receiver_id: str) -> bool:
+        """Weckt alle Abonnenten eines Empfängers; True, wenn jemand zuhört"""
+        subscribers = self._subscribers.get(receiver_id)
+        if not subscribers:
+            return False
+        self.stats["notifications"] += 1
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for loop, event in list(subscribers):
+            if loop is current_loop:
+                event.set()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+        return True
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wartet auf eine Benachrichtigung; False nach Ablauf des Fallback-Intervalls"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return False
+        self.stats["wakeups"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "receivers": len(self._subscribers)}
+
+# Global instance
+_notifier = None
+
+def get_message_notifier() -> MessageNotifier:
+    """Get or create the process-wide message notifier"""
+    global _notifier
+    if _notifier is None:
+        _notifier = MessageNotifier()
+    return _notifier
@@ -0,0 +1,82 @@
+"""
+Micro-Batching für LLM-Anfragen
+Sammelt gleichzeitig eintreffende kleine Anfragen mehrerer Agenten für wenige
+Millisekunden und reicht sie gemeinsam an `chat_completion_batch` weiter
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from config.ai_task_config import BATCH_CONFIG
+
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+class MicroBatcher:
+    """Koalesziert Einzelanfragen zu Batches und verteilt die Ergebnisse zurück"""
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        max_batch_size: int = BATCH_CONFIG["max_batch_size"],
+        max_wait: float = BATCH_CONFIG["max_wait_ms"] / 1000
+    ):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Offene Anfragen und Flush-Timer je Event-Loop (Futures sind loop-gebunden)
+        self._pending: Dict[asyncio.AbstractEventLoop, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[asyncio.AbstractEventLoop, asyncio.TimerHandle] = {}
+        self._inflight: set = set()
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+
+    async def submit(self, request: Dict[str, Any]) -> Any:
+        """Reiht eine Anfrage ein und wartet auf ihr Ergebnis"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append((request, future))
+        self.stats["requests"] += 1
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif loop not in self._timers:
+            self._timers[loop] = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(loop, [])
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        task = loop.create_task(self._run(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        requests = [request for request, _ in batch]
+        try:
+            try:
+                results = await self.handler(requests)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue  # Aufrufer wurde abgebrochen
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            # Abgebrochener Flush-Task (Shutdown, aclose, Loop-Ende): Aufrufer nicht ewig warten lassen
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
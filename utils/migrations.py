@@ -0,0 +1,674 @@
+"""
+Versionierte Schema-Migrationen für die Agentendatenbank
+Einzige Stelle, an der Tabellen und Indizes angelegt werden (database.py,
+setup_environment.py sowie Pricing- und Finance-Agent nutzen den Runner).
+Angewendete Versionen stehen in schema_migrations; jede Migration läuft in
+einer eigenen BEGIN-IMMEDIATE-Transaktion, parallele Starts warten aufeinander.
+
+Query-Plan-Report der Agenten-Abfragen:
+    python -m utils.migrations --report [DATABASE_PATH]
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.connection_manager import get_connection
+from utils.kpi_rollups import ROLLUP_SOURCES, rebuild_rollups, rollup_triggers
+from utils.message_codec import MSGPACK_AVAILABLE, decode_content
+from utils.work_queue import LEASE_COLUMNS, PRIORITY_LEVELS
+
+@dataclass(frozen=True)
+class Migration:
+    """Eine Schema-Version; apply(conn) läuft innerhalb der Migrations-Transaktion"""
+
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Ergänzt Spalten älterer Datenbanken (ALTER TABLE kennt kein IF NOT EXISTS)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column, definition in columns.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _initial_schema(conn: sqlite3.Connection):
+    """Bisheriges Schema aus utils/database.py"""
+    # Original Core Tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agents (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            pod TEXT NOT NULL,
+            specialization TEXT,
+            status TEXT DEFAULT 'inactive',
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_active TEXT,
+            last_action TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            agent_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT DEFAULT 'pending',
+            priority INTEGER DEFAULT 5,
+            created_at TEXT NOT NULL,
+            completed_at TEXT,
+            result TEXT,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_state (
+            agent_id TEXT PRIMARY KEY,
+            current_task_id TEXT,
+            context TEXT,
+            last_updated TEXT NOT NULL,
+            FOREIGN KEY (agent_id) REFERENCES agents (id),
+            FOREIGN KEY (current_task_id) REFERENCES tasks (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            context TEXT,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    # n8n Workflow Integration Tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS workflow_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            workflow_id TEXT NOT NULL,
+            input_data TEXT,
+            status TEXT DEFAULT 'initiated',
+            result_data TEXT,
+            created_at TEXT NOT NULL,
+            completed_at TEXT,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS created_workflows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            workflow_id TEXT NOT NULL,
+            definition TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    # Compliance Layer Tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compliance_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            action_type TEXT NOT NULL,
+            action_data TEXT NOT NULL,
+            compliance_result TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS processing_register (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            register_key TEXT UNIQUE NOT NULL,
+            legal_basis TEXT NOT NULL,
+            purpose TEXT NOT NULL,
+            registered_at TEXT NOT NULL,
+            metadata TEXT,
+            valid_until TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pii_processing_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            data_hash TEXT NOT NULL,
+            pii_types TEXT NOT NULL,
+            processing_basis TEXT,
+            purpose TEXT,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hitl_escalations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            escalation_reason TEXT NOT NULL,
+            context_data TEXT,
+            status TEXT DEFAULT 'pending',
+            assigned_human TEXT,
+            resolution TEXT,
+            created_at TEXT NOT NULL,
+            resolved_at TEXT,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    # Legacy Messages Table (for BaseAgent compatibility)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id TEXT,
+            receiver_id TEXT,
+            message_type TEXT,
+            content TEXT,
+            metadata TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP,
+            attempts INTEGER DEFAULT 0,
+            visible_at REAL DEFAULT 0,
+            lease_owner TEXT,
+            last_error TEXT
+        )
+    """)
+
+    # Agent Messaging Tables (for enhanced agents)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_messages (
+            id TEXT PRIMARY KEY,
+            sender_id TEXT NOT NULL,
+            receiver_id TEXT NOT NULL,
+            message_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            priority_num INTEGER DEFAULT 1,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT NOT NULL,
+            processed_at TEXT,
+            attempts INTEGER DEFAULT 0,
+            visible_at REAL DEFAULT 0,
+            lease_owner TEXT,
+            last_error TEXT,
+            FOREIGN KEY (sender_id) REFERENCES agents (id),
+            FOREIGN KEY (receiver_id) REFERENCES agents (id)
+        )
+    """)
+
+    # Work-Queue: Nachrichten nach max. Zustellversuchen (siehe utils/work_queue.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS message_dead_letters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_table TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            receiver_id TEXT,
+            message_type TEXT,
+            message TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            last_error TEXT,
+            failed_at REAL NOT NULL
+        )
+    """)
+
+    # Enhanced Agent Performance Tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_performance_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            metric_name TEXT NOT NULL,
+            metric_value REAL NOT NULL,
+            target_value REAL,
+            timestamp TEXT NOT NULL,
+            period TEXT DEFAULT 'daily',
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_learning_feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            task_description TEXT NOT NULL,
+            response_data TEXT NOT NULL,
+            feedback_type TEXT NOT NULL,
+            feedback_content TEXT NOT NULL,
+            improvement_score REAL,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (agent_id) REFERENCES agents (id)
+        )
+    """)
+
+    # Create indexes for better performance
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_calls_agent ON workflow_calls(agent_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compliance_logs_agent ON compliance_logs(agent_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_messages_receiver ON agent_messages(receiver_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_messages_status ON agent_messages(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hitl_escalations_status ON hitl_escalations(status)")
+
+    # Legacy system tables for existing system compatibility
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id TEXT PRIMARY KEY,
+            source TEXT,
+            contact_data TEXT,
+            qualification_score INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'new',
+            assigned_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id TEXT,
+            name TEXT,
+            description TEXT,
+            status TEXT DEFAULT 'setup',
+            budget REAL,
+            deadline DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lead_id) REFERENCES leads(id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kpis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            metric_name TEXT,
+            value REAL,
+            target REAL,
+            period TEXT,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS system_state (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            activity TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            metric_name TEXT NOT NULL,
+            value REAL NOT NULL,
+            target REAL,
+            period TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _consolidate_ad_hoc_tables(conn: sqlite3.Connection):
+    """
+    Gleicht mit setup_environment.py angelegte Datenbanken an und übernimmt die
+    Tabellen, die Pricing- und Finance-Agent bisher beim Schreiben anlegten
+    """
+    _add_missing_columns(conn, "agents", {"specialization": "TEXT", "last_action": "TEXT"})
+    _add_missing_columns(conn, "messages", LEASE_COLUMNS)
+    
+    # Mit dem alten utils/database.py angelegte agent_messages-Tabellen kennen weder
+    # priority_num noch die Lease-Spalten - der Dispatch-Index erst danach
+    has_priority_num = "priority_num" in {row[1] for row in conn.execute("PRAGMA table_info(agent_messages)")}
+    _add_missing_columns(conn, "agent_messages", {
+        "priority_num": f"INTEGER DEFAULT {PRIORITY_LEVELS['normal']}", **LEASE_COLUMNS
+    })
+    if not has_priority_num:
+        cases = " ".join(f"WHEN '{name}' THEN {level}" for name, level in PRIORITY_LEVELS.items())
+        conn.execute(
+            f"UPDATE agent_messages SET priority_num = CASE priority {cases} ELSE {PRIORITY_LEVELS['normal']} END"
+        )
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_agent_messages_dispatch
+        ON agent_messages(receiver_id, status, priority_num, created_at)
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pricing_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id TEXT,
+            recommended_price REAL,
+            margin_percentage REAL,
+            confidence_score REAL,
+            pricing_strategy TEXT,
+            full_result TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT UNIQUE,
+            project_id TEXT,
+            customer_name TEXT,
+            customer_email TEXT,
+            invoice_date DATE,
+            due_date DATE,
+            subtotal REAL,
+            vat_amount REAL,
+            total_amount REAL,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _workload_indexes(conn: sqlite3.Connection):
+    """Indizes für die Prädikate der Agenten-Abfragen (siehe query_plan_report)"""
+    # Inbox-Claims: receiver_id + status, FIFO nach created_at
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_inbox
+        ON messages(receiver_id, status, created_at)
+    """)
+    # Lead-Statistiken (Zeitfenster) und Status-Zählungen
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_created ON leads(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status)")
+    # Aktive Projekte je Status bzw. Umsatz der letzten 30 Tage
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_status_created ON projects(status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_created ON projects(created_at)")
+    # KPI-Zeitreihen je Agent und Kennzahl
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_kpi_metrics_series
+        ON kpi_metrics(agent_id, metric_name, timestamp)
+    """)
+    # Überfällige Rechnungen: status != 'paid' ist über (status, due_date) nicht
+    # durchsuchbar - Teilindex über due_date der offenen Rechnungen
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_invoices_open_due
+        ON invoices(due_date) WHERE status != 'paid'
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
+
+def _kpi_rollups(conn: sqlite3.Connection):
+    """Materialisierte Dashboard-Kennzahlen, per Trigger gepflegt (siehe utils/kpi_rollups.py)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_rollups (
+            source TEXT NOT NULL,
+            grain TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, grain, period_start)
+        ) WITHOUT ROWID
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS status_counts (
+            source TEXT NOT NULL,
+            status TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, status)
+        ) WITHOUT ROWID
+    """)
+    
+    for source in ROLLUP_SOURCES:
+        for trigger in rollup_triggers(source):
+            conn.execute(trigger)
+    rebuild_rollups(conn)
+
+def _agent_health(conn: sqlite3.Connection):
+    """Heartbeats je Worker und Alert-Zustände der Health-Überwachung (siehe utils/agent_health.py)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_heartbeats (
+            agent_id TEXT NOT NULL,
+            worker_id TEXT NOT NULL,
+            agent_name TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            beat_at REAL NOT NULL,
+            PRIMARY KEY (agent_id, worker_id)
+        ) WITHOUT ROWID
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS health_alerts (
+            id INTEGER PRIMARY KEY,
+            alert_key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            agent_id TEXT,
+            agent_name TEXT,
+            state TEXT NOT NULL DEFAULT 'open',
+            opened_at REAL NOT NULL,
+            last_seen_at REAL NOT NULL,
+            resolved_at REAL,
+            occurrences INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    # Höchstens ein offener Alert je Schlüssel; die Auswertung liest nur offene Alerts
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_health_alerts_open
+        ON health_alerts(alert_key) WHERE state = 'open'
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_health_alerts_open_kind
+        ON health_alerts(kind) WHERE state = 'open'
+    """)
+
+def _message_correlation(conn: sqlite3.Connection):
+    """correlation_id als Spalte, damit request() Antworten per Index statt durch Dekodieren aller Zeilen findet"""
+    _add_missing_columns(conn, "agent_messages", {"correlation_id": "TEXT"})
+    conn.execute("""
+        UPDATE agent_messages SET correlation_id = json_extract(content, '$.correlation_id')
+        WHERE typeof(content) = 'text' AND json_valid(content)
+    """)
+    if MSGPACK_AVAILABLE:
+        blobs = conn.execute("SELECT id, content FROM agent_messages WHERE typeof(content) = 'blob'").fetchall()
+        conn.executemany(
+            "UPDATE agent_messages SET correlation_id = ? WHERE id = ?",
+            [(decode_content(content).get("correlation_id"), message_id) for message_id, content in blobs]
+        )
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_agent_messages_correlation
+        ON agent_messages(correlation_id, receiver_id, status) WHERE correlation_id IS NOT NULL
+    """)
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_schema", _initial_schema),
+    Migration(2, "consolidate_ad_hoc_tables", _consolidate_ad_hoc_tables),
+    Migration(3, "workload_indexes", _workload_indexes),
+    Migration(4, "kpi_rollups", _kpi_rollups),
+    Migration(5, "agent_health", _agent_health),
+    Migration(6, "message_correlation", _message_correlation),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+def _default_path() -> str:
+    return os.getenv("DATABASE_PATH", "database/agent_system.db")
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+
+def get_schema_version(db_path: str = None) -> int:
+    """Höchste angewendete Migration (0 = nicht migriert)"""
+    with closing(get_connection(db_path or _default_path())) as conn:
+        _ensure_version_table(conn)
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+def migrate(db_path: str = None, target: Optional[int] = None) -> List[int]:
+    """
+    Wendet alle ausstehenden Migrationen (bis einschließlich target) an und
+    gibt die neu angewendeten Versionen zurück
+    """
+    path = db_path or _default_path()
+    if path != ":memory:" and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    applied = []
+    with closing(get_connection(path, isolation_level=None)) as conn:
+        _ensure_version_table(conn)
+        for migration in MIGRATIONS:
+            if target is not None and migration.version > target:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Erst unter dem Schreib-Lock prüfen - ein paralleler Prozess kann schneller gewesen sein
+                if conn.execute(
+                    "SELECT 1 FROM schema_migrations WHERE version = ?", (migration.version,)
+                ).fetchone():
+                    conn.execute("ROLLBACK")
+                    continue
+                migration.apply(conn)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                    (migration.version, migration.name, datetime.now().isoformat())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(migration.version)
+        if applied:
+            # Planer-Statistiken für neue Indizes
+            conn.execute("PRAGMA optimize")
+    return applied
+
+# Abfragen der Agenten (Platzhalter-Parameter) - Grundlage der Indizes in Migration 3
+AGENT_QUERIES: List[Tuple[str, str, Sequence]] = [
+    ("BaseAgent.get_pending_messages (claim)", """
+        SELECT id FROM messages
+        WHERE receiver_id = ? AND status IN ('pending', 'processing') AND COALESCE(visible_at, 0) <= ?
+        ORDER BY created_at ASC, rowid ASC LIMIT ?
+    """, ("ACQ-001", 0, 10)),
+    ("BaseAgent.get_pending_messages (dead letters)", """
+        SELECT * FROM messages
+        WHERE receiver_id = ? AND status = 'processing' AND visible_at <= ? AND attempts >= ?
+    """, ("ACQ-001", 0, 5)),
+    ("BaseAgent.mark_message_processed", """
+        UPDATE messages SET status = 'processed', processed_at = CURRENT_TIMESTAMP, lease_owner = NULL
+        WHERE id = ? AND status = 'processing' AND lease_owner = ?
+    """, (1, "worker")),
+    ("MessageBus._find_response", """
+        SELECT id, sender_id, receiver_id, message_type, content, priority, created_at FROM agent_messages
+        WHERE correlation_id = ? AND receiver_id = ? AND status = 'pending' AND message_type = ?
+        ORDER BY created_at ASC LIMIT 1
+    """, ("request", "SALES-002", "task_response")),
+    ("BaseAgent.get_system_state", "SELECT value FROM system_state WHERE key = ?", ("system_status",)),
+    ("BaseAgent.heartbeat (last_action)",
+     "UPDATE agents SET last_action = CURRENT_TIMESTAMP WHERE id = ?", ("CEO-001",)),
+    ("BaseAgent.heartbeat", """
+        INSERT INTO agent_heartbeats (agent_id, worker_id, agent_name, status, beat_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (agent_id, worker_id) DO UPDATE SET status = excluded.status, beat_at = excluded.beat_at
+    """, ("CEO-001", "worker", "CEO", "running", 0)),
+    ("KPI-Zeitreihe je Agent/Kennzahl", """
+        SELECT SUM(value) FROM kpi_metrics
+        WHERE agent_id = ? AND metric_name = ? AND timestamp >= ?
+    """, ("ACQ-001", "leads_processed", "2024-01-01")),
+    ("CEOAgent.get_kpi_dashboard / _generate_daily_report (Rollup-Fenster)", """
+        SELECT COALESCE(SUM(row_count), 0), COALESCE(SUM(total), 0) FROM kpi_rollups
+        WHERE source = ? AND grain = 'day' AND period_start >= date('now', ?)
+    """, ("projects", "-30 days")),
+    ("CEOAgent.get_kpi_dashboard / _generate_daily_report (Status)", """
+        SELECT status, row_count FROM status_counts WHERE source = ? AND row_count != 0
+    """, ("projects",)),
+    ("CEOAgent.monitor_system_health (Heartbeats)", """
+        SELECT agent_id, agent_name, status, MAX(beat_at) FROM agent_heartbeats GROUP BY agent_id
+    """, ()),
+    ("CEOAgent.monitor_system_health (offene Alerts)", """
+        SELECT id, alert_key, agent_id, agent_name, opened_at, occurrences FROM health_alerts
+        WHERE state = 'open' AND kind = ?
+    """, ("stale_heartbeat",)),
+    ("InboundAgent.get_lead_statistics (heute)", """
+        SELECT COUNT(*) FROM leads WHERE created_at >= date('now') AND created_at < date('now', '+1 day')
+    """, ()),
+    ("InboundAgent.get_lead_statistics (qualifiziert)", """
+        SELECT COUNT(*) FROM leads WHERE qualification_score >= 6 AND created_at >= datetime('now', '-7 days')
+    """, ()),
+    ("InboundAgent._archive_spam_lead",
+     "UPDATE leads SET status = 'spam', updated_at = ? WHERE id = ?", ("2024-01-01", "lead")),
+    ("LeadQualificationAgent / NeedsAnalysisAgent / ProposalWriterAgent (Lead laden)",
+     "SELECT * FROM leads WHERE id = ?", ("lead",)),
+    ("OnboardingAgent (Projekt laden)", """
+        SELECT name, description, budget, deadline, status FROM projects WHERE id = ?
+    """, (1,)),
+    ("DeliveryManagerAgent (aktive Projekte)", """
+        SELECT id, name, budget, deadline, status, created_at FROM projects
+        WHERE status IN ('in_development', 'testing', 'client_review')
+    """, ()),
+    ("FinanceAgent._generate_invoice_number", """
+        SELECT COUNT(*) FROM invoices WHERE invoice_number LIKE ?
+    """, ("202401%",)),
+    ("FinanceAgent._collect_monthly_financial_data (Monat)", """
+        SELECT COUNT(*), SUM(total_amount), SUM(CASE WHEN status = 'paid' THEN total_amount ELSE 0 END)
+        FROM invoices WHERE invoice_date >= ? AND invoice_date < date(?, '+1 month')
+    """, ("2024-01-01", "2024-01-01")),
+    ("FinanceAgent._collect_monthly_financial_data (überfällig)", """
+        SELECT COUNT(*), SUM(total_amount) FROM invoices WHERE status != 'paid' AND due_date < date('now')
+    """, ()),
+    ("FinanceAgent._get_invoice_details", """
+        SELECT invoice_number, customer_name, customer_email, due_date, total_amount, status
+        FROM invoices WHERE id = ?
+    """, (1,)),
+    ("FinanceAgent._update_invoice_status", "UPDATE invoices SET status = ? WHERE id = ?", ("sent", 1)),
+]
+
+def query_plan_report(db_path: str = None) -> List[Dict]:
+    """
+    EXPLAIN QUERY PLAN für alle Agenten-Abfragen. full_scan markiert Abfragen,
+    die eine Tabelle ohne Index durchlaufen; fehlende Tabellen landen in error.
+    """
+    report = []
+    with closing(get_connection(db_path or _default_path())) as conn:
+        for name, sql, params in AGENT_QUERIES:
+            entry = {"query": name, "plan": [], "full_scan": False, "error": None}
+            try:
+                entry["plan"] = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except sqlite3.Error as e:
+                entry["error"] = str(e)
+            # "SCAN leads" ohne "USING ... INDEX" = vollständiger Tabellendurchlauf
+            entry["full_scan"] = any(
+                step.startswith("SCAN") and "INDEX" not in step for step in entry["plan"]
+            )
+            report.append(entry)
+    return report
+
+if __name__ == "__main__":
+    import sys
+    
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    path = args[0] if args else _default_path()
+    versions = migrate(path)
+    print(f"Schema version {get_schema_version(path)} ({path}); applied now: {versions or 'none'}")
+    if "--report" in sys.argv:
+        for entry in query_plan_report(path):
+            marker = "ERROR" if entry["error"] else ("SCAN " if entry["full_scan"] else "ok   ")
+            print(f"{marker} {entry['query']}")
+            for step in entry["plan"]:
+                print(f"        {step}")
+            if entry["error"]:
+                print(f"        {entry['error']}")
@@ -0,0 +1,128 @@
+"""
+Prompt-Budget für Knowledge-Base-Kontext
+Zerlegt Knowledge-Base-Markdown in Abschnitte und wählt je Anfrage nur die
+relevantesten Abschnitte bis zu einem Token-Budget aus
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+HEADING_PATTERN = re.compile(r"^(#{1,3})\s+(.*)$", re.MULTILINE)
+TERM_PATTERN = re.compile(r"\w{4,}", re.UNICODE)
+
+def count_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token, wie im Rate Limiter)"""
+    return (len(text) + 3) // 4
+
+def extract_terms(text: str) -> set:
+    """Normalisierte Suchbegriffe (Wörter ab 4 Zeichen)"""
+    return {term.lower() for term in TERM_PATTERN.findall(text)}
+
+@dataclass(frozen=True)
+class KnowledgeSection:
+    """Ein Abschnitt (bis Überschrift-Ebene 3) einer Knowledge-Base-Datei"""
+    source: str
+    heading: str
+    text: str
+    tokens: int
+    heading_terms: frozenset = field(default_factory=frozenset)
+    body_terms: frozenset = field(default_factory=frozenset)
+
+@dataclass
+class BudgetResult:
+    """Ausgewählter Kontext und Token-Bilanz"""
+    text: str
+    total_tokens: int
+    used_tokens: int
+    kept_sections: int
+    dropped_sections: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.total_tokens - self.used_tokens
+
+def split_sections(source: str, markdown: str) -> List[KnowledgeSection]:
+    """Zerlegt eine Markdown-Datei an Überschriften der Ebenen 1-3"""
+    boundaries = [match.start() for match in HEADING_PATTERN.finditer(markdown)]
+    if not boundaries or boundaries[0] != 0:
+        boundaries.insert(0, 0)
+    boundaries.append(len(markdown))
+
+    sections = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        text = markdown[start:end].strip()
+        if not text:
+            continue
+        match = HEADING_PATTERN.match(text)
+        heading = match.group(2).strip() if match else ""
+        sections.append(KnowledgeSection(
+            source=source,
+            heading=heading,
+            text=text,
+            tokens=count_tokens(text),
+            heading_terms=frozenset(extract_terms(heading)),
+            body_terms=frozenset(extract_terms(text))
+        ))
+    return sections
+
+def score_section(section: KnowledgeSection, query_terms: set) -> int:
+    """Relevanz: Treffer in der Überschrift zählen dreifach, im Text einfach"""
+    return 3 * len(section.heading_terms & query_terms) + len(section.body_terms & query_terms)
+
+def select_sections(sections: Sequence[KnowledgeSection], query: str, budget: int) -> BudgetResult:
+    """
+    Wählt die relevantesten Abschnitte bis zum Token-Budget aus (greedy nach Score,
+    ohne Treffer in Dokumentreihenfolge) und gibt sie in Originalreihenfolge zurück.
+    """
+    query_terms = extract_terms(query)
+    ranked: List[Tuple[int, int]] = sorted(
+        ((-score_section(section, query_terms), index) for index, section in enumerate(sections))
+    )
+
+    chosen = set()
+    used = 0
+    for _, index in ranked:
+        tokens = sections[index].tokens
+        if used + tokens <= budget:
+            chosen.add(index)
+            used += tokens
+
+    parts = []
+    current_source = None
+    for index, section in enumerate(sections):
+        if index not in chosen:
+            continue
+        if section.source != current_source:
+            parts.append(f"\n\n## {section.source}\n")
+            current_source = section.source
+        parts.append(section.text + "\n\n")
+
+    return BudgetResult(
+        text="".join(parts).strip(),
+        total_tokens=sum(section.tokens for section in sections),
+        used_tokens=used,
+        kept_sections=len(chosen),
+        dropped_sections=len(sections) - len(chosen)
+    )
+
+class PromptBudgetStats:
+    """Kumulierte Token-Ersparnis eines Agenten"""
+
+    def __init__(self):
+        self.prompts = 0
+        self.kb_tokens_total = 0
+        self.kb_tokens_used = 0
+
+    def add(self, result: BudgetResult):
+        self.prompts += 1
+        self.kb_tokens_total += result.total_tokens
+        self.kb_tokens_used += result.used_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "prompts": self.prompts,
+            "kb_tokens_total": self.kb_tokens_total,
+            "kb_tokens_used": self.kb_tokens_used,
+            "kb_tokens_saved": self.kb_tokens_total - self.kb_tokens_used
+        }
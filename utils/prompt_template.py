@@ -0,0 +1,85 @@
+"""
+Vorkompilierte Prompt-Templates
+Statische Werte (Identität, Firmenkontext, Direktiven) werden einmal eingesetzt;
+pro Aufruf werden nur noch die dynamischen Slots zusammengefügt
+"""
+
+from string import Template
+from typing import Dict, Tuple
+
+from utils.prompt_budget import count_tokens
+
+class CompiledPrompt:
+    """Vorgerenderter Prompt mit verbleibenden dynamischen Slots"""
+
+    def __init__(self, parts: Tuple[str, ...], slots: Tuple[str, ...]):
+        self.parts = parts  # len(parts) == len(slots) + 1
+        self.slots = slots
+        self.static_chars = sum(len(part) for part in parts)
+        self.static_tokens = count_tokens("".join(parts))
+
+    def render(self, **dynamic_values: str) -> str:
+        """Setzt die dynamischen Slots ein; fehlende Slots lösen KeyError aus"""
+        pieces = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            pieces.append(dynamic_values[slot])
+            pieces.append(part)
+        return "".join(pieces)
+
+class PromptTemplate:
+    """Prompt-Template mit $-Platzhaltern (string.Template-Syntax)"""
+
+    def __init__(self, template: str):
+        self.template = Template(template)
+
+    def compile(self, **static_values: str) -> CompiledPrompt:
+        """
+        Rendert alle übergebenen statischen Werte einmalig; nicht übergebene
+        Platzhalter bleiben als dynamische Slots für render() erhalten.
+        """
+        parts = []
+        slots = []
+        literal = []
+        position = 0
+        source = self.template.template
+        for match in self.template.pattern.finditer(source):
+            literal.append(source[position:match.start()])
+            position = match.end()
+            name = match.group("named") or match.group("braced")
+            if match.group("escaped") is not None:
+                literal.append(self.template.delimiter)
+            elif name in static_values:
+                literal.append(str(static_values[name]))
+            elif name is not None:
+                parts.append("".join(literal))
+                slots.append(name)
+                literal = []
+            else:
+                raise ValueError(f"Invalid placeholder in prompt template at position {match.start()}")
+        literal.append(source[position:])
+        parts.append("".join(literal))
+        return CompiledPrompt(tuple(parts), tuple(slots))
+
+class PromptSizeStats:
+    """Größe der gerenderten Prompts eines Agenten (zur Beobachtung des Prompt-Wachstums)"""
+
+    def __init__(self):
+        self.renders = 0
+        self.last_tokens = 0
+        self.max_tokens = 0
+        self.static_tokens = 0
+
+    def add(self, compiled: CompiledPrompt, rendered: str):
+        tokens = count_tokens(rendered)
+        self.renders += 1
+        self.last_tokens = tokens
+        self.max_tokens = max(self.max_tokens, tokens)
+        self.static_tokens = compiled.static_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "renders": self.renders,
+            "static_tokens": self.static_tokens,
+            "last_rendered_tokens": self.last_tokens,
+            "max_rendered_tokens": self.max_tokens
+        }
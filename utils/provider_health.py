@@ -0,0 +1,179 @@
+"""
+Provider Health Tracking für berneby development
+Circuit Breaker je Provider/Modell mit rollierenden Fehler- und Latenzfenstern
+sowie Health-basierter Reihenfolge der Fallback-Kette
+"""
+
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.ai_task_config import CIRCUIT_BREAKER_CONFIG
+
+class CircuitState(Enum):
+    CLOSED = "closed"        # Normalbetrieb
+    OPEN = "open"            # Provider wird übersprungen
+    HALF_OPEN = "half_open"  # Einzelne Probe-Anfrage erlaubt
+
+class ProviderCircuitBreaker:
+    """Circuit Breaker für eine Provider/Modell-Kombination"""
+
+    def __init__(
+        self,
+        window_size: int = CIRCUIT_BREAKER_CONFIG["window_size"],
+        min_calls: int = CIRCUIT_BREAKER_CONFIG["min_calls"],
+        failure_rate_threshold: float = CIRCUIT_BREAKER_CONFIG["failure_rate_threshold"],
+        open_seconds: float = CIRCUIT_BREAKER_CONFIG["open_seconds"],
+        latency_window: int = CIRCUIT_BREAKER_CONFIG["latency_window"],
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.open_seconds = open_seconds
+        self._clock = clock
+
+        self.outcomes: deque = deque(maxlen=window_size)     # True = Erfolg
+        self.latencies: deque = deque(maxlen=latency_window)  # Sekunden erfolgreicher Aufrufe
+        self.state = CircuitState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def cooldown_elapsed(self) -> bool:
+        return self.state == CircuitState.OPEN and self._clock() - self.opened_at >= self.open_seconds
+
+    def is_available(self) -> bool:
+        """Prüft ohne Seiteneffekt, ob der Provider aktuell angefragt werden kann"""
+        if self.state == CircuitState.OPEN:
+            return self.cooldown_elapsed
+        if self.state == CircuitState.HALF_OPEN:
+            return not self.probe_in_flight
+        return True
+
+    def allow_request(self) -> bool:
+        """Reserviert eine Anfrage; im Half-Open-Zustand wird genau eine Probe zugelassen"""
+        if self.cooldown_elapsed:
+            self.state = CircuitState.HALF_OPEN
+            self.probe_in_flight = False
+
+        if self.state == CircuitState.OPEN:
+            return False
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+
+        return True
+
+    def record_success(self, latency: float):
+        """Erfolgreichen Aufruf verbuchen"""
+        self.outcomes.append(True)
+        self.latencies.append(latency)
+        if self.state == CircuitState.HALF_OPEN:
+            self._close()
+
+    def release(self):
+        """Gibt eine reservierte Probe ohne Ergebnis frei (z.B. bei Abbruch)"""
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        """Fehlgeschlagenen Aufruf verbuchen"""
+        self.outcomes.append(False)
+        if self.state == CircuitState.HALF_OPEN:
+            self._open()
+        elif len(self.outcomes) >= self.min_calls and self.error_rate >= self.failure_rate_threshold:
+            self._open()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def has_latency_data(self) -> bool:
+        return len(self.latencies) >= self.min_calls
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latenz-Perzentil (0-100) über das rollierende Fenster"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def health_score(self) -> float:
+        """Niedriger ist besser: mittlere Latenz, gewichtet mit der Fehlerrate"""
+        mean_latency = sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+        return mean_latency * (1 + 2 * self.error_rate)
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state.value,
+            "error_rate": round(self.error_rate, 3),
+            "calls_in_window": len(self.outcomes),
+            "p50_latency": self.latency_percentile(50),
+            "p95_latency": self.latency_percentile(95)
+        }
+
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self.opened_at = self._clock()
+        self.probe_in_flight = False
+
+    def _close(self):
+        self.state = CircuitState.CLOSED
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.outcomes.clear()
+
+class ProviderHealthRegistry:
+    """Verwaltet Circuit Breaker aller Provider/Modelle und ordnet die Fallback-Kette"""
+
+    def __init__(self, **breaker_kwargs):
+        self._breaker_kwargs = breaker_kwargs
+        self.breakers: Dict[Tuple[str, str], ProviderCircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> ProviderCircuitBreaker:
+        key = (provider, model)
+        if key not in self.breakers:
+            self.breakers[key] = ProviderCircuitBreaker(**self._breaker_kwargs)
+        return self.breakers[key]
+
+    def order_candidates(self, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Entfernt Duplikate und offene Circuits und sortiert die Kandidaten:
+        Half-Open-Proben zuerst, dann gemessene Provider nach Health-Score,
+        danach ungemessene in konfigurierter Reihenfolge.
+        """
+        seen = set()
+        unique = []
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                unique.append(candidate)
+
+        ranked = []
+        for index, (provider, model) in enumerate(unique):
+            breaker = self.get(provider, model)
+            if not breaker.is_available():
+                continue
+            if breaker.state != CircuitState.CLOSED:
+                rank = (0, 0.0, index)
+            elif breaker.has_latency_data:
+                rank = (1, breaker.health_score(), index)
+            else:
+                rank = (2, 0.0, index)
+            ranked.append((rank, (provider, model)))
+
+        ranked.sort(key=lambda item: item[0])
+        return [candidate for _, candidate in ranked]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Health-Übersicht für Dashboard und Logging"""
+        return {
+            f"{provider}/{model}": breaker.snapshot()
+            for (provider, model), breaker in self.breakers.items()
+        }
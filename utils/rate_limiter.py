@@ -0,0 +1,163 @@
+"""
+Rate Limiting für AI-Provider
+Token-Buckets (Requests/min und Tokens/min) plus Concurrency-Limit je Provider,
+damit parallel laufende Agenten nicht in Throttling-Stürme laufen.
+Der Client wird von mehreren Event-Loops geteilt (asyncio.run in Worker-Threads):
+die Buckets sind daher thread-sicher und loop-unabhängig, das Concurrency-Limit
+gilt wie der HTTP-Pool je Event-Loop.
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+
+from config.ai_task_config import PROVIDER_RATE_LIMITS, DEFAULT_PROVIDER_RATE_LIMIT
+
+class RateLimitError(Exception):
+    """Provider hat mit HTTP 429 geantwortet"""
+
+    def __init__(self, provider: str, retry_after: Optional[float] = None, message: str = ""):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(message or f"{provider} rate limit exceeded (retry after {retry_after}s)")
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Liest einen Retry-After Header (Sekunden oder HTTP-Datum)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token)"""
+    return max(1, sum(len(m.get("content") or "") for m in messages) // 4)
+
+class AsyncTokenBucket:
+    """
+    Token-Bucket mit Nachfüllrate pro Minute. acquire() reserviert die Tokens sofort
+    (der Bucket darf ins Minus gehen) und wartet außerhalb des Locks - Wartende
+    werden so in FIFO-Reihenfolge bedient, und der Bucket ist an keinen Event-Loop gebunden.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wartet, bis `amount` Tokens verfügbar sind; gibt die Wartezeit zurück"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            delay = max(0.0, -self.tokens / self.rate)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Abgebrochene Wartende geben ihre Reservierung zurück
+                with self._lock:
+                    self.tokens += amount
+                raise
+        return delay
+
+    def debit(self, amount: float):
+        """Verbucht nachträglich Verbrauch (darf den Bucket ins Minus ziehen)"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+class ProviderRateLimiter:
+    """Requests/min, Tokens/min und max. parallele Anfragen (je Event-Loop) für einen Provider"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_in_flight: int):
+        self.request_bucket = AsyncTokenBucket(requests_per_minute)
+        self.token_bucket = AsyncTokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        # asyncio.Semaphore ist loop-gebunden - eine je Event-Loop wie bei den HTTP-Sessions
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self.blocked_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            # Semaphoren beendeter Event-Loops verwerfen
+            self._semaphores = {
+                owner: s for owner, s in self._semaphores.items()
+                if not owner.is_closed()
+            }
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    async def _wait_for_backoff(self):
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            self.stats["waited_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """Reserviert Request- und Token-Budget sowie einen Concurrency-Slot"""
+        await self._wait_for_backoff()
+        self.stats["waited_seconds"] += await self.request_bucket.acquire(1)
+        self.stats["waited_seconds"] += await self.token_bucket.acquire(estimated_tokens)
+        async with self._semaphore():
+            # Während des Wartens auf den Slot kann ein 429 eingetroffen sein
+            await self._wait_for_backoff()
+            self.stats["requests"] += 1
+            yield
+
+    def penalize(self, retry_after: float):
+        """Blockiert alle weiteren Anfragen an diesen Provider für `retry_after` Sekunden"""
+        self.stats["throttled"] += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def record_usage(self, tokens: int):
+        """Verbucht tatsächlich erzeugte Output-Tokens im Tokens/min-Budget"""
+        self.token_bucket.debit(tokens)
+
+class RateLimiterRegistry:
+    """Gemeinsame Limiter je Provider für alle Agenten eines Prozesses"""
+
+    def __init__(self, limits: Dict[str, Dict] = None):
+        self.limits = limits or PROVIDER_RATE_LIMITS
+        self.limiters: Dict[str, ProviderRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderRateLimiter:
+        limiter = self.limiters.get(provider)
+        if limiter is None:
+            with self._lock:
+                limiter = self.limiters.get(provider)
+                if limiter is None:
+                    limiter = self.limiters[provider] = ProviderRateLimiter(
+                        **self.limits.get(provider, DEFAULT_PROVIDER_RATE_LIMIT)
+                    )
+        return limiter
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {provider: dict(limiter.stats) for provider, limiter in self.limiters.items()}
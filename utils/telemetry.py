@@ -0,0 +1,181 @@
+"""
+Gepufferte KPI- und Aktivitäts-Telemetrie
+log_kpi wird nach jedem LLM-Aufruf mit Wert 1 aufgerufen - statt einer
+Transaktion je Datenpunkt werden Zähler je (Datenbank, Agent, Kennzahl,
+Periode, Ziel) im Speicher aufsummiert und Aktivitäten gesammelt. Ein
+Hintergrund-Thread schreibt alle TELEMETRY_FLUSH_INTERVAL Sekunden (oder bei
+TELEMETRY_MAX_PENDING Einträgen) eine Transaktion je Datenbank; close()
+schreibt den Rest beim Shutdown genau einmal.
+"""
+
+import os
+import atexit
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from utils.connection_manager import get_connection
+
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "10"))
+TELEMETRY_MAX_PENDING = int(os.getenv("TELEMETRY_MAX_PENDING", "1000"))
+
+# (db_path, agent_id, metric_name, period, target)
+KpiKey = Tuple[str, str, str, str, Optional[float]]
+
+class TelemetryBuffer:
+    """Summiert KPI-Zähler und sammelt Aktivitäten bis zum nächsten Flush"""
+
+    def __init__(self, interval: float = TELEMETRY_FLUSH_INTERVAL, max_pending: int = TELEMETRY_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # Nur ein Flush gleichzeitig (Timer, Schwellwert und close())
+        self._flush_lock = threading.Lock()
+        self._kpis: Dict[KpiKey, float] = {}
+        self._activities: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._closed = False
+        self.stats = {"kpi_points": 0, "activities": 0, "rows_written": 0, "flushes": 0, "errors": 0}
+        atexit.register(self.close)
+
+    def record_kpi(self, db_path: str, agent_id: str, metric_name: str, value: float,
+                   target: float = None, period: str = "daily"):
+        """Addiert einen KPI-Datenpunkt zum Zähler des aktuellen Intervalls"""
+        key = (db_path, agent_id, metric_name, period, target)
+        with self._lock:
+            self._reset_after_fork()
+            self._kpis[key] = self._kpis.get(key, 0) + value
+            self.stats["kpi_points"] += 1
+            self._pending += 1
+        self._after_record()
+
+    def record_activity(self, db_path: str, agent_id: str, activity: str):
+        """Merkt eine Aktivität mit dem Zeitpunkt des Aufrufs vor"""
+        # Format wie CURRENT_TIMESTAMP (UTC), damit Zeitfenster-Abfragen gleich bleiben
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._reset_after_fork()
+            self._activities.setdefault(db_path, []).append((agent_id, activity, timestamp))
+            self.stats["activities"] += 1
+            self._pending += 1
+        self._after_record()
+
+    def flush(self) -> int:
+        """Schreibt alle gepufferten Einträge; gibt die Anzahl geschriebener Zeilen zurück"""
+        with self._flush_lock:
+            with self._lock:
+                self._reset_after_fork()
+                kpis, self._kpis = self._kpis, {}
+                activities, self._activities = self._activities, {}
+                self._pending = 0
+            written = 0
+            for db_path in set(key[0] for key in kpis) | set(activities):
+                db_kpis = {key: value for key, value in kpis.items() if key[0] == db_path}
+                db_activities = activities.get(db_path, [])
+                try:
+                    written += self._write(db_path, db_kpis, db_activities)
+                except sqlite3.Error as e:
+                    self.stats["errors"] += 1
+                    if _is_transient(e):
+                        # Nichts committet - beim nächsten Flush erneut versuchen
+                        logging.warning(f"Telemetry flush to {db_path} deferred: {e}")
+                        self._requeue(db_path, db_kpis, db_activities)
+                    else:
+                        logging.error(f"Telemetry flush to {db_path} failed, dropping "
+                                      f"{len(db_kpis) + len(db_activities)} rows: {e}")
+            if written:
+                self.stats["rows_written"] += written
+                self.stats["flushes"] += 1
+            return written
+
+    def close(self):
+        """Beendet den Flush-Thread und schreibt den Rest genau einmal (Shutdown-Hook)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._wakeup.set()
+            self._thread.join()
+        self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "pending": self._pending, "pending_counters": len(self._kpis)}
+
+    def _after_record(self):
+        if self._closed:
+            # Nach dem Shutdown direkt schreiben statt Daten zu verlieren
+            self.flush()
+            return
+        self._ensure_thread()
+        if self._pending >= self.max_pending:
+            self._wakeup.set()
+
+    def _reset_after_fork(self):
+        # Der Elternprozess schreibt seinen Puffer selbst - geerbte Einträge nicht doppelt schreiben
+        if self._pid is not None and self._pid != os.getpid():
+            self._kpis, self._activities, self._pending = {}, {}, 0
+            self._thread = None
+            self._pid = None
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._wakeup = threading.Event()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="telemetry-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._closed:
+                break  # close() schreibt den Rest
+            self.flush()
+
+    def _write(self, db_path: str, kpis: Dict[KpiKey, float], activities: List[Tuple[str, str, str]]) -> int:
+        with closing(get_connection(db_path)) as conn:
+            if kpis:
+                conn.executemany("""
+                    INSERT INTO kpi_metrics (agent_id, metric_name, value, target, period)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(agent_id, metric_name, value, target, period)
+                      for (_, agent_id, metric_name, period, target), value in kpis.items()])
+            if activities:
+                conn.executemany("""
+                    INSERT INTO agent_activities (agent_id, activity, timestamp)
+                    VALUES (?, ?, ?)
+                """, activities)
+            conn.commit()
+        return len(kpis) + len(activities)
+
+    def _requeue(self, db_path: str, kpis: Dict[KpiKey, float], activities: List[Tuple[str, str, str]]):
+        with self._lock:
+            for key, value in kpis.items():
+                self._kpis[key] = self._kpis.get(key, 0) + value
+            if activities:
+                self._activities[db_path] = activities + self._activities.get(db_path, [])
+            self._pending += len(kpis) + len(activities)
+
+def _is_transient(error: sqlite3.Error) -> bool:
+    """Sperrkonflikte lohnen einen neuen Versuch, Schemafehler nicht"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+# Global instance
+_buffer = None
+
+def get_telemetry_buffer() -> TelemetryBuffer:
+    """Get or create the process-wide telemetry buffer"""
+    global _buffer
+    if _buffer is None:
+        _buffer = TelemetryBuffer()
+    return _buffer
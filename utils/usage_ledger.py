@@ -0,0 +1,256 @@
+"""
+LLM Usage Ledger für berneby development
+Append-only Protokoll aller LLM-Aufrufe (Tokens, Kosten, Latenz, Cache-Treffer)
+mit gepufferten Batch-Writes und Aggregationen für das CEO-Dashboard.
+record() läuft in jedem chat_completion auf dem Event-Loop - volle Puffer
+werden daher als eine Transaktion an den Writer-Thread der Async-Fassade
+übergeben, ohne auf den Commit zu warten.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future, wait
+from contextlib import closing
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from config.ai_task_config import calculate_cost
+from utils.connection_manager import get_connection
+from utils.async_db import get_async_db
+
+LLM_USAGE_DB_PATH = os.getenv("LLM_USAGE_DB_PATH", os.getenv("DATABASE_PATH", "database/agent_system.db"))
+LLM_USAGE_FLUSH_SIZE = int(os.getenv("LLM_USAGE_FLUSH_SIZE", "50"))
+LLM_USAGE_FLUSH_INTERVAL = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "5"))
+
+# Erlaubte Gruppierungen für aggregate() (Spaltenausdruck in SQL)
+GROUP_BY_COLUMNS = {
+    "agent": "agent_id",
+    "pod": "pod",
+    "provider": "provider",
+    "model": "model",
+    "task": "task_name",
+    "hour": "strftime('%Y-%m-%d %H:00', created_at, 'unixepoch')"
+}
+
+LEDGER_COLUMNS = (
+    "created_at", "provider", "model", "task_name", "agent_id", "pod",
+    "prompt_tokens", "completion_tokens", "latency_ms", "cache_hit", "cost_usd", "success"
+)
+INSERT_SQL = (
+    f"INSERT INTO llm_usage_ledger ({', '.join(LEDGER_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(LEDGER_COLUMNS))})"
+)
+
+class UsageLedger:
+    """Gepuffertes, append-only Ledger für LLM-Aufrufe"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = LLM_USAGE_DB_PATH,
+        flush_size: int = LLM_USAGE_FLUSH_SIZE,
+        flush_interval: float = LLM_USAGE_FLUSH_INTERVAL
+    ):
+        self.db_path = db_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # Der Client wird von mehreren Event-Loops/Threads geteilt
+        self._lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._last_write: Optional[Future] = None
+        self._table_ready = False
+
+    def record(
+        self,
+        provider: Optional[str],
+        model: Optional[str],
+        task_name: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+        cache_hit: bool = False,
+        success: bool = True,
+        agent_id: Optional[str] = None,
+        pod: Optional[str] = None
+    ):
+        """Verbucht einen Aufruf; Cache-Treffer und Fehler verursachen keine Kosten"""
+        cost = 0.0 if cache_hit or not success else calculate_cost(model, prompt_tokens, completion_tokens)
+        row = (
+            time.time(), provider, model, task_name, agent_id, pod,
+            prompt_tokens, completion_tokens, latency * 1000, int(cache_hit), cost, int(success)
+        )
+        with self._lock:
+            self._buffer.append(row)
+            due = len(self._buffer) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> Optional[Future]:
+        """
+        Übergibt alle gepufferten Einträge als eine Transaktion an den Writer-Thread
+        und gibt den Future des zuletzt eingereihten Schreibzugriffs zurück
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            rows, self._buffer = self._buffer, []
+            # Ohne Einträge nur beim ersten Mal - legt die Tabelle für Abfragen an
+            if self.db_path and (rows or not self._table_ready):
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._last_write = get_async_db(self.db_path).submit_transaction(partial(self._insert, rows))
+            return self._last_write
+
+    async def flush_async(self):
+        """Wie flush(), wartet aber (ohne den Event-Loop zu blockieren) auf den Commit"""
+        pending = self.flush()
+        if pending is not None:
+            await asyncio.wait([asyncio.wrap_future(pending)])
+
+    def aggregate(self, group_by: str = "agent", since_hours: Optional[float] = None) -> List[Dict]:
+        """
+        Aggregiert Aufrufe, Tokens, Kosten und Latenz nach Agent, Pod, Provider,
+        Modell, Task oder Stunde; sortiert nach Kosten (bzw. chronologisch bei "hour").
+        Blockiert - async Aufrufer nutzen aggregate_async().
+        """
+        _check_group_by(group_by)
+        return self._query(partial(self._aggregate, group_by=group_by, since_hours=since_hours)) or []
+
+    async def aggregate_async(self, group_by: str = "agent", since_hours: Optional[float] = None) -> List[Dict]:
+        """Wie aggregate(), die Abfrage läuft im Reader-Pool der Async-Fassade"""
+        _check_group_by(group_by)
+        return await self._query_async(partial(self._aggregate, group_by=group_by, since_hours=since_hours)) or []
+
+    def get_cost_analysis(self, since_hours: Optional[float] = 24) -> Dict:
+        """Gesamtkosten und Aufschlüsselung nach Provider, Agent und Pod"""
+        return self._query(partial(self._cost_analysis, since_hours=since_hours)) or _cost_summary(since_hours, [], [], [])
+
+    async def get_cost_analysis_async(self, since_hours: Optional[float] = 24) -> Dict:
+        """Wie get_cost_analysis(), alle Aggregationen auf einer Reader-Verbindung"""
+        return (await self._query_async(partial(self._cost_analysis, since_hours=since_hours))
+                or _cost_summary(since_hours, [], [], []))
+
+    def _query(self, fn: Callable[[sqlite3.Connection], object]):
+        """Wartet auf ausstehende Schreibzugriffe und führt fn(conn) synchron aus"""
+        if not self.db_path:
+            return None
+        pending = self.flush()
+        if pending is not None:
+            wait([pending])
+        try:
+            with closing(get_connection(self.db_path)) as conn:
+                return fn(conn)
+        except sqlite3.Error as e:
+            logging.warning(f"LLM usage ledger query failed: {e}")
+            return None
+
+    async def _query_async(self, fn: Callable[[sqlite3.Connection], object]):
+        if not self.db_path:
+            return None
+        await self.flush_async()
+        try:
+            return await get_async_db(self.db_path).read(fn)
+        except sqlite3.Error as e:
+            logging.warning(f"LLM usage ledger query failed: {e}")
+            return None
+
+    # --- Laufen im Writer-Thread bzw. Reader-Pool ---
+
+    def _insert(self, rows: List[tuple], conn: sqlite3.Connection):
+        if not self._table_ready:
+            _create_table(conn)
+            self._table_ready = True
+        if rows:
+            conn.executemany(INSERT_SQL, rows)
+
+    def _aggregate(self, conn: sqlite3.Connection, group_by: str, since_hours: Optional[float]) -> List[Dict]:
+        column = GROUP_BY_COLUMNS[group_by]
+        order = "bucket" if group_by == "hour" else "cost_usd DESC"
+        where, params = _since_clause(since_hours)
+        rows = conn.execute(f"""
+            SELECT {column} AS bucket,
+                   COUNT(*),
+                   SUM(prompt_tokens),
+                   SUM(completion_tokens),
+                   SUM(cost_usd) AS cost_usd,
+                   AVG(latency_ms),
+                   SUM(cache_hit),
+                   SUM(1 - success)
+            FROM llm_usage_ledger
+            {where}
+            GROUP BY bucket
+            ORDER BY {order}
+        """, params).fetchall()
+
+        return [
+            {
+                group_by: bucket,
+                "calls": calls,
+                "prompt_tokens": prompt_tokens or 0,
+                "completion_tokens": completion_tokens or 0,
+                "cost_usd": round(cost or 0.0, 6),
+                "avg_latency_ms": round(latency or 0.0, 1),
+                "cache_hits": cache_hits or 0,
+                "errors": errors or 0
+            }
+            for bucket, calls, prompt_tokens, completion_tokens, cost, latency, cache_hits, errors in rows
+        ]
+
+    def _cost_analysis(self, conn: sqlite3.Connection, since_hours: Optional[float]) -> Dict:
+        return _cost_summary(
+            since_hours,
+            self._aggregate(conn, "provider", since_hours),
+            self._aggregate(conn, "agent", since_hours),
+            self._aggregate(conn, "pod", since_hours)
+        )
+
+def _check_group_by(group_by: str):
+    if group_by not in GROUP_BY_COLUMNS:
+        raise ValueError(f"Unknown group_by '{group_by}', expected one of {sorted(GROUP_BY_COLUMNS)}")
+
+def _since_clause(since_hours: Optional[float]):
+    if since_hours is None:
+        return "", ()
+    return "WHERE created_at >= ?", (time.time() - since_hours * 3600,)
+
+def _cost_summary(since_hours: Optional[float], by_provider: List[Dict], by_agent: List[Dict],
+                  by_pod: List[Dict]) -> Dict:
+    total_calls = sum(row["calls"] for row in by_provider)
+    cache_hits = sum(row["cache_hits"] for row in by_provider)
+    return {
+        "period_hours": since_hours,
+        "total_calls": total_calls,
+        "total_cost_usd": round(sum(row["cost_usd"] for row in by_provider), 6),
+        "total_tokens": sum(row["prompt_tokens"] + row["completion_tokens"] for row in by_provider),
+        "cache_hit_rate": cache_hits / total_calls if total_calls else 0.0,
+        "by_provider": by_provider,
+        "by_agent": by_agent,
+        "by_pod": by_pod
+    }
+
+def _create_table(conn: sqlite3.Connection):
+    """Legt die Ledger-Tabelle beim ersten Flush an"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_usage_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            provider TEXT,
+            model TEXT,
+            task_name TEXT,
+            agent_id TEXT,
+            pod TEXT,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            latency_ms REAL NOT NULL,
+            cache_hit INTEGER NOT NULL,
+            cost_usd REAL NOT NULL,
+            success INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ledger_created ON llm_usage_ledger(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ledger_agent ON llm_usage_ledger(agent_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ledger_pod ON llm_usage_ledger(pod, created_at)")
@@ -0,0 +1,326 @@
+"""
+Lease-basierte Work-Queue über SQLite
+At-least-once-Zustellung für Agent-Nachrichten: atomarer Claim per
+UPDATE ... RETURNING, Sichtbarkeits-Timeouts (Leases), Retry-Zähler,
+Dead-Letter-Tabelle, Batch-Dequeue und optionale Prioritäten mit Aging
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Optional
+from utils.connection_manager import get_connection
+
+WORK_QUEUE_VISIBILITY_TIMEOUT = float(os.getenv("WORK_QUEUE_VISIBILITY_TIMEOUT", "300"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "5"))
+WORK_QUEUE_RETRY_DELAY = float(os.getenv("WORK_QUEUE_RETRY_DELAY", "5"))
+# Sekunden Wartezeit, nach denen eine Nachricht eine Prioritätsstufe aufsteigt
+WORK_QUEUE_PRIORITY_AGING = float(os.getenv("WORK_QUEUE_PRIORITY_AGING", "60"))
+
+# Numerische Prioritäten (höher = dringender)
+PRIORITY_LEVELS = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+# Durch Aging erreichbare Höchststufe - "urgent" bleibt echten Eskalationen vorbehalten
+PRIORITY_AGING_CAP = PRIORITY_LEVELS["high"]
+
+# Spalten, die die Queue in den Nachrichten-Tabellen benötigt
+LEASE_COLUMNS = {
+    "attempts": "INTEGER DEFAULT 0",
+    "visible_at": "REAL DEFAULT 0",
+    "lease_owner": "TEXT",
+    "last_error": "TEXT"
+}
+
+def make_worker_id(agent_id: str) -> str:
+    """Eindeutige Worker-ID je Prozess (Host, PID) und Agent"""
+    return f"{agent_id}@{socket.gethostname()}:{os.getpid()}"
+
+class SQLiteWorkQueue:
+    """At-least-once Work-Queue über einer bestehenden Nachrichten-Tabelle"""
+
+    def __init__(
+        self,
+        db_path: str,
+        table: str = "messages",
+        visibility_timeout: float = WORK_QUEUE_VISIBILITY_TIMEOUT,
+        max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS,
+        retry_delay: float = WORK_QUEUE_RETRY_DELAY,
+        priority_column: Optional[str] = None,
+        priority_aging: float = WORK_QUEUE_PRIORITY_AGING
+    ):
+        self.db_path = db_path
+        self.table = table
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Ohne Prioritätsspalte strikt FIFO
+        self.priority_column = priority_column
+        self.priority_aging = priority_aging
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = get_connection(self.db_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_schema(self):
+        """Ergänzt Lease-Spalten, Claim-Index und Dead-Letter-Tabelle (idempotent)"""
+        if self._schema_ready:
+            return
+        with closing(self._connect()) as conn:
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+            for column, definition in LEASE_COLUMNS.items():
+                if column not in existing:
+                    try:
+                        conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {column} {definition}")
+                    except sqlite3.OperationalError as e:
+                        # Paralleler Worker hat die Spalte bereits angelegt
+                        if "duplicate column" not in str(e):
+                            raise
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_claim
+                ON {self.table}(receiver_id, status, visible_at)
+            """)
+            if self.priority_column:
+                self._ensure_priority_column(conn, existing)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS message_dead_letters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_table TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    receiver_id TEXT,
+                    message_type TEXT,
+                    message TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at REAL NOT NULL
+                )
+            """)
+        self._schema_ready = True
+
+    def claim(self, receiver_id: str, worker_id: str, limit: int = 1) -> List[Dict]:
+        """
+        Reserviert atomar bis zu `limit` sichtbare Nachrichten für diesen Worker.
+        Abgelaufene Leases werden neu vergeben; Nachrichten, die max_attempts
+        erreicht haben, wandern vorher in die Dead-Letter-Tabelle.
+        """
+        self.ensure_schema()
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._dead_letter_exhausted(conn, receiver_id, now)
+                rows = conn.execute(f"""
+                    UPDATE {self.table}
+                    SET status = 'processing',
+                        lease_owner = ?,
+                        visible_at = ?,
+                        attempts = attempts + 1
+                    WHERE id IN (
+                        SELECT id FROM {self.table}
+                        WHERE receiver_id = ?
+                          AND status IN ('pending', 'processing')
+                          AND COALESCE(visible_at, 0) <= ?
+                        ORDER BY {self.dispatch_order()}
+                        LIMIT ?
+                    )
+                    RETURNING *, {self.effective_priority()} AS effective_priority
+                """, (worker_id, now + self.visibility_timeout, receiver_id, now, limit)).fetchall()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        # RETURNING garantiert keine Reihenfolge
+        return sorted(
+            (dict(row) for row in rows),
+            key=lambda row: (-row["effective_priority"], row["created_at"] or "", str(row["id"]))
+        )
+
+    def effective_priority(self) -> str:
+        """
+        SQL-Ausdruck der Dispatch-Priorität: gespeicherte Stufe plus eine Stufe je
+        `priority_aging` Sekunden Wartezeit (Aging gegen Starvation), höchstens bis
+        PRIORITY_AGING_CAP - dringendere Nachrichten verdrängen Bulk-Arbeit immer.
+        """
+        if not self.priority_column:
+            return "0"
+        waited = "(julianday('now') - julianday(created_at)) * 86400.0"
+        return (
+            f"MAX({self.priority_column}, MIN({PRIORITY_AGING_CAP}, "
+            f"{self.priority_column} + CAST(COALESCE({waited}, 0) / {float(self.priority_aging)} AS INTEGER)))"
+        )
+
+    def dispatch_order(self) -> str:
+        """ORDER-BY-Klausel für Claims: Priorität (mit Aging), dann FIFO"""
+        if not self.priority_column:
+            return "created_at ASC, rowid ASC"
+        return f"{self.effective_priority()} DESC, created_at ASC, rowid ASC"
+
+    def ack(self, message_id, worker_id: str) -> bool:
+        """Bestätigt die Verarbeitung; False, wenn die Lease inzwischen verloren ging"""
+        self.ensure_schema()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(f"""
+                UPDATE {self.table}
+                SET status = 'processed', processed_at = CURRENT_TIMESTAMP, lease_owner = NULL
+                WHERE id = ? AND status = 'processing' AND lease_owner = ?
+            """, (message_id, worker_id))
+            return cursor.rowcount == 1
+
+    def nack(self, message_id, worker_id: str, error: str = "", retry_delay: Optional[float] = None) -> str:
+        """
+        Gibt eine Nachricht nach Fehler zurück: erneut sichtbar nach `retry_delay`
+        oder Dead-Letter, wenn max_attempts erreicht ist. Gibt den neuen Status zurück.
+        """
+        self.ensure_schema()
+        delay = self.retry_delay if retry_delay is None else retry_delay
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT * FROM {self.table} WHERE id = ? AND status = 'processing' AND lease_owner = ?",
+                    (message_id, worker_id)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return "lease_lost"
+                if row["attempts"] >= self.max_attempts:
+                    self._move_to_dead_letters(conn, dict(row), error)
+                    status = "dead"
+                else:
+                    conn.execute(f"""
+                        UPDATE {self.table}
+                        SET status = 'pending', lease_owner = NULL, visible_at = ?, last_error = ?
+                        WHERE id = ?
+                    """, (time.time() + delay, error, message_id))
+                    status = "pending"
+                conn.execute("COMMIT")
+                return status
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def extend_lease(self, message_id, worker_id: str, seconds: Optional[float] = None) -> bool:
+        """Verlängert die Lease lang laufender Verarbeitung (Heartbeat)"""
+        return message_id in self.extend_leases([message_id], worker_id, seconds)
+
+    def extend_leases(self, message_ids: List, worker_id: str, seconds: Optional[float] = None) -> set:
+        """
+        Verlängert die Leases mehrerer Nachrichten eines Batches in einem Statement.
+        Gibt die IDs zurück, die noch diesem Worker gehören - fehlende wurden
+        nach Ablauf von einem anderen Worker übernommen.
+        """
+        if not message_ids:
+            return set()
+        self.ensure_schema()
+        placeholders = ", ".join("?" for _ in message_ids)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"""
+                UPDATE {self.table} SET visible_at = ?
+                WHERE id IN ({placeholders}) AND status = 'processing' AND lease_owner = ?
+                RETURNING id
+            """, (time.time() + (seconds or self.visibility_timeout), *message_ids, worker_id)).fetchall()
+        return {row["id"] for row in rows}
+
+    def list_dead_letters(self, receiver_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Dead-Letter-Einträge dieser Tabelle (neueste zuerst)"""
+        self.ensure_schema()
+        query = "SELECT * FROM message_dead_letters WHERE source_table = ?"
+        params: list = [self.table]
+        if receiver_id:
+            query += " AND receiver_id = ?"
+            params.append(receiver_id)
+        query += " ORDER BY failed_at DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def requeue_dead_letter(self, dead_letter_id: int) -> bool:
+        """Stellt eine Dead-Letter-Nachricht mit zurückgesetztem Retry-Zähler erneut ein"""
+        self.ensure_schema()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM message_dead_letters WHERE id = ? AND source_table = ?",
+                    (dead_letter_id, self.table)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return False
+                conn.execute(f"""
+                    UPDATE {self.table}
+                    SET status = 'pending', attempts = 0, visible_at = 0, lease_owner = NULL, last_error = NULL
+                    WHERE id = ?
+                """, (json.loads(row["message"])["id"],))
+                conn.execute("DELETE FROM message_dead_letters WHERE id = ?", (dead_letter_id,))
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get_stats(self, receiver_id: Optional[str] = None) -> Dict[str, int]:
+        """Anzahl Nachrichten je Status (optional für einen Empfänger)"""
+        self.ensure_schema()
+        query = f"SELECT status, COUNT(*) FROM {self.table}"
+        params: tuple = ()
+        if receiver_id:
+            query += " WHERE receiver_id = ?"
+            params = (receiver_id,)
+        with closing(self._connect()) as conn:
+            stats = {status: count for status, count in conn.execute(query + " GROUP BY status", params)}
+            dead_query = "SELECT COUNT(*) FROM message_dead_letters WHERE source_table = ?"
+            dead_params: tuple = (self.table,)
+            if receiver_id:
+                dead_query += " AND receiver_id = ?"
+                dead_params += (receiver_id,)
+            stats["dead_letters"] = conn.execute(dead_query, dead_params).fetchone()[0]
+        return stats
+
+    def _ensure_priority_column(self, conn: sqlite3.Connection, existing: set):
+        """Numerische Prioritätsspalte samt Dispatch-Index; Altbestand aus der Text-Spalte übernehmen"""
+        column = self.priority_column
+        if column not in existing:
+            try:
+                conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {column} INTEGER DEFAULT {PRIORITY_LEVELS['normal']}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):
+                    raise
+            if "priority" in existing:
+                cases = " ".join(f"WHEN '{name}' THEN {level}" for name, level in PRIORITY_LEVELS.items())
+                conn.execute(
+                    f"UPDATE {self.table} SET {column} = CASE priority {cases} ELSE {PRIORITY_LEVELS['normal']} END"
+                )
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.table}_dispatch
+            ON {self.table}(receiver_id, status, {column}, created_at)
+        """)
+
+    def _dead_letter_exhausted(self, conn: sqlite3.Connection, receiver_id: str, now: float):
+        """Abgelaufene Leases ohne verbleibende Versuche (z.B. Worker-Absturz) aussortieren"""
+        rows = conn.execute(f"""
+            SELECT * FROM {self.table}
+            WHERE receiver_id = ? AND status = 'processing'
+              AND visible_at <= ? AND attempts >= ?
+        """, (receiver_id, now, self.max_attempts)).fetchall()
+        for row in rows:
+            self._move_to_dead_letters(conn, dict(row), row["last_error"] or "lease expired")
+
+    def _move_to_dead_letters(self, conn: sqlite3.Connection, row: Dict, error: str):
+        conn.execute("""
+            INSERT INTO message_dead_letters
+            (source_table, message_id, receiver_id, message_type, message, attempts, last_error, failed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            self.table, str(row["id"]), row.get("receiver_id"), row.get("message_type"),
+            json.dumps(row, default=str), row["attempts"], error, time.time()
+        ))
+        conn.execute(
+            f"UPDATE {self.table} SET status = 'dead', lease_owner = NULL, last_error = ? WHERE id = ?",
+            (error, row["id"])
+        )
+        logging.warning(f"Message {row['id']} for {row.get('receiver_id')} moved to dead letters: {error}")
@@ -0,0 +1,186 @@
+"""
+Multiprozess-Worker für einzelne Agenten
+Startet N Prozesse desselben Agenten, die über die Lease-Queue gemeinsam aus
+dem Nachrichtenspeicher konsumieren; ein Supervisor startet abgestürzte
+Worker mit exponentiellem Backoff neu
+"""
+
+import os
+import time
+import signal
+import asyncio
+import logging
+import importlib
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+# Benachrichtigungen wirken nur innerhalb eines Prozesses - Worker pollen daher häufiger
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+WORKER_RESTART_BACKOFF = float(os.getenv("WORKER_RESTART_BACKOFF", "1"))
+WORKER_MAX_RESTART_BACKOFF = float(os.getenv("WORKER_MAX_RESTART_BACKOFF", "60"))
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "10"))
+
+def parse_worker_specs(specs: List[str]) -> Dict[str, int]:
+    """
+    Parst Angaben wie ["ACQ-002=4", "ACQ-001=2,SALES-001=2"] zu {agent_id: anzahl}.
+    Löst ValueError bei ungültigen Angaben aus.
+    """
+    counts: Dict[str, int] = {}
+    for spec in specs:
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            agent_id, sep, count = item.partition("=")
+            if not sep or not agent_id.strip():
+                raise ValueError(f"Invalid worker spec '{item}', expected AGENT_ID=N")
+            try:
+                workers = int(count)
+            except ValueError:
+                raise ValueError(f"Invalid worker count in '{item}'")
+            if workers < 1:
+                raise ValueError(f"Worker count must be >= 1 in '{item}'")
+            counts[agent_id.strip()] = workers
+    return counts
+
+def agent_class_path(agent) -> str:
+    """'modul:Klasse' des Agenten, damit Worker-Prozesse ihn neu instanziieren können"""
+    return f"{type(agent).__module__}:{type(agent).__qualname__}"
+
+def run_agent_worker(agent_key: str, agent_class: str, worker_index: int):
+    """
+    Einstiegspunkt eines Worker-Prozesses: instanziiert den Agenten und konsumiert Nachrichten.
+    agent_key ist der Schlüssel des Orchestrators (--workers) und nur Bezeichnung des
+    Worker-Platzes - er muss nicht der agent_id entsprechen, unter der der Agent konsumiert.
+    """
+    module_name, class_name = agent_class.split(":", 1)
+    agent = getattr(importlib.import_module(module_name), class_name)()
+    agent.poll_interval = min(agent.poll_interval, WORKER_POLL_INTERVAL)
+    asyncio.run(_consume(agent, worker_index))
+
+async def _consume(agent, worker_index: int):
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, agent.stop)
+    agent.logger.info(f"Worker {worker_index} ({agent.worker_id}) started")
+    try:
+        await agent.run_agent_loop()
+    finally:
+        from utils.ai_client import close_ai_client
+        from utils.telemetry import get_telemetry_buffer
+        get_telemetry_buffer().close()
+        await close_ai_client()
+
+class WorkerSlot:
+    """Ein überwachter Worker-Platz (agent_id, Index) mit aktuellem Prozess"""
+
+    def __init__(self, agent_id: str, agent_class: str, index: int):
+        self.agent_id = agent_id
+        self.agent_class = agent_class
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0  # aufeinanderfolgende Abstürze, bestimmt den Backoff
+        self.restart_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.agent_id}-worker-{self.index}"
+
+class WorkerSupervisor:
+    """Startet, überwacht und beendet die Worker-Prozesse aller skalierten Agenten"""
+
+    def __init__(
+        self,
+        target: Callable = run_agent_worker,
+        restart_backoff: float = WORKER_RESTART_BACKOFF,
+        max_restart_backoff: float = WORKER_MAX_RESTART_BACKOFF,
+        context=None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.target = target
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        # spawn: Worker erben weder Event-Loop noch offene HTTP-/SQLite-Verbindungen
+        self.context = context or multiprocessing.get_context("spawn")
+        self.clock = clock
+        self.slots: List[WorkerSlot] = []
+        self.running = False
+
+    def add(self, agent_id: str, agent_class: str, count: int):
+        """Registriert `count` Worker für einen Agenten"""
+        offset = sum(1 for slot in self.slots if slot.agent_id == agent_id)
+        for index in range(offset, offset + count):
+            self.slots.append(WorkerSlot(agent_id, agent_class, index))
+
+    def start(self):
+        self.running = True
+        for slot in self.slots:
+            self._spawn(slot)
+
+    def _spawn(self, slot: WorkerSlot):
+        slot.process = self.context.Process(
+            target=self.target,
+            args=(slot.agent_id, slot.agent_class, slot.index),
+            name=slot.name,
+            daemon=True
+        )
+        slot.process.start()
+        slot.started_at = self.clock()
+        slot.restart_at = None
+        logging.info(f"Started {slot.name} (pid {slot.process.pid})")
+
+    def check(self) -> int:
+        """Startet beendete Worker nach Ablauf ihres Backoffs neu; gibt die Zahl der Neustarts zurück"""
+        if not self.running:
+            return 0
+        restarted = 0
+        now = self.clock()
+        for slot in self.slots:
+            if slot.process is None or slot.process.is_alive():
+                continue
+            if slot.restart_at is None:
+                # Lief der Worker länger als der maximale Backoff, gilt er als stabil
+                if now - slot.started_at >= self.max_restart_backoff:
+                    slot.failures = 0
+                delay = min(self.max_restart_backoff, self.restart_backoff * (2 ** slot.failures))
+                slot.failures += 1
+                slot.restart_at = now + delay
+                logging.warning(
+                    f"{slot.name} exited with code {slot.process.exitcode} - restarting in {delay:.1f}s"
+                )
+            if now >= slot.restart_at:
+                slot.restarts += 1
+                self._spawn(slot)
+                restarted += 1
+        return restarted
+
+    async def supervise(self, interval: float = 1.0):
+        """Überwachungsschleife für den Event-Loop des Orchestrators"""
+        while self.running:
+            self.check()
+            await asyncio.sleep(interval)
+
+    def stop(self, timeout: float = WORKER_SHUTDOWN_TIMEOUT):
+        """Beendet alle Worker (SIGTERM, nach Timeout SIGKILL)"""
+        self.running = False
+        processes = [slot.process for slot in self.slots if slot.process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def get_status(self) -> List[Dict]:
+        return [
+            {
+                "agent_id": slot.agent_id,
+                "worker": slot.name,
+                "pid": slot.process.pid if slot.process else None,
+                "alive": bool(slot.process and slot.process.is_alive()),
+                "restarts": slot.restarts
+            }
+            for slot in self.slots
+        ]
@@ -9,9 +9,9 @@ import aiohttp
 import os
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import sqlite3
 from contextlib import closing
 import logging
+from utils.connection_manager import get_connection
 
 class WorkflowIntegration:
     """Integration zwischen AI-Agenten und n8n Workflows"""
@@ -204,7 +204,7 @@ class WorkflowIntegration:
     async def _log_workflow_call(self, agent_id: str, workflow_id: str, data: Dict[str, Any]):
         """Protokolliert Workflow-Aufrufe in der Datenbank"""
         try:
-            with closing(sqlite3.connect(self.db_path)) as conn:
+            with closing(get_connection(self.db_path)) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -227,7 +227,7 @@ class WorkflowIntegration:
     async def _log_workflow_result(self, agent_id: str, workflow_id: str, status: str, result: Dict[str, Any]):
         """Protokolliert Workflow-Ergebnisse"""
         try:
-            with closing(sqlite3.connect(self.db_path)) as conn:
+            with closing(get_connection(self.db_path)) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -251,7 +251,7 @@ class WorkflowIntegration:
     async def _log_workflow_creation(self, agent_id: str, workflow_id: str, definition: Dict[str, Any]):
         """Protokolliert die Erstellung neuer Workflows"""
         try:
-            with closing(sqlite3.connect(self.db_path)) as conn:
+            with closing(get_connection(self.db_path)) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""